@@ -0,0 +1,215 @@
+# define content-addressed cache for graph computations
+
+import glob
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import networkx as nx
+
+from common.graph_core import GraphCore
+from common.utility import atomic_write
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows: the index is not locked
+    fcntl = None
+
+INDEX_FILE = "index.json"
+LOCK_FILE = "index.lock"
+
+
+def graph_digest(graph: nx.Graph):
+    """
+    Return the sha1 digest of the node set and the edge set of a graph
+
+    Parameter
+    ---------
+    graph : nx.Graph
+    """
+    digest = hashlib.sha1()
+    for node in sorted(map(str, graph.nodes)):
+        digest.update(node.encode())
+        digest.update(b"\n")
+    digest.update(b"\n")
+    edges = sorted("{}\t{}".format(*sorted((str(u), str(v)))) for u, v in graph.edges)
+    for edge in edges:
+        digest.update(edge.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def core_digest(core: GraphCore):
+    """
+    Return the digest of graph_digest of the graph of a GraphCore, without building the networkx graph
+
+    Parameter
+    ---------
+    core : GraphCore
+    """
+    labels = [str(label) for label in core.labels]
+    digest = hashlib.sha1()
+    for node in sorted(labels):
+        digest.update(node.encode())
+        digest.update(b"\n")
+    digest.update(b"\n")
+    edges = sorted("{}\t{}".format(*sorted((labels[u], labels[v]))) for u, v in core.edges().tolist())
+    for edge in edges:
+        digest.update(edge.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def communities_digest(communities: dict):
+    """
+    Return the sha1 digest of a partition of the nodes
+
+    The nodes of every community are hashed in the order of their list: it is the order of the candidate edges,
+    so two lists with the same nodes in a different order can break the ties of a ranking differently
+
+    Parameter
+    ---------
+    communities : dict containing communities
+    """
+    partition = {str(community): list(map(str, nodes)) for community, nodes in communities.items()}
+    return hashlib.sha1(json.dumps(partition, sort_keys=True).encode()).hexdigest()
+
+
+class GraphCache:
+    """
+    Cache of the values computed on a graph, keyed by the content of the graph and by the parameters
+
+    Every kind of value lives in its own folder (root + kind), e.g. ../betweenness/. An entry is named
+    <name>_<key>, where key is a hash of the graph digest, the kind and the parameters, so a changed graph
+    or a different parameter never hits a stale entry. Each folder has an index recording, for every entry,
+    its files with their size and modification time: a hit only needs a stat of those files.
+    If max_size is given, the least recently used entries of a folder are removed until the folder fits it.
+
+    Parameter
+    ---------
+    graph : nx.Graph, only used to compute its digest, None if digest is given
+    root : folder containing the cache folders
+    max_size : maximum number of bytes kept in each cache folder, None for no limit
+    digest : digest of graph if already known, e.g. from a snapshot or core_digest, see graph_digest
+    """
+
+    def __init__(self, graph: nx.Graph, root: str = "../", max_size: int = None, digest: str = None):
+
+        self.digest = digest if digest else graph_digest(graph)
+        self.root = root
+        self.max_size = max_size
+
+    def path(self, kind: str):
+        """
+        Return the folder containing the entries of kind
+        """
+        return os.path.join(self.root, kind)
+
+    def key(self, kind: str, params: dict):
+        """
+        Return the key of the entry of kind computed with params
+        """
+        content = json.dumps({"graph": self.digest, "kind": kind, "params": params}, sort_keys=True, default=str)
+        return hashlib.sha1(content.encode()).hexdigest()[:16]
+
+    def entry_name(self, kind: str, name: str, params: dict):
+        """
+        Return the name (without extension) to use for a new entry
+        """
+        return "{}_{}".format(name, self.key(kind, params))
+
+    def lookup(self, kind: str, params: dict):
+        """
+        Return the name (without extension) of the valid entry of kind computed with params, None if missing
+        """
+        key = self.key(kind, params)
+        with self.__locked(kind):
+            index = self.__read_index(kind)
+            entry = index.get(key)
+            if entry is None:
+                return None
+
+            for file, (size, modified) in entry["files"].items():
+                try:
+                    stat = os.stat(os.path.join(self.path(kind), file))
+                except FileNotFoundError:
+                    stat = None
+                if stat is None or stat.st_size != size or stat.st_mtime_ns != modified:
+                    del index[key]
+                    self.__write_index(kind, index)
+                    return None
+
+            entry["last_used"] = time.time()
+            self.__write_index(kind, index)
+            return entry["name"]
+
+    def record(self, kind: str, name: str, params: dict):
+        """
+        Record the files of the entry written as name (without extension), then evict old entries if needed
+        """
+        path = self.path(kind)
+        files = dict()
+        entry_files = glob.glob(os.path.join(path, glob.escape(name) + ".*")) + \
+            glob.glob(os.path.join(path, glob.escape(name) + "_*"))
+        for file in entry_files:
+            if file.endswith(".tmp"):
+                continue
+            stat = os.stat(file)
+            files[os.path.basename(file)] = [stat.st_size, stat.st_mtime_ns]
+
+        key = self.key(kind, params)
+        with self.__locked(kind):
+            index = self.__read_index(kind)
+            index[key] = {"name": name, "params": params, "files": files, "last_used": time.time()}
+            if self.max_size is not None:
+                self.__evict(kind, index, keep=key)
+            self.__write_index(kind, index)
+
+    def __evict(self, kind: str, index: dict, keep: str):
+
+        def entry_size(entry):
+            return sum(size for size, _ in entry["files"].values())
+
+        total_size = sum(entry_size(entry) for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]["last_used"]):
+            if total_size <= self.max_size:
+                break
+            if key == keep:
+                continue
+            entry = index.pop(key)
+            total_size -= entry_size(entry)
+            for file in entry["files"]:
+                try:
+                    os.remove(os.path.join(self.path(kind), file))
+                except FileNotFoundError:
+                    pass
+            print("Cache entry {} evicted".format(entry["name"]))
+
+    @contextmanager
+    def __locked(self, kind: str):
+        # the index of a folder is shared by the processes working on different graphs
+
+        os.makedirs(self.path(kind), exist_ok=True)
+        with open(os.path.join(self.path(kind), LOCK_FILE), 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __read_index(self, kind: str):
+
+        index_file = os.path.join(self.path(kind), INDEX_FILE)
+        if not os.path.exists(index_file):
+            return dict()
+        with open(index_file) as json_file:
+            return json.load(json_file)
+
+    def __write_index(self, kind: str, index: dict):
+
+        with atomic_write(os.path.join(self.path(kind), INDEX_FILE)) as json_file:
+            json.dump(index, json_file)
@@ -1,8 +1,19 @@
 # define function to collect results
 
+import contextlib
+import io
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from typing import Union
+
 import networkx as nx
+import numpy as np
 import pandas as pd
 
+from common.cache import GraphCache
+from common.graph_core import GraphCore, OverlayGraph, core_from_networkx
+from common.score_cache import ScoreCaches
+from common.utility import process_context
 from controversy.measures import RandomWalkControversy, GMCK, ForceAtlasControversy
 from link_prediction.algorithms import LinkWithBetweenness, HybridLinkPrediction, StateOfArtAlgorithm, \
     LinkWithStructuralHoles
@@ -10,42 +21,113 @@ from link_prediction.algorithms import LinkWithBetweenness, HybridLinkPrediction
 
 def results(g: nx.Graph,
             communities: dict,
-            per_edges: float,
+            per_edges: Union[float, list],
             filename: str,
-            given_betweenness_value: dict,
-            given_effective_size: dict,
-            given_jaccard_value:dict,
-            given_adamic_adar_value: dict,
-            given_resource_allocation_value: dict,
-            given_preferential_attachment_value: dict,
             complete: bool,
             link_prediction_alg: list,
-            hybrid: bool = True):
+            hybrid: bool = True,
+            engine: str = "networkx",
+            max_memory: int = None,
+            cache_per_edges: float = None,
+            cache: GraphCache = None,
+            workers: int = 1,
+            seed: int = 10,
+            rwc_workers: int = 1,
+            rwc_tolerance: float = None,
+            atlas_engine: str = "networkx",
+            atlas_theta: float = 1.0,
+            atlas_sample_size: int = None,
+            atlas_refine_iterations: int = 100,
+            atlas_refine_temperature: float = 0.01,
+            atlas_refine_tolerance: float = 0.01,
+            betweenness_sample: int = None,
+            betweenness_top: int = 50,
+            betweenness_stability: float = 0.9,
+            core: GraphCore = None):
     """
     Function to collect results of echo-chambers project
 
+    The DataFrame has a row for each algorithm and percentage of new edges
+
     Parameter
     ---------
     g : nx.Graph
     communities : dict containing communities
-    n_edges: list of number of edges to add
+    per_edges: percentage of new edges to add, or list of percentages: the edges of every algorithm are
+        ranked once and added incrementally, measuring the controversy at each percentage
     link_prediction_alg: list of link prediction algorithms to use
+    engine: engine used to compute the state of art scores, networkx or sparse
+    max_memory: memory ceiling in bytes of a scoring tile, to score the state of art and the hybrid algorithms by
+        chunks, only with the sparse engine
+    cache_per_edges: largest percentage of new edges kept in the cached rankings
+    cache: content-addressed cache of the values computed on g, nothing is cached if not given
+    workers: number of processes running the link prediction algorithms concurrently
+    seed: seed of the random walks, the same for the pre and the post measures so that they are comparable
+    rwc_workers: number of processes running the random walks of each measure
+    rwc_tolerance: if given, the random walks stop once the half width of the 95% confidence interval of RWC
+        is at most rwc_tolerance. RWC_*_ci are the half widths, RWC_*_walks the numbers of walks
+    atlas_engine: engine of the ForceAtlas layouts, networkx or numpy (exact) or grid (approximate repulsion)
+    atlas_theta: tolerance of the grid engine, lower is more accurate and slower
+    atlas_sample_size: if given, the mean distances of the ForceAtlas scores over more than atlas_sample_size pairs
+        of nodes are estimated from atlas_sample_size random pairs. ForceAtlas_*_ci are the half widths of the
+        95% confidence intervals, 0 when every mean is exact
+    atlas_refine_iterations: the post layouts start from the pre layout and run at most this many iterations,
+        stopping once they have converged. With 0 or None every post layout starts from random positions and runs
+        all the iterations
+    atlas_refine_temperature: initial temperature of the refined post layouts, the default 0.01 is the
+        temperature the pre layout has in its last 10% of iterations
+    atlas_refine_tolerance: the refined post layouts stop once the nodes have moved on average by at most
+        atlas_refine_tolerance * k per iteration over the last 10 iterations
+    betweenness_sample: if given, the betweenness of BETWEENNESS and of the hybrid algorithms is estimated from
+        pivots, starting from betweenness_sample of them and doubling them until the betweenness_top nodes with
+        the highest betweenness of the previous sample are at least a fraction betweenness_stability of the
+        current ones. The numbers of pivots and the stability are cached with the betweenness
+    core: integer-indexed graph of g with the communities assigned, built from g if not given. It is used by the
+        measures on g and by the sparse similarity scores
     """
+    if core is None:
+        core = core_from_networkx(g, communities)
+    rwc_options = {"seed": seed, "workers": rwc_workers, "tolerance": rwc_tolerance}
+    betweenness_options = {"betweenness_sample": betweenness_sample,
+                           "betweenness_top": betweenness_top,
+                           "betweenness_stability": betweenness_stability}
+    atlas_options = {"atlas_properties": {"engine": atlas_engine, "theta": atlas_theta},
+                     "sample_size": atlas_sample_size,
+                     "seed": seed}
     if complete:
         print("Getting all controversy measure")
-        gmck_pre = GMCK(graph=g, communities=communities)
-        rwc_pre = RandomWalkControversy(graph=g, communities=communities)
-        force_atlas_pre = ForceAtlasControversy(graph=g, communities=communities)
+        gmck_pre = GMCK(graph=g, communities=communities, core=core)
+        rwc_pre = RandomWalkControversy(graph=g, communities=communities, core=core, **rwc_options)
+        force_atlas_pre = ForceAtlasControversy(graph=g, communities=communities, core=core, **atlas_options)
     else:
         print("Getting only BCC controversy measure")
-        gmck_pre = GMCK(graph=g, communities=communities)
-        rwc_pre = RandomWalkControversy(graph=g, communities=communities, compute=complete)
-        force_atlas_pre = ForceAtlasControversy(graph=g, communities=communities, compute=complete)
+        gmck_pre = GMCK(graph=g, communities=communities, core=core)
+        rwc_pre = RandomWalkControversy(graph=g, communities=communities, core=core, compute=complete,
+                                        **rwc_options)
+        force_atlas_pre = ForceAtlasControversy(graph=g, communities=communities, core=core, compute=complete,
+                                                **atlas_options)
+
+    # the graphs of the post measures only have a few more edges: their layouts refine the pre layout
+    atlas_post_options = atlas_options
+    if complete and atlas_refine_iterations:
+        pre_positions = np.array([force_atlas_pre.position_node[node] for node in g])
+        atlas_post_options = dict(atlas_options,
+                                  atlas_properties=dict(atlas_options["atlas_properties"],
+                                                        pos=pre_positions,
+                                                        iterations=atlas_refine_iterations,
+                                                        temperature=atlas_refine_temperature,
+                                                        tolerance=atlas_refine_tolerance))
 
     df_result = pd.DataFrame(
         columns=["Algorithm",
                  "RWC_pre",
                  "RWC_post",
+                 "RWC_pre_ci",
+                 "RWC_post_ci",
+                 "RWC_pre_walks",
+                 "RWC_post_walks",
+                 "ForceAtlas_pre_ci",
+                 "ForceAtlas_post_ci",
                  "GMCK_pre",
                  "GMCK_post",
                  "ForceAtlas_pre",
@@ -56,79 +138,202 @@ def results(g: nx.Graph,
                  "Percentage_edges_added"]
     )
 
-    given_values_state_of_art_alg = None
-    for alg in link_prediction_alg:
+    # the cached values are read only by the algorithms which need them, then shared by them
+    score_caches = ScoreCaches(cache) if cache is not None else None
+
+    percentages = sorted(set(per_edges)) if isinstance(per_edges, (list, tuple)) else [per_edges]
+    shared = {"graph": g,
+              "communities": communities,
+              "percentages": percentages,
+              "gmck_pre": gmck_pre,
+              "rwc_options": rwc_options,
+              "atlas_post_options": atlas_post_options,
+              "betweenness_options": betweenness_options,
+              "filename": filename,
+              "complete": complete,
+              "hybrid": hybrid,
+              "engine": engine,
+              "max_memory": max_memory,
+              "cache_per_edges": cache_per_edges,
+              "cache": score_caches,
+              "core": core}
+
+    if workers <= 1:
+        _init_worker(shared)
+        try:
+            rows = [row for alg in link_prediction_alg for row in collect_algorithm(alg)]
+        finally:
+            _init_worker(dict())
+    else:
+        rows = _collect_in_parallel(shared, link_prediction_alg, workers)
+
+    for row in rows:
+        row.update({"RWC_pre": rwc_pre.controversy,
+                    "RWC_pre_ci": rwc_pre.confidence_interval,
+                    "RWC_pre_walks": rwc_pre.walks,
+                    "GMCK_pre": gmck_pre.controversy,
+                    "ForceAtlas_pre": force_atlas_pre.controversy,
+                    "ForceAtlas_pre_ci": force_atlas_pre.confidence_interval})
+        df_result = df_result.append(row, ignore_index=True)
+
+    return df_result
+
+
+# read-only state shared by the algorithms of a single results() call, set once in every worker
+_shared = dict()
+
+
+def _init_worker(shared: dict):
+
+    global _shared
+    _shared = shared
+
+
+def collect_algorithm(alg: str):
+    """
+    Add the edges predicted by alg to an overlay of the shared graph and measure the controversy after
+
+    The edges are ranked once for the largest percentage, then added in rank order: the edges of a smaller
+    percentage are a prefix of them, so the controversy is measured at each percentage along the way
+
+    Parameter
+    ---------
+    alg : link prediction algorithm to use
 
-        if alg == 'JACCARD_COEFFICIENT':
-            given_values_state_of_art_alg = given_jaccard_value
-        elif alg == "ADAMIC_ADAR":
-            given_values_state_of_art_alg = given_adamic_adar_value
-        elif alg == "RESOURCE_ALLOCATION":
-            given_values_state_of_art_alg = given_resource_allocation_value
-        elif alg == "PREFERENTIAL_ATTACHMENT":
-            given_values_state_of_art_alg = given_preferential_attachment_value
+    Return
+    ------
+    rows : list of dict with the post measures and the number of edges of the result DataFrame,
+        one for each percentage
+    """
+    g = _shared["graph"]
+    communities = _shared["communities"]
+    percentages = _shared["percentages"]
+    per_edges = percentages[-1]
+    filename = _shared["filename"]
+    complete = _shared["complete"]
+    engine = _shared["engine"]
+    cache_per_edges = _shared["cache_per_edges"]
+    cache = _shared["cache"]
+    rwc_options = _shared["rwc_options"]
+    atlas_options = _shared["atlas_post_options"]
+    betweenness_options = _shared["betweenness_options"]
 
-        graph_copy = g.copy()
-        original_edges = len(graph_copy.edges)
-        print("Number edges before: {}".format(original_edges))
+    # the algorithms never modify g, their edges are added to overlays of it
+    original_edges = g.number_of_edges()
+    print("Number edges before: {}".format(original_edges))
 
-        if alg == "BETWEENNESS":
-            new_graph = LinkWithBetweenness(graph=graph_copy,
+    if alg == "BETWEENNESS":
+        new_graph = LinkWithBetweenness(graph=g,
+                                        communities=communities,
+                                        k=per_edges,
+                                        filename=filename,
+                                        cache=cache,
+                                        **betweenness_options)
+    elif alg == "EFFECTIVE_SIZE":
+        new_graph = LinkWithStructuralHoles(graph=g,
                                             communities=communities,
                                             k=per_edges,
                                             filename=filename,
-                                            given_betweenness_value=given_betweenness_value)
-        elif alg == "EFFECTIVE_SIZE":
-            new_graph = LinkWithStructuralHoles(graph=graph_copy,
-                                                communities=communities,
-                                                k=per_edges,
-                                                filename=filename,
-                                                given_effective_size=given_effective_size)
+                                            cache=cache)
+    else:
+        if _shared["hybrid"]:
+            new_graph = HybridLinkPrediction(graph=g,
+                                             communities=communities,
+                                             algorithm=alg,
+                                             k=per_edges,
+                                             filename=filename,
+                                             engine=engine,
+                                             max_memory=_shared["max_memory"],
+                                             cache_k=cache_per_edges,
+                                             cache=cache,
+                                             core=_shared["core"],
+                                             **betweenness_options)
+            alg = "BETWEENNESS + " + alg
         else:
-            if hybrid:
-                new_graph = HybridLinkPrediction(graph=graph_copy,
-                                                 communities=communities,
-                                                 algorithm=alg,
-                                                 k=per_edges,
-                                                 filename=filename,
-                                                 given_betweenness_value=given_betweenness_value,
-                                                 given_values=given_values_state_of_art_alg)
-                alg = "BETWEENNESS + " + alg
-            else:
-                new_graph = StateOfArtAlgorithm(graph=graph_copy,
-                                                communities=communities,
-                                                algorithm=alg,
-                                                k=per_edges,
-                                                filename=filename,
-                                                given_values=given_values_state_of_art_alg)
-
-        new_edges = len(new_graph.graph.edges)
-        percentage_edges_added = new_graph.percentage_edges_added
-        print("Number edges after: {}".format(new_edges))
+            new_graph = StateOfArtAlgorithm(graph=g,
+                                            communities=communities,
+                                            algorithm=alg,
+                                            k=per_edges,
+                                            filename=filename,
+                                            engine=engine,
+                                            max_memory=_shared["max_memory"],
+                                            cache_k=cache_per_edges,
+                                            cache=cache,
+                                            core=_shared["core"])
+
+    # add the ranked edges to the base graph one percentage at a time
+    added_edges = new_graph.added_edges
+    graph = OverlayGraph(g, _shared["core"])
+
+    rows = list()
+    n_added = 0
+    for percentage_edges_added in percentages:
+        number_edges = round(percentage_edges_added * original_edges)
+        graph.add_edges_from(added_edges[n_added:number_edges])
+        n_added = max(n_added, number_edges)
+
+        new_edges = graph.number_of_edges()
+        print("Number edges after adding {}: {}".format(percentage_edges_added, new_edges))
 
+        # GMCK is updated from the base graph, only the nodes touched by the added edges are visited
+        gmck_post = _shared["gmck_pre"].get_controversy_after(added_edges[:n_added])
         if complete:
-            gmck_post = GMCK(graph=new_graph.graph, communities=communities)
-            rwc_post = RandomWalkControversy(graph=new_graph.graph, communities=communities)
-            force_atlas_post = ForceAtlasControversy(graph=new_graph.graph, communities=communities)
+            rwc_post = RandomWalkControversy(graph=graph, communities=communities, **rwc_options)
+            force_atlas_post = ForceAtlasControversy(graph=graph, communities=communities, **atlas_options)
         else:
-            gmck_post = GMCK(graph=new_graph.graph, communities=communities)
-            rwc_post = RandomWalkControversy(graph=new_graph.graph, communities=communities, compute=complete)
-            force_atlas_post = ForceAtlasControversy(graph=new_graph.graph, communities=communities, compute=complete)
-
-        df_result = df_result.append(
-            {"Algorithm": alg,
-             "RWC_pre": rwc_pre.controversy,
-             "RWC_post": rwc_post.controversy,
-             "GMCK_pre": gmck_pre.controversy,
-             "GMCK_post": gmck_post.controversy,
-             "ForceAtlas_pre": force_atlas_pre.controversy,
-             "ForceAtlas_post": force_atlas_post.controversy,
-             "Original_edges": original_edges,
-             "New_edges": new_edges,
-             "Number_edges_added": new_edges - original_edges,
-             "Percentage_edges_added": percentage_edges_added
-             },
-            ignore_index=True
-        )
+            rwc_post = RandomWalkControversy(graph=graph, communities=communities, compute=complete, **rwc_options)
+            force_atlas_post = ForceAtlasControversy(graph=graph, communities=communities, compute=complete,
+                                                     **atlas_options)
 
-    return df_result
+        rows.append({"Algorithm": alg,
+                     "RWC_post": rwc_post.controversy,
+                     "RWC_post_ci": rwc_post.confidence_interval,
+                     "RWC_post_walks": rwc_post.walks,
+                     "GMCK_post": gmck_post,
+                     "ForceAtlas_post": force_atlas_post.controversy,
+                     "ForceAtlas_post_ci": force_atlas_post.confidence_interval,
+                     "Original_edges": original_edges,
+                     "New_edges": new_edges,
+                     "Number_edges_added": new_edges - original_edges,
+                     "Percentage_edges_added": percentage_edges_added})
+
+    return rows
+
+
+def _collect_algorithm_with_log(alg: str):
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        rows = collect_algorithm(alg)
+    return rows, log.getvalue()
+
+
+def _collect_in_parallel(shared: dict, link_prediction_alg: list, workers: int):
+
+    hybrid_algorithms = [alg for alg in link_prediction_alg if alg not in ["BETWEENNESS", "EFFECTIVE_SIZE"]]
+    betweenness_users = len(hybrid_algorithms) if shared["hybrid"] else 0
+    if "BETWEENNESS" in link_prediction_alg:
+        betweenness_users += 1
+    if betweenness_users > 1 and shared["cache"] is not None:
+        # compute the community betweenness once, so that the workers read it from the cache
+        print("Computing betweenness shared by {} algorithms".format(betweenness_users))
+        LinkWithBetweenness(graph=shared["graph"],
+                            communities=shared["communities"],
+                            k=0,
+                            filename=shared["filename"],
+                            cache=shared["cache"],
+                            **shared["betweenness_options"])
+
+    print("Running {} algorithms with {} workers".format(len(link_prediction_alg), workers))
+    algorithm_rows = [None] * len(link_prediction_alg)
+    # with fork the workers inherit the shared state, otherwise it is pickled once for each worker
+    with ProcessPoolExecutor(max_workers=workers, mp_context=process_context(),
+                             initializer=_init_worker, initargs=(shared,)) as executor:
+        futures = {executor.submit(_collect_algorithm_with_log, alg): position
+                   for position, alg in enumerate(link_prediction_alg)}
+        for future in as_completed(futures):
+            rows, log = future.result()
+            print(log, end='')
+            algorithm_rows[futures[future]] = rows
+
+    return [row for rows in algorithm_rows for row in rows]
@@ -0,0 +1,177 @@
+# define fast loading of weighted edge lists
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from common.utility import border_msg
+
+# extensions of the edge list files, optionally compressed with gzip
+EDGE_LIST_EXTENSIONS = (".txt", ".csv", ".txt.gz", ".csv.gz")
+# number of lines parsed at once
+CHUNK_LINES = 2 ** 20
+
+
+class EdgeList:
+    """
+    Edges of a graph as arrays of integer node ids, with the label of every id
+
+    The ids follow the order in which the nodes first appear in the file, which is also the order of the nodes
+    of the networkx graph read from the same file, and the edges keep the order of the file
+
+    Parameter
+    ---------
+    labels : list of node labels, indexed by node id
+    sources : id of the first node of every edge
+    targets : id of the second node of every edge
+    weights : weight of every edge
+    """
+
+    def __init__(self, labels: list, sources: np.ndarray, targets: np.ndarray, weights: np.ndarray):
+
+        self.labels = labels
+        self.index = {label: i for i, label in enumerate(labels)}
+        self.sources = sources
+        self.targets = targets
+        self.weights = weights
+
+    def __len__(self):
+        return len(self.sources)
+
+    @property
+    def n_nodes(self):
+        return len(self.labels)
+
+    def csr(self):
+        """
+        Return the symmetric CSR adjacency matrix of the undirected graph
+
+        As in networkx, an edge repeated in the file is kept once with its last weight
+        """
+        n_nodes = self.n_nodes
+        low = np.minimum(self.sources, self.targets).astype(np.int64)
+        high = np.maximum(self.sources, self.targets).astype(np.int64)
+        # the last occurrence of every edge is the first one of the reversed arrays
+        _, last = np.unique((low * n_nodes + high)[::-1], return_index=True)
+        last = len(low) - 1 - last
+        low, high, weights = low[last], high[last], self.weights[last]
+
+        loops = low == high
+        rows = np.concatenate((low, high[~loops]))
+        columns = np.concatenate((high, low[~loops]))
+        data = np.concatenate((weights, weights[~loops]))
+        return csr_matrix((data, (rows, columns)), shape=(n_nodes, n_nodes))
+
+    def to_networkx(self):
+        """
+        Return the undirected networkx graph with a weight attribute on every edge
+        """
+        labels = self.labels
+        graph = nx.Graph()
+        graph.add_nodes_from(labels)
+        graph.add_weighted_edges_from(zip([labels[i] for i in self.sources.tolist()],
+                                          [labels[i] for i in self.targets.tolist()],
+                                          self.weights.tolist()))
+        return graph
+
+
+def edge_list_from_networkx(graph: nx.Graph):
+    """
+    Return the EdgeList of an undirected networkx graph, with the node ids in the order of graph
+
+    The edges are put in an order in which adding them to an empty graph gives every node its neighbors in the
+    same order of graph, so that to_networkx rebuilds a graph that the algorithms walk exactly like graph.
+    If there is no such order (edges have been removed from graph) the order of graph.edges is used
+
+    Parameter
+    ---------
+    graph : nx.Graph
+    """
+    labels = list(graph)
+    index = {label: i for i, label in enumerate(labels)}
+    neighbours = [[index[neighbour] for neighbour in graph.adj[label]] for label in labels]
+    heads = [0] * len(labels)
+
+    def next_edge(u):
+        # the first edge of u not yet placed, if it is also the first one of the other node
+        if heads[u] == len(neighbours[u]):
+            return None
+        v = neighbours[u][heads[u]]
+        if v == u or (heads[v] < len(neighbours[v]) and neighbours[v][heads[v]] == u):
+            return v
+        return None
+
+    sources = list()
+    targets = list()
+    stack = list(range(len(labels)))
+    while stack:
+        u = stack.pop()
+        v = next_edge(u)
+        if v is None:
+            continue
+        sources.append(u)
+        targets.append(v)
+        heads[u] += 1
+        if v != u:
+            heads[v] += 1
+            stack.append(v)
+        stack.append(u)
+
+    if len(sources) != graph.number_of_edges():
+        sources, targets = zip(*[(index[u], index[v]) for u, v in graph.edges]) if graph.number_of_edges() else ((), ())
+    weights = [graph.adj[labels[u]][labels[v]].get("weight", 1.0) for u, v in zip(sources, targets)]
+    return EdgeList(labels, np.array(sources, dtype=np.int32), np.array(targets, dtype=np.int32),
+                    np.array(weights, dtype=np.float64))
+
+
+def is_edge_list(file: str):
+    """
+    Return True if file has the extension of an edge list file
+    """
+    return file.endswith(EDGE_LIST_EXTENSIONS)
+
+
+def read_edge_list(file: str, delimiter: str = ','):
+    """
+    Return the EdgeList of a file containing a pair of nodes and an optional weight on every line
+
+    It reads the same files of file_to_elist, and files ending with .gz are decompressed while they are read.
+    The two do not share their parsing: file_to_elist gives the fields of every line as strings, split in Python
+    one line at a time, while here chunks of lines go through the pandas C parser straight into id and weight
+    arrays, which is what makes the loading fast. Node labels are kept as strings; unlike file_to_elist,
+    blank lines are skipped
+
+    Parameter
+    ---------
+    file : path of the edge list, e.g. u,v,w lines
+    delimiter : string
+        kind of delimiter between the fields of a line
+
+    Return
+    ------
+    edge_list : EdgeList
+    """
+    labels = list()
+    index = dict()
+    codes = list()
+    weights = list()
+    reader = pd.read_csv(file, sep=delimiter, header=None, dtype={0: str, 1: str}, chunksize=CHUNK_LINES,
+                         compression="infer")
+    for chunk in reader:
+        # u and v of every line, one after the other: ids are given in order of first appearance
+        ends = chunk.iloc[:, :2].to_numpy().ravel()
+        for label in pd.unique(ends).tolist():
+            if label not in index:
+                index[label] = len(labels)
+                labels.append(label)
+        codes.append(pd.Series(ends).map(index).to_numpy(dtype=np.int32))
+        if chunk.shape[1] > 2:
+            weights.append(chunk.iloc[:, 2].to_numpy(dtype=np.float64))
+        else:
+            weights.append(np.ones(len(chunk)))
+
+    codes = np.concatenate(codes) if codes else np.zeros(0, dtype=np.int32)
+    weights = np.concatenate(weights) if weights else np.zeros(0)
+    border_msg("Number of edges: {}".format(len(weights)))
+    return EdgeList(labels, np.ascontiguousarray(codes[0::2]), np.ascontiguousarray(codes[1::2]), weights)
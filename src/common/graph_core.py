@@ -0,0 +1,307 @@
+# define compact integer-indexed graph
+
+import itertools
+
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from common.edge_list import EdgeList
+
+# side of a node: in the left community, in the right one or in neither
+LEFT = 0
+RIGHT = 1
+NO_SIDE = -1
+
+
+def community_sides(index: dict, communities: dict):
+    """
+    Return the side of every node and its position in the list of its community
+
+    Parameter
+    ---------
+    index : id of each node
+    communities : dict containing communities "0" (left) and "1" (right)
+
+    Return
+    ------
+    sides : array with the side of each node, LEFT, RIGHT or NO_SIDE
+    positions : array with the position of each node in the list of its community
+    """
+    sides = np.full(len(index), NO_SIDE, dtype=np.int8)
+    positions = np.zeros(len(index), dtype=np.int64)
+    for side, community in ((RIGHT, communities["1"]), (LEFT, communities["0"])):
+        # the first occurrence of a node in the community list is the one which counts
+        for position, node in reversed(list(enumerate(community))):
+            if node in index:
+                sides[index[node]] = side
+                positions[index[node]] = position
+    return sides, positions
+
+
+class GraphCore:
+    """
+    Undirected graph with contiguous integer node ids, built once and shared by the stages of the pipeline
+
+    The node ids follow the order of the nodes of the networkx graph, so that the arrays and the networkx
+    graph can be used together. The stages working on arrays (GMCK, RWC and ForceAtlas with the numpy engines,
+    the sparse similarity scores) read the CSR adjacency from here instead of converting the networkx graph
+    again, the others still use the networkx graph, see to_networkx.
+
+    Parameter
+    ---------
+    labels : list of node labels, indexed by node id
+    adjacency : symmetric CSR adjacency matrix with the weights of the edges
+    communities : dict containing communities "0" (left) and "1" (right), see assign_communities
+    """
+
+    def __init__(self, labels: list, adjacency: csr_matrix, communities: dict = None):
+
+        adjacency = csr_matrix(adjacency, dtype=np.float64)
+        adjacency.sort_indices()
+        self.labels = labels
+        self.index = {label: i for i, label in enumerate(labels)}
+        # no copy of the arrays already in the right type, e.g. memory-mapped from a snapshot
+        self.indptr = adjacency.indptr.astype(np.int64, copy=False)
+        self.indices = adjacency.indices.astype(np.int32, copy=False)
+        self.weights = adjacency.data
+        rows = np.repeat(np.arange(len(labels), dtype=np.int32), np.diff(self.indptr))
+        loops = rows == self.indices
+        # as in networkx, a self loop counts twice in the degree of its node
+        self.degree = (np.diff(self.indptr) + np.bincount(rows[loops], minlength=len(labels))).astype(np.int32)
+        self.sides = None
+        self.positions = None
+        if communities is not None:
+            self.assign_communities(communities)
+
+    @property
+    def n_nodes(self):
+        return len(self.labels)
+
+    @property
+    def n_edges(self):
+        rows = np.repeat(np.arange(self.n_nodes), np.diff(self.indptr))
+        return int(np.count_nonzero(rows <= self.indices))
+
+    def assign_communities(self, communities: dict):
+        """
+        Set the side of every node (int8: LEFT, RIGHT or NO_SIDE) and its position in the list of its community
+
+        Parameter
+        ---------
+        communities : dict containing communities "0" (left) and "1" (right)
+        """
+        self.sides, self.positions = community_sides(self.index, communities)
+
+    def adjacency(self, dtype=np.float64, copy: bool = True):
+        """
+        Return the CSR adjacency matrix with the weights of the edges
+
+        With copy False the matrix shares the arrays of the core when they already have the right type: it must
+        not be modified
+        """
+        return csr_matrix((self.weights.astype(dtype, copy=copy), self.indices, self.indptr),
+                          shape=(self.n_nodes, self.n_nodes))
+
+    def edges(self):
+        """
+        Return the (n_edges, 2) array of node ids of the edges, every edge once with the lower id first
+        """
+        rows = np.repeat(np.arange(self.n_nodes, dtype=np.int64), np.diff(self.indptr))
+        upper = rows <= self.indices
+        return np.stack((rows[upper], self.indices[upper].astype(np.int64)), axis=1)
+
+    def degree_order(self):
+        """
+        Return the node ids by decreasing degree, nodes with the same degree in the order of their ids
+        """
+        return np.argsort(-self.degree.astype(np.int64), kind="stable")
+
+    def to_networkx(self):
+        """
+        Return the networkx graph, with a weight attribute on every edge
+        """
+        graph = nx.Graph()
+        graph.add_nodes_from(self.labels)
+        u, v = self.edges().T
+        labels = self.labels
+        rows = np.repeat(np.arange(self.n_nodes), np.diff(self.indptr))
+        weights = self.weights[rows <= self.indices]
+        graph.add_weighted_edges_from(zip([labels[i] for i in u.tolist()], [labels[i] for i in v.tolist()],
+                                          weights.tolist()))
+        return graph
+
+
+def networkx_csr(graph: nx.Graph, nodelist: list = None, weight: str = 'weight', dtype=None):
+    """
+    Return the CSR adjacency matrix of a networkx graph
+
+    to_scipy_sparse_matrix was removed in networkx 3.0, to_scipy_sparse_array is used when available
+
+    Parameter
+    ---------
+    graph : nx.Graph
+    nodelist : order of the rows and columns, the order of graph if None
+    weight : edge attribute used as weight, None to use 1 for every edge
+    dtype : type of the matrix
+    """
+    convert = getattr(nx, "to_scipy_sparse_array", None) or nx.to_scipy_sparse_matrix
+    return csr_matrix(convert(graph, nodelist=nodelist, weight=weight, dtype=dtype, format='csr'))
+
+
+def core_from_networkx(graph: nx.Graph, communities: dict = None):
+    """
+    Return the GraphCore of an undirected networkx graph, with the node ids in the order of graph
+
+    Parameter
+    ---------
+    graph : nx.Graph
+    communities : dict containing communities "0" (left) and "1" (right)
+    """
+    labels = list(graph)
+    adjacency = networkx_csr(graph, nodelist=labels)
+    return GraphCore(labels, adjacency, communities)
+
+
+def core_from_edge_list(edge_list: EdgeList, communities: dict = None):
+    """
+    Return the GraphCore of an edge list, without building the networkx graph
+
+    Parameter
+    ---------
+    edge_list : EdgeList
+    communities : dict containing communities "0" (left) and "1" (right)
+    """
+    return GraphCore(edge_list.labels, edge_list.csr(), communities)
+
+
+class OverlayGraph:
+    """
+    Graph made of an immutable base graph and a few added edges, without copying the base graph
+
+    It answers the queries of the controversy measures: nodes, edges, neighbors, degree and has_edge, and it
+    gives the integer-indexed arrays of the added edges, so that GMCK, RWC and ForceAtlas reuse the GraphCore
+    of the base graph. Only the added edges are stored, to_networkx gives a networkx copy if it is needed
+
+    Parameter
+    ---------
+    graph : base nx.Graph, undirected and never modified
+    core : GraphCore of graph, built the first time it is needed if None
+    added_edges : edges to add, not already in graph
+    """
+
+    def __init__(self, graph: nx.Graph, core: GraphCore = None, added_edges: list = ()):
+
+        self.graph = graph
+        self.__core = core
+        self.added_edges = list()
+        self.added = dict()
+        self.add_edges_from(added_edges)
+
+    @property
+    def core(self):
+        if self.__core is None:
+            self.__core = core_from_networkx(self.graph)
+        return self.__core
+
+    @property
+    def nodes(self):
+        return self.graph.nodes
+
+    def __iter__(self):
+        return iter(self.graph)
+
+    def __contains__(self, node):
+        return node in self.graph
+
+    def __len__(self):
+        return len(self.graph)
+
+    @staticmethod
+    def is_directed():
+        return False
+
+    def number_of_edges(self):
+        return self.graph.number_of_edges() + len(self.added_edges)
+
+    def add_edge(self, u, v):
+        """
+        Add the edge (u, v), which must not be in the graph
+        """
+        self.added_edges.append((u, v))
+        self.added.setdefault(u, list()).append(v)
+        if u != v:
+            self.added.setdefault(v, list()).append(u)
+
+    def add_edges_from(self, edges: list):
+        for u, v in edges:
+            self.add_edge(u, v)
+
+    def has_edge(self, u, v):
+        return self.graph.has_edge(u, v) or v in self.added.get(u, ())
+
+    def neighbors(self, node):
+        """
+        Return the neighbors of node: the ones in the base graph, then the ones of the added edges
+        """
+        return itertools.chain(self.graph.neighbors(node), self.added.get(node, ()))
+
+    def degree(self, node):
+        return self.graph.degree(node) + len(self.added.get(node, ())) + (node in self.added.get(node, ()))
+
+    def edges(self):
+        """
+        Return the edges of the base graph, then the added ones
+        """
+        return itertools.chain(self.graph.edges(), self.added_edges)
+
+    def added_ids(self):
+        """
+        Return the (n_added, 2) array of node ids of the added edges
+        """
+        index = self.core.index
+        return np.array([(index[u], index[v]) for u, v in self.added_edges], dtype=np.int64).reshape(-1, 2)
+
+    def added_csr(self):
+        """
+        Return indptr and indices of the CSR adjacency made only of the added edges
+        """
+        ids = self.added_ids()
+        loops = ids[:, 0] == ids[:, 1]
+        tails = np.concatenate((ids[:, 0], ids[~loops, 1]))
+        heads = np.concatenate((ids[:, 1], ids[~loops, 0]))
+        order = np.argsort(tails, kind="stable")
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(tails, minlength=self.core.n_nodes))))
+        return indptr.astype(np.int64), heads[order]
+
+    def degree_array(self):
+        """
+        Return the degree of every node id
+        """
+        ids = self.added_ids()
+        return self.core.degree + np.bincount(ids.ravel(), minlength=self.core.n_nodes).astype(np.int32)
+
+    def degree_order(self):
+        """
+        Return the node ids by decreasing degree, nodes with the same degree in the order of their ids
+        """
+        return np.argsort(-self.degree_array().astype(np.int64), kind="stable")
+
+    def adjacency(self, dtype=np.float64):
+        """
+        Return the CSR adjacency matrix, the added edges have weight 1
+
+        The matrix is a copy of the base adjacency with the added edges: the measures read the adjacency of the
+        core and added_csr instead, only the networkx ForceAtlas layout needs the whole matrix
+        """
+        indptr, indices = self.added_csr()
+        added = csr_matrix((np.ones(len(indices), dtype=dtype), indices, indptr), shape=(self.core.n_nodes,) * 2)
+        return self.core.adjacency(dtype) + added
+
+    def to_networkx(self):
+        """
+        Return a networkx copy of the graph with the added edges
+        """
+        graph = self.graph.copy()
+        graph.add_edges_from(self.added_edges)
+        return graph
@@ -0,0 +1,155 @@
+# define caches for link prediction values
+
+import json
+import os
+from typing import Callable, Iterable
+
+import numpy as np
+
+from common.cache import GraphCache
+from common.utility import atomic_write
+
+# one record for each ranked edge: integer ids of the two nodes and the score
+EDGE_DTYPE = np.dtype([("u", "<i4"), ("v", "<i4"), ("score", "<f4")])
+
+
+class RankedEdges:
+    """
+    Edges ranked from the best to the worst, read from a binary cache
+
+    Parameter
+    ---------
+    records : structured array with columns u, v (node ids) and score, usually memory-mapped
+    labels : list of node labels, indexed by node id
+    n_candidates : number of candidate edges which have been ranked
+    """
+
+    def __init__(self, records: np.ndarray, labels: list, n_candidates: int):
+
+        self.records = records
+        self.labels = labels
+        self.n_candidates = n_candidates
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def complete(self):
+        """
+        True if every candidate edge has been cached, not only the best ones
+        """
+        return len(self.records) >= self.n_candidates
+
+    def covers(self, number_edges: int):
+        """
+        Return True if the cache is enough to select number_edges edges
+        """
+        return self.complete or len(self.records) >= number_edges
+
+    def top(self, number_edges: int):
+        """
+        Return the number_edges best edges as (u, v, score) tuples
+        """
+        records = self.records[:max(number_edges, 0)]
+        labels = self.labels
+        u_nodes = [labels[i] for i in records["u"].tolist()]
+        v_nodes = [labels[i] for i in records["v"].tolist()]
+        return list(zip(u_nodes, v_nodes, records["score"].tolist()))
+
+
+def write_ranked_edges(ranked_edges: Iterable, n_candidates: int, filename: str, path: str):
+    """
+    Write ranked (u, v, score) edges to a binary cache
+
+    Two files are written: filename.npy with the records and filename_labels.json with the labels
+    of the cached nodes and the number of ranked candidates
+
+    Parameter
+    ---------
+    ranked_edges : (u, v, score) tuples, from the best to the worst
+    n_candidates : number of candidate edges which have been ranked
+    filename : name of the cache
+    path : location of your file
+    """
+    index = dict()
+    ranked_edges = list(ranked_edges)
+    records = np.empty(len(ranked_edges), dtype=EDGE_DTYPE)
+    for position, (u, v, score) in enumerate(ranked_edges):
+        records[position] = (index.setdefault(u, len(index)), index.setdefault(v, len(index)), score)
+
+    # the old records may still be memory-mapped: replace the file instead of writing over it
+    with atomic_write(os.path.join(path, filename + ".npy"), 'wb') as npy_file:
+        np.save(npy_file, records)
+    with atomic_write(os.path.join(path, filename + "_labels.json")) as json_file:
+        json.dump({"candidates": n_candidates, "nodes": list(index)}, json_file)
+
+
+def read_ranked_edges(filename: str, path: str, mmap: bool = True):
+    """
+    Read ranked edges from a binary cache
+
+    Parameter
+    ---------
+    filename : name of the cache
+    path : location of your file
+    mmap : if True the records are memory-mapped instead of read
+    """
+    records = np.load(os.path.join(path, filename + ".npy"), mmap_mode="r" if mmap else None)
+    with open(os.path.join(path, filename + "_labels.json")) as json_file:
+        header = json.load(json_file)
+    return RankedEdges(records, header["nodes"], header["candidates"])
+
+
+class ScoreCaches:
+    """
+    Lazy access to the cached values of a graph, shared by the link prediction algorithms of a run
+
+    Nothing is read until an algorithm asks for it, then the values are kept, e.g. the betweenness is read
+    once for BETWEENNESS and every hybrid algorithm. Ranked edges are memory-mapped by read_ranked_edges, so only
+    the pages of the records actually selected are read from disk. A missing entry is looked up again at the
+    next request, so values written earlier in the run are reused. The entries live in a GraphCache
+
+    Parameter
+    ---------
+    cache : GraphCache storing the values
+    """
+
+    def __init__(self, cache: GraphCache):
+
+        self.cache = cache
+        self.loaded = dict()
+
+    def get(self, kind: str, params: dict, reader: Callable):
+        """
+        Return the cached values of kind computed with params, None if they are not in cache
+
+        Parameter
+        ---------
+        kind : kind of values, it is also the name of the cache folder
+        params : parameters used to compute the values
+        reader : function reading the values given the name of the entry and its folder
+        """
+        key = self.cache.key(kind, params)
+        if self.loaded.get(key) is None:
+            entry = self.cache.lookup(kind, params)
+            if entry is not None:
+                self.loaded[key] = reader(entry, self.cache.path(kind))
+        return self.loaded.get(key)
+
+    def put(self, kind: str, name: str, params: dict, writer: Callable):
+        """
+        Write the values of kind computed with params to a new entry of the cache
+
+        Parameter
+        ---------
+        kind : kind of values, it is also the name of the cache folder
+        name : readable prefix of the entry
+        params : parameters used to compute the values
+        writer : function writing the values given the name of the entry and its folder
+        """
+        entry = self.cache.entry_name(kind, name, params)
+        os.makedirs(self.cache.path(kind), exist_ok=True)
+        writer(entry, self.cache.path(kind))
+        self.cache.record(kind, entry, params)
+        # the values are read again from the new entry when they are needed
+        self.loaded.pop(self.cache.key(kind, params), None)
@@ -0,0 +1,189 @@
+# define binary snapshot of a preprocessed graph
+
+import hashlib
+import json
+import os
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from common.edge_list import EdgeList
+from common.graph_core import GraphCore
+from common.utility import atomic_write
+
+SNAPSHOT_EXTENSION = ".snap"
+# first bytes of every snapshot, the last two are the version of the format
+MAGIC = b"ECSNAP01"
+# the header and every array start at a multiple of ALIGNMENT bytes
+ALIGNMENT = 64
+# bytes of the source file hashed at once
+READ_SIZE = 2 ** 20
+
+
+def source_digest(file_path: str):
+    """
+    Return the sha1 digest of the content of a file
+
+    Parameter
+    ---------
+    file_path : path of the file
+    """
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_metadata(file_path: str):
+    """
+    Return the size and the modification time of a file, which tell if it may have changed without reading it
+
+    Parameter
+    ---------
+    file_path : path of the file
+    """
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class GraphSnapshot:
+    """
+    Preprocessed graph read from a snapshot, its arrays are memory-mapped
+
+    Parameter
+    ---------
+    source : sha1 digest of the file the graph was read from
+    digest : digest of the graph, see graph_digest
+    edge_list : edges in the order rebuilding the networkx graph of the source, see edge_list_from_networkx
+    core : GraphCore of the graph
+    communities : dict mapping the name of a community detection algorithm to its communities
+    metadata : size and modification time of the source file, see source_metadata
+    """
+
+    def __init__(self, source: str, digest: str, edge_list: EdgeList, core: GraphCore, communities: dict = None,
+                 metadata: dict = None):
+
+        self.source = source
+        self.digest = digest
+        self.edge_list = edge_list
+        self.core = core
+        self.communities = communities if communities else dict()
+        self.metadata = metadata
+
+    @property
+    def labels(self):
+        return self.core.labels
+
+    def to_networkx(self):
+        """
+        Return the networkx graph, with a weight attribute on every edge
+        """
+        return self.edge_list.to_networkx()
+
+
+def write_snapshot(file_path: str, snapshot: GraphSnapshot):
+    """
+    Write a snapshot in a single file which can be memory-mapped
+
+    The file starts with MAGIC and the length of a json header, which holds the digests, the metadata of the source,
+    the names of the communities and the offset, dtype and shape of every array; the arrays follow the header.
+    Node labels must be strings, they are stored in a single array separated by null characters
+
+    Parameter
+    ---------
+    file_path : path of the snapshot
+    snapshot : GraphSnapshot
+    """
+    core = snapshot.core
+    edge_list = snapshot.edge_list
+    arrays = {"labels": np.frombuffer("\0".join(snapshot.labels).encode(), dtype=np.uint8),
+              "indptr": core.indptr,
+              "indices": core.indices,
+              "weights": core.weights,
+              "sources": edge_list.sources,
+              "targets": edge_list.targets,
+              "edge_weights": edge_list.weights}
+    communities = dict()
+    for algorithm, partition in snapshot.communities.items():
+        names = list(partition)
+        # every community is a slice of members, which keep the order of the community list
+        arrays["members_" + algorithm] = np.array([core.index[node] for name in names for node in partition[name]],
+                                                  dtype=np.int32)
+        arrays["sizes_" + algorithm] = np.array([len(partition[name]) for name in names], dtype=np.int64)
+        communities[algorithm] = names
+
+    layout = dict()
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps({"source": snapshot.source, "digest": snapshot.digest, "metadata": snapshot.metadata,
+                         "n_labels": len(snapshot.labels), "communities": communities, "arrays": layout}).encode()
+    start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    # an older snapshot may still be memory-mapped: replace the file instead of writing over it
+    with atomic_write(file_path, 'wb') as snapshot_file:
+        snapshot_file.write(MAGIC)
+        snapshot_file.write(np.uint64(len(header)).tobytes())
+        snapshot_file.write(header)
+        for name, array in arrays.items():
+            snapshot_file.write(b"\0" * (start + layout[name]["offset"] - snapshot_file.tell()))
+            snapshot_file.write(array.tobytes())
+
+
+def read_snapshot(file_path: str, source_file: str = None):
+    """
+    Read a snapshot written by write_snapshot, memory-mapping its arrays
+
+    The snapshot is valid if the source file has the size and the modification time recorded in the snapshot,
+    otherwise the source file is hashed and compared with the digest recorded in the snapshot, so a valid
+    snapshot is read without reading the source file. The metadata of the returned snapshot is the recorded one
+
+    Parameter
+    ---------
+    file_path : path of the snapshot
+    source_file : path of the file the snapshot was written for, the snapshot is not validated if None
+
+    Return
+    ------
+    snapshot : GraphSnapshot, None if the file is missing, is not a valid snapshot or was written for a different
+        content of the source file
+    """
+    if not os.path.exists(file_path) or os.path.getsize(file_path) < len(MAGIC) + 8:
+        return None
+    buffer = np.memmap(file_path, dtype=np.uint8, mode='r')
+    if buffer[:len(MAGIC)].tobytes() != MAGIC:
+        print("{} is not a valid snapshot".format(file_path))
+        return None
+    header_size = int(buffer[len(MAGIC):len(MAGIC) + 8].view(np.uint64)[0])
+    header = json.loads(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + header_size].tobytes().decode())
+    if source_file is not None and header.get("metadata") != source_metadata(source_file):
+        # the source file was touched or replaced: its content decides
+        if header["source"] != source_digest(source_file):
+            print("Snapshot {} is out of date".format(file_path))
+            return None
+
+    start = -(-(len(MAGIC) + 8 + header_size) // ALIGNMENT) * ALIGNMENT
+    arrays = dict()
+    for name, entry in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        size = int(np.prod(entry["shape"])) * dtype.itemsize
+        offset = start + entry["offset"]
+        arrays[name] = buffer[offset:offset + size].view(dtype).reshape(entry["shape"])
+
+    labels = arrays["labels"].tobytes().decode().split("\0") if header["n_labels"] else list()
+    n_nodes = len(labels)
+    adjacency = csr_matrix((arrays["weights"], arrays["indices"], arrays["indptr"]), shape=(n_nodes, n_nodes))
+    core = GraphCore(labels, adjacency)
+    edge_list = EdgeList(labels, arrays["sources"], arrays["targets"], arrays["edge_weights"])
+
+    communities = dict()
+    for algorithm, names in header["communities"].items():
+        bounds = np.concatenate(([0], np.cumsum(arrays["sizes_" + algorithm])))
+        members = arrays["members_" + algorithm].tolist()
+        communities[algorithm] = {name: [labels[i] for i in members[bounds[j]:bounds[j + 1]]]
+                                  for j, name in enumerate(names)}
+    return GraphSnapshot(header["source"], header["digest"], edge_list, core, communities, header.get("metadata"))
@@ -1,7 +1,10 @@
 # define some common useful functions
 
+import gzip
 import json
+import multiprocessing
 import os
+from contextlib import contextmanager
 from typing import Dict
 
 import networkx as nx
@@ -78,7 +81,7 @@ def file_to_elist(file, delimiter: str):
 
     Parameter
     ---------
-    file : file representing an edge list representation of a graph
+    file : file representing an edge list representation of a graph, compressed with gzip if it ends with .gz
     delimiter : string
         kind of delimiter between two nodes in the file
     Return
@@ -86,7 +89,7 @@ def file_to_elist(file, delimiter: str):
     elist: list of edges
     """
     elist = list()
-    with open(file) as f:
+    with (gzip.open(file, 'rt') if file.endswith('.gz') else open(file)) as f:
         for line in f:
             line = tuple(line.strip().split(delimiter))
             elist.append(line)
@@ -139,6 +142,40 @@ def write_communities(communities: Dict[int, set], filename: str, path: str = ".
     print("all communities have been written")
 
 
+def process_context():
+    """
+    Return the multiprocessing context used by the process pools
+
+    fork is used where available, so that the workers inherit the memory of the parent instead of
+    receiving a pickled copy of the state given to the pool initializer
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+@contextmanager
+def atomic_write(file_path: str, mode: str = 'w'):
+    """
+    Open a temporary file which replaces file_path only once it has been completely written
+
+    Readers, and other processes writing the same file, never see a partially written file
+
+    Parameter
+    ---------
+    file_path : path of the file to write
+    mode : mode used to open the temporary file
+    """
+    temporary_path = "{}.{}.tmp".format(file_path, os.getpid())
+    try:
+        with open(temporary_path, mode) as file:
+            yield file
+        os.replace(temporary_path, file_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
 def write_dict_to_json(dict_to_write: dict, filename: str, path: str):
     """
     Write dict to json
@@ -151,7 +188,7 @@ def write_dict_to_json(dict_to_write: dict, filename: str, path: str):
     """
     if not filename.endswith('.json'):
         filename = filename + '.json'
-    with open(os.path.join(path, filename), 'w') as json_file:
+    with atomic_write(os.path.join(path, filename)) as json_file:
         json.dump(dict_to_write, json_file)
 
 
@@ -165,7 +202,7 @@ def write_dict_to_yaml(dict_to_write: dict, filename: str, path: str):
     filename : name for txt
     path : location of your file
     """
-    with open(os.path.join(path, filename), 'w') as yaml_file:
+    with atomic_write(os.path.join(path, filename)) as yaml_file:
         yaml.dump(dict_to_write, yaml_file)
 
 
@@ -6,7 +6,8 @@ from typing import Dict
 import networkx as nx
 from networkx.algorithms import community
 
-from common.utility import print_element
+from common.cache import GraphCache
+from common.utility import print_element, read_json_to_dict, write_dict_to_json
 
 
 @unique
@@ -19,7 +20,14 @@ class CommunityDetection:
     algorithms = [Algorithm.KERNIGHAN_LIN.value,
                   Algorithm.FLUIDC.value]
 
-    def __init__(self, graph: nx.Graph, algorithm: str, given_communities: dict = None, k: int = 2):
+    def __init__(self,
+                 graph: nx.Graph,
+                 algorithm: str,
+                 given_communities: dict = None,
+                 k: int = 2,
+                 seed: int = 10,
+                 cache: GraphCache = None,
+                 filename: str = None):
 
         self.graph = graph
         if algorithm.upper() not in self.algorithms:
@@ -27,7 +35,27 @@ class CommunityDetection:
             print_element(self.algorithms)
             raise ValueError("algorithm not valid")
         self.algorithm = algorithm
-        self.communities = given_communities if given_communities else self.get_community(k)
+        self.seed = seed
+        self.cache = cache
+        self.filename = filename if filename else algorithm.lower()
+        self.communities = given_communities if given_communities else self.__get_cached_community(k)
+
+    def __get_cached_community(self, k):
+
+        if self.cache is None:
+            return self.get_community(k)
+
+        params = {"algorithm": self.algorithm.upper(), "k": k, "seed": self.seed}
+        entry = self.cache.lookup("community", params)
+        if entry is not None:
+            print("Getting communities from file")
+            return read_json_to_dict(entry, self.cache.path("community"))
+
+        communities = self.get_community(k)
+        entry = self.cache.entry_name("community", self.filename, params)
+        write_dict_to_json(communities, entry, self.cache.path("community"))
+        self.cache.record("community", entry, params)
+        return communities
 
     def get_community(self, k):
 
@@ -36,12 +64,12 @@ class CommunityDetection:
         communities: Dict[str, list] = dict()
 
         if self.algorithm.upper() == Algorithm.KERNIGHAN_LIN.value:
-            partitions = community.kernighan_lin_bisection(self.graph)
+            partitions = community.kernighan_lin_bisection(self.graph, seed=self.seed)
             for p in range(len(partitions)):
                 communities[str(p)] = list(partitions[p])
 
         elif self.algorithm.upper() == Algorithm.FLUIDC.value:
-            partitions = community.asyn_fluidc(self.graph, k, seed=10)
+            partitions = community.asyn_fluidc(self.graph, k, seed=self.seed)
             for p in range(k):
                 communities[str(p)] = list(next(partitions))
 
@@ -0,0 +1,270 @@
+# define vectorized boundary connectivity (GMCK)
+
+import networkx as nx
+import numpy as np
+
+from common.graph_core import LEFT, RIGHT, NO_SIDE, community_sides
+
+
+def index_graph(graph: nx.Graph, communities: dict):
+    """
+    Return the integer-indexed representation of a graph and of its two communities
+
+    Parameter
+    ---------
+    graph : nx.Graph
+    communities : dict containing communities "0" (left) and "1" (right)
+
+    Return
+    ------
+    nodes : list of node labels, indexed by node id
+    edges : (n_edges, 2) array of node ids, in the order of graph.edges
+    sides : array with the side of each node, LEFT, RIGHT or NO_SIDE
+    positions : array with the position of each node in the list of its community
+    """
+    nodes = list(graph)
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = np.array([(index[u], index[v]) for u, v in graph.edges()], dtype=np.int64).reshape(-1, 2)
+    sides, positions = community_sides(index, communities)
+    return nodes, edges, sides, positions
+
+
+class BoundaryConnectivity:
+    """
+    Boundary connectivity controversy (GMCK) computed with masks and bincount over an edge array
+
+    A node is on the cut if it has an edge to the other side, it is on the boundary if it is on the cut
+    and it also has a neighbour of its own side which is not on the cut. For every boundary node
+    the internal edges (to its side, off the cut) and the across edges (to the boundary of the other side)
+    are counted; the score is the mean over the boundary of internal / (internal + across) - 0.5.
+    The terms are added in the order used by GMCK on networkx, so the score is exactly the same.
+
+    For undirected graphs controversy_after(added_edges) gives the score once some edges are added, updating
+    only the nodes affected by the new edges: the per-node counters of the base graph are computed once
+    and never modified, so the same instance serves every set of added edges.
+
+    Parameter
+    ---------
+    edges : (n_edges, 2) array of node ids
+    sides : array with the side of each node, LEFT, RIGHT or NO_SIDE
+    positions : array with the position of each node in the list of its community
+    directed : True if edges are directed, then only left -> right edges cross the cut
+    """
+
+    def __init__(self, edges: np.ndarray, sides: np.ndarray, positions: np.ndarray, directed: bool = False):
+
+        self.edges = edges
+        self.sides = sides
+        self.positions = positions
+        self.directed = directed
+        # incremental state, built by the first call of controversy_after
+        self.__state = None
+        self.__indptr = None
+        self.__indices = None
+        self.__boundary = None
+        self.__n_cut = 0
+
+    def controversy(self):
+        """
+        Return the GMCK score rounded to 4 decimals
+        """
+        n_nodes = len(self.sides)
+        sides = self.sides
+        u = self.edges[:, 0]
+        v = self.edges[:, 1]
+        labelled = (sides[u] != NO_SIDE) & (sides[v] != NO_SIDE)
+        same_side = labelled & (sides[u] == sides[v])
+
+        if self.directed:
+            cross = (sides[u] == LEFT) & (sides[v] == RIGHT)
+        else:
+            cross = labelled & (sides[u] != sides[v])
+        on_cut = np.zeros(n_nodes, dtype=bool)
+        on_cut[u[cross]] = True
+        on_cut[v[cross]] = True
+
+        # second condition: a neighbour of the same side which is not on the cut
+        if self.directed:
+            tails, heads = u, v
+            internal_neighbour = same_side
+        else:
+            tails, heads = np.concatenate((u, v)), np.concatenate((v, u))
+            internal_neighbour = np.concatenate((same_side, same_side))
+        internal_neighbour = internal_neighbour & on_cut[tails] & ~on_cut[heads]
+        boundary = on_cut & (np.bincount(tails[internal_neighbour], minlength=n_nodes) > 0)
+
+        # an edge between boundary nodes of the same side counts neither as internal nor as across
+        internal = np.zeros(n_nodes, dtype=np.int64)
+        across = np.zeros(n_nodes, dtype=np.int64)
+        for a, b in ((u, v), (v, u)):
+            internal += np.bincount(a[boundary[a] & same_side & ~on_cut[b]], minlength=n_nodes)
+            across += np.bincount(a[boundary[a] & labelled & ~same_side & boundary[b]], minlength=n_nodes)
+
+        partner = np.full(n_nodes, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(partner, u[cross], self.positions[v[cross]])
+        np.minimum.at(partner, v[cross], self.positions[u[cross]])
+
+        nodes = np.flatnonzero(boundary)
+        return self.__score(nodes, internal[nodes], across[nodes], partner[nodes], int(on_cut.sum()))
+
+    def controversy_after(self, added_edges: np.ndarray):
+        """
+        Return the GMCK score rounded to 4 decimals of the graph with added_edges, the same of controversy()
+        computed on the whole graph
+
+        Parameter
+        ---------
+        added_edges : (n_added, 2) array of node ids of new edges, not already in the graph
+        """
+        added_edges = np.asarray(added_edges, dtype=np.int64).reshape(-1, 2)
+        if self.directed:
+            edges = np.concatenate((self.edges, added_edges))
+            return BoundaryConnectivity(edges, self.sides, self.positions, directed=True).controversy()
+
+        if self.__state is None:
+            self.__state = self.__base_state()
+        on_cut, internal, across, partner, on_boundary = self.__state
+        sides = self.sides
+
+        tails = np.concatenate((added_edges[:, 0], added_edges[:, 1]))
+        heads = np.concatenate((added_edges[:, 1], added_edges[:, 0]))
+        labelled = (sides[tails] != NO_SIDE) & (sides[heads] != NO_SIDE)
+        same_side = labelled & (sides[tails] == sides[heads])
+        cross = labelled & ~same_side
+
+        # new edges only add nodes to the cut
+        new_cut = np.unique(tails[cross & ~on_cut[tails]])
+
+        def is_cut(nodes):
+            return on_cut[nodes] | _contains(new_cut, nodes)
+
+        # internal: same side neighbours off the cut. The same side neighbours of a new cut node lose it,
+        # a new same side edge adds its other end if that is off the cut
+        arc_tails, arc_heads = self.__arcs(new_cut)
+        lost = arc_heads[sides[arc_heads] == sides[arc_tails]]
+        gained = tails[same_side & ~is_cut(heads)]
+        internal_nodes, internal_delta = _sum_by_node(np.concatenate((lost, gained)),
+                                                      np.concatenate((-np.ones(len(lost), dtype=np.int64),
+                                                                      np.ones(len(gained), dtype=np.int64))))
+
+        def get_internal(nodes):
+            return internal[nodes] + _lookup(internal_nodes, internal_delta, nodes)
+
+        def is_boundary(nodes):
+            return is_cut(nodes) & (get_internal(nodes) > 0)
+
+        candidates = np.union1d(new_cut, internal_nodes)
+        flipped = candidates[is_boundary(candidates) != on_boundary[candidates]]
+
+        # across: neighbours of the other side on the boundary. The other side neighbours of a flipped node
+        # gain or lose it, a new cross edge adds its other end if that is on the boundary
+        arc_tails, arc_heads = self.__arcs(flipped)
+        other_side = (sides[arc_heads] != NO_SIDE) & (sides[arc_heads] != sides[arc_tails])
+        changes = np.where(is_boundary(arc_tails[other_side]), 1, -1)
+        gained = tails[cross & is_boundary(heads)]
+        across_nodes, across_delta = _sum_by_node(np.concatenate((arc_heads[other_side], gained)),
+                                                  np.concatenate((changes, np.ones(len(gained), dtype=np.int64))))
+
+        # the first cross partner of a node can only move to a lower position
+        partner_nodes = np.unique(tails[cross])
+        new_partner = partner[partner_nodes].copy()
+        np.minimum.at(new_partner, np.searchsorted(partner_nodes, tails[cross]), self.positions[heads[cross]])
+
+        nodes = np.union1d(self.__boundary, flipped)
+        nodes = nodes[is_boundary(nodes)]
+        node_across = across[nodes] + _lookup(across_nodes, across_delta, nodes)
+        node_partner = partner[nodes].copy()
+        updated = _contains(partner_nodes, nodes)
+        node_partner[updated] = new_partner[np.searchsorted(partner_nodes, nodes[updated])]
+        n_cut = self.__n_cut + len(new_cut)
+        return self.__score(nodes, get_internal(nodes), node_across, node_partner, n_cut)
+
+    def __arcs(self, nodes: np.ndarray):
+        # (tail, head) pairs of the base edges leaving nodes
+
+        starts = self.__indptr[nodes]
+        counts = self.__indptr[nodes + 1] - starts
+        tails = np.repeat(nodes, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        heads = self.__indices[np.repeat(starts, counts) + offsets]
+        return tails, heads
+
+    def __base_state(self):
+        # per-node counters of the base graph, read by controversy_after
+
+        n_nodes = len(self.sides)
+        sides = self.sides
+        tails = np.concatenate((self.edges[:, 0], self.edges[:, 1]))
+        heads = np.concatenate((self.edges[:, 1], self.edges[:, 0]))
+        order = np.argsort(tails, kind="stable")
+        self.__indptr = np.concatenate(([0], np.cumsum(np.bincount(tails, minlength=n_nodes))))
+        self.__indices = heads[order]
+
+        labelled = (sides[tails] != NO_SIDE) & (sides[heads] != NO_SIDE)
+        same_side = labelled & (sides[tails] == sides[heads])
+        cross = labelled & ~same_side
+        on_cut = np.bincount(tails[cross], minlength=n_nodes) > 0
+
+        internal = np.bincount(tails[same_side & ~on_cut[heads]], minlength=n_nodes)
+        boundary = on_cut & (internal > 0)
+        across = np.bincount(tails[cross & boundary[heads]], minlength=n_nodes)
+
+        # position in the other community of the first cross partner, it sets the order of the cut
+        partner = np.full(n_nodes, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(partner, tails[cross], self.positions[heads[cross]])
+
+        self.__boundary = np.flatnonzero(boundary)
+        self.__n_cut = int(on_cut.sum())
+        return on_cut, internal, across, partner, boundary
+
+    def __score(self, nodes: np.ndarray, internal: np.ndarray, across: np.ndarray, partner: np.ndarray, n_cut: int):
+        # score of the boundary nodes, given their counters and the position of their first cross partner
+
+        n_boundary = len(nodes)
+        if n_boundary == 0:
+            if n_cut == len(self.sides):
+                return -0.5
+            elif n_cut == 0:
+                return 0.5
+            return 0.0
+
+        # a left node enters the cut at the pair (its position, partner), a right one at (partner, its position)
+        left = self.sides[nodes] == LEFT
+        first = np.where(left, self.positions[nodes], partner)
+        second = np.where(left, partner, self.positions[nodes])
+        order = np.lexsort((~left, second, first))
+
+        internal = internal[order]
+        across = across[order]
+        scored = (internal > 0) & (across > 0)
+        terms = internal[scored] / (internal[scored] + across[scored]) - 0.5
+        # accumulate adds the terms one after the other, as the networkx implementation does
+        polarization_score = float(np.add.accumulate(terms)[-1]) if len(terms) else 0.0
+        return round(polarization_score / n_boundary, 4)
+
+
+def _contains(sorted_nodes: np.ndarray, nodes: np.ndarray):
+    # mask of the nodes which are in sorted_nodes
+
+    if len(sorted_nodes) == 0:
+        return np.zeros(len(nodes), dtype=bool)
+    position = np.minimum(np.searchsorted(sorted_nodes, nodes), len(sorted_nodes) - 1)
+    return sorted_nodes[position] == nodes
+
+
+def _lookup(sorted_nodes: np.ndarray, values: np.ndarray, nodes: np.ndarray):
+    # value of each node in sorted_nodes, 0 for the nodes which are missing
+
+    result = np.zeros(len(nodes), dtype=np.int64)
+    found = _contains(sorted_nodes, nodes)
+    result[found] = values[np.searchsorted(sorted_nodes, nodes[found])]
+    return result
+
+
+def _sum_by_node(nodes: np.ndarray, values: np.ndarray):
+    # sorted unique nodes with the sum of their values
+
+    unique_nodes, inverse = np.unique(nodes, return_inverse=True)
+    sums = np.zeros(len(unique_nodes), dtype=np.int64)
+    np.add.at(sums, inverse, values)
+    return unique_nodes, sums
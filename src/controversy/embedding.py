@@ -0,0 +1,123 @@
+# define vectorized embedding controversy
+
+import math
+
+import numpy as np
+from scipy.spatial.distance import cdist
+from scipy.stats import norm
+
+# number of pairs of positions whose distances are computed at once
+TILE_SIZE = 2 ** 20
+
+
+def distance_sum(positions: np.ndarray, other: np.ndarray = None, tile_size: int = TILE_SIZE):
+    """
+    Return the sum of the distances of the pairs of positions, and the number of pairs
+
+    Without other the pairs are the unordered pairs of distinct positions, otherwise every position is paired with
+    every position of other. The distances are computed by tiles of rows, so the memory used does not depend on n^2
+
+    Parameter
+    ---------
+    positions : (n, dim) positions
+    other : (m, dim) positions
+    tile_size : largest number of distances of a tile
+
+    Return
+    ------
+    total : sum of the distances
+    count : number of pairs
+    """
+    within = other is None
+    if within:
+        other = positions
+    rows = max(1, tile_size // max(len(other), 1))
+    total = 0.0
+    for start in range(0, len(positions), rows):
+        total += float(cdist(positions[start:start + rows], other).sum())
+    if within:
+        # every unordered pair is counted twice, the distance of a position from itself is 0
+        return total / 2, len(positions) * (len(positions) - 1) // 2
+    return total, len(positions) * len(other)
+
+
+def sampled_distance_mean(positions: np.ndarray, other: np.ndarray = None, sample_size: int = 100000,
+                          rng: np.random.Generator = None):
+    """
+    Return an estimate of the mean distance of the pairs of positions from sample_size random pairs
+
+    The pairs are the ones of distance_sum and they are drawn uniformly with replacement, so the estimate is
+    unbiased and its variance is the variance of the sampled distances divided by sample_size
+
+    Parameter
+    ---------
+    positions : (n, dim) positions
+    other : (m, dim) positions
+    sample_size : number of sampled pairs
+    rng : random generator used to draw the pairs
+
+    Return
+    ------
+    mean : estimated mean distance
+    variance : variance of the estimate
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    first = rng.integers(0, len(positions), sample_size)
+    if other is None:
+        # a position different from the first one, chosen uniformly
+        second = (first + rng.integers(1, len(positions), sample_size)) % len(positions)
+        other = positions
+    else:
+        second = rng.integers(0, len(other), sample_size)
+    distances = np.sqrt(((positions[first] - other[second]) ** 2).sum(axis=1))
+    return float(distances.mean()), float(distances.var(ddof=1)) / sample_size
+
+
+def embedding_controversy(left: np.ndarray, right: np.ndarray, sample_size: int = None, seed: int = None,
+                          confidence: float = 0.95, tile_size: int = TILE_SIZE):
+    """
+    Return the embedding controversy 1 - (d_left + d_right) / (2 * d_cross) of the positions of two communities
+
+    d_left and d_right are the mean distances within each community, d_cross the mean distance between them.
+    With sample_size, a mean over more than sample_size pairs is estimated from sample_size random pairs
+    (see sampled_distance_mean), and the half width of the confidence interval of the score comes from the
+    variances of the estimates (delta method). Otherwise every mean is exact and the half width is 0
+
+    Parameter
+    ---------
+    left : (n, dim) positions of the left community
+    right : (m, dim) positions of the right community
+    sample_size : largest number of pairs of an exact mean, at least 2 as the variance of the sampled distances
+        needs two of them, None to compute every mean exactly
+    seed : seed of the sampled pairs
+    confidence : confidence level of the interval
+    tile_size : largest number of distances computed at once
+
+    Return
+    ------
+    score : embedding controversy
+    half_width : half width of the confidence interval of score
+    """
+    if sample_size is not None and sample_size < 2:
+        print("The sample size must be at least 2")
+        raise ValueError("sample_size not valid")
+    rng = np.random.default_rng(seed)
+    means = list()
+    variances = list()
+    for positions, other in ((left, None), (right, None), (left, right)):
+        n_pairs = len(positions) * (len(positions) - 1) // 2 if other is None else len(positions) * len(other)
+        if sample_size is not None and n_pairs > sample_size:
+            mean, variance = sampled_distance_mean(positions, other, sample_size, rng)
+        else:
+            total, count = distance_sum(positions, other, tile_size)
+            mean, variance = total / count, 0.0
+        means.append(mean)
+        variances.append(variance)
+
+    (left_mean, right_mean, cross_mean), (left_variance, right_variance, cross_variance) = means, variances
+    score = 1 - (left_mean + right_mean) / (2 * cross_mean)
+    variance = (left_variance + right_variance) / (4 * cross_mean ** 2) + \
+        (left_mean + right_mean) ** 2 * cross_variance / (4 * cross_mean ** 4)
+    half_width = norm.ppf(0.5 + confidence / 2) * math.sqrt(variance)
+    return score, half_width
@@ -0,0 +1,329 @@
+# define vectorized force-directed layouts
+
+import itertools
+from functools import lru_cache
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# positions closer than this are considered at this distance, as in the networkx layout
+MIN_DISTANCE = 0.01
+# number of (point, cell) or (point, point) interactions evaluated at once
+CHUNK_SIZE = 2 ** 18
+
+
+class ForceAtlasLayout:
+    """
+    Force-directed layout of ForceAtlasControversy, with the forces computed on arrays
+
+    At each iteration every node is pushed away from every other node by k^2 / d (repulsion) and pulled
+    towards its neighbours by w * d^2 / k (attraction), then it moves by the current temperature in the
+    direction of the resulting force; the temperature decreases linearly to 0. The options are the ones
+    of the networkx layout: with nohubs the repulsion of a node is divided by its degree + 1, with linlog
+    the repulsion factor k^2 / d^2 becomes log(1 + k^2 / d^2).
+
+    The attraction is summed over the edges of the CSR adjacency. The repulsion is approximated on a
+    hierarchy of grids (see grid_repulsion), so an iteration costs O(n log n) instead of O(n^2). With exact
+    the repulsion is summed over all the pairs of nodes instead, by tiles of rows (see exact_repulsion): an
+    iteration then moves the nodes as the networkx layout does, to float32 precision. The networkx layout runs in
+    float32 and this one in float64, and the layout amplifies these rounding differences, so after many iterations
+    the positions diverge while the scores measured on them stay close.
+
+    Parameter
+    ---------
+    adjacency : CSR adjacency matrix, with the weights of the edges
+    k : optimal distance between nodes, sqrt(1 / n) if None
+    linlog : use the logarithmic repulsion
+    nohubs : divide the repulsion of a node by its degree + 1
+    theta : tolerance of the repulsion, lower is more accurate and slower
+    exact : compute the exact repulsion, theta is then ignored
+    tile_size : largest number of pairs of nodes of a tile of the exact repulsion
+    added : indptr and indices of the CSR adjacency of edges of weight 1 added to adjacency, e.g. the added edges
+        of an OverlayGraph (see OverlayGraph.added_csr), so that adjacency is read without being copied
+    """
+
+    def __init__(self, adjacency: csr_matrix, k: float = None, linlog: bool = False, nohubs: bool = False,
+                 theta: float = 1.0, exact: bool = False, tile_size: int = CHUNK_SIZE, added: tuple = None):
+
+        # no copy of an adjacency already in float64, e.g. the one of a GraphCore
+        adjacency = csr_matrix(adjacency, dtype=np.float64)
+        self.n_nodes = adjacency.shape[0]
+        self.k = k if k is not None else np.sqrt(1.0 / self.n_nodes)
+        self.linlog = linlog
+        self.theta = theta
+        self.exact = exact
+        self.tile_size = tile_size
+        self.iterations_done = None
+
+        self.adjacencies = [adjacency]
+        if added is not None:
+            indptr, indices = added
+            self.adjacencies.append(csr_matrix((np.ones(len(indices)), indices, indptr), shape=adjacency.shape))
+        self.rows = [np.repeat(np.arange(self.n_nodes), np.diff(matrix.indptr)) for matrix in self.adjacencies]
+        if nohubs:
+            weighted_degree = sum(np.asarray(matrix.sum(axis=1)).ravel() for matrix in self.adjacencies)
+            self.scale = 1.0 / (weighted_degree + 1)
+        else:
+            self.scale = np.ones(self.n_nodes)
+
+    def run(self, positions: np.ndarray, iterations: int, temperature: float = 0.1, tolerance: float = None,
+            window: int = 10):
+        """
+        Return the positions after the given number of iterations, or once the layout has converged
+
+        Every node moves by the temperature at each iteration, or less if the force on it is weaker than MIN_DISTANCE,
+        so near an equilibrium the nodes oscillate around their positions: the layout has converged when, over the
+        last window iterations, the nodes have moved on average by at most tolerance * k per iteration.
+        The number of iterations run is stored in iterations_done
+
+        Parameter
+        ---------
+        positions : (n, dim) initial positions
+        iterations : largest number of iterations
+        temperature : initial temperature, it decreases linearly to 0 in iterations + 1 steps
+        tolerance : if given, stop as soon as the layout has converged
+        window : number of iterations over which the movement of the nodes is measured
+        """
+        positions = np.array(positions, dtype=np.float64)
+        t = temperature
+        dt = t / float(iterations + 1)
+        self.iterations_done = 0
+        previous = positions.copy()
+        for iteration in range(iterations):
+            displacement = self.repulsion(positions) + self.attraction(positions)
+            length = np.sqrt((displacement ** 2).sum(axis=1))
+            length = np.where(length < MIN_DISTANCE, MIN_DISTANCE, length)
+            positions += displacement * (t / length)[:, None]
+            t -= dt
+            self.iterations_done += 1
+            if tolerance is not None and self.iterations_done % window == 0:
+                if _mean_movement(previous, positions) <= tolerance * self.k * window:
+                    break
+                previous = positions.copy()
+        return positions
+
+    def repulsion(self, positions: np.ndarray):
+        """
+        Return the (n, dim) repulsive displacement of every node
+        """
+        if self.exact:
+            return exact_repulsion(positions, self.k, linlog=self.linlog, scale=self.scale, tile_size=self.tile_size)
+        return grid_repulsion(positions, self.k, theta=self.theta, linlog=self.linlog, scale=self.scale)
+
+    def attraction(self, positions: np.ndarray):
+        """
+        Return the (n, dim) attractive displacement of every node, summed over its edges
+
+        With W the adjacency weighted by w * d / k, the displacement of i is sum_j W_ij (x_j - x_i),
+        that is W x - (row sums of W) x_i: a single sparse product for the adjacency and one for the added edges
+        """
+        displacement = np.zeros_like(positions)
+        for matrix, rows in zip(self.adjacencies, self.rows):
+            delta = positions[rows] - positions[matrix.indices]
+            distance = np.sqrt((delta ** 2).sum(axis=1))
+            distance = np.where(distance < MIN_DISTANCE, MIN_DISTANCE, distance)
+            pull = csr_matrix((matrix.data * distance / self.k, matrix.indices, matrix.indptr), shape=matrix.shape)
+            displacement += pull @ positions - np.asarray(pull.sum(axis=1)) * positions
+        return displacement
+
+
+def repulsion_factor(distance: np.ndarray, k: float, linlog: bool, scale: np.ndarray):
+    """
+    Return the factor multiplying the difference of two positions in the repulsion, given their distance
+
+    Parameter
+    ---------
+    distance : distances, already bounded below by MIN_DISTANCE
+    k : optimal distance between nodes
+    linlog : use the logarithmic repulsion
+    scale : factor of the node receiving the repulsion (1 / (degree + 1) with nohubs, else 1)
+    """
+    factor = k * k / distance ** 2 * scale
+    if linlog:
+        factor = np.log(factor + 1)
+    return factor
+
+
+def grid_repulsion(positions: np.ndarray, k: float, theta: float = 1.0, linlog: bool = False,
+                   scale: np.ndarray = None, leaf_size: int = 8, max_depth: int = 16):
+    """
+    Return the (n, dim) repulsive displacement of every node, approximated on a hierarchy of grids
+
+    The bounding box is split in 2^level cells per side at every level. The nodes of a cell interact with the
+    cells which are at most r = ceil(1 / theta) cells away at the parent level, but more than r cells away at
+    this level, as if all the nodes of each of those cells were at its centroid (Barnes-Hut criterion:
+    cell size / distance is about theta or less). The levels stop when no cell holds more than leaf_size nodes,
+    then the nodes of cells at most r cells away interact directly.
+
+    Parameter
+    ---------
+    positions : (n, dim) positions
+    k : optimal distance between nodes
+    theta : tolerance, lower is more accurate and slower
+    linlog : use the logarithmic repulsion
+    scale : factor of the repulsion of each node, 1 if None
+    leaf_size : largest number of nodes of a cell of the last level, unless max_depth is reached first
+    max_depth : deepest level
+    """
+    n_nodes, dim = positions.shape
+    if scale is None:
+        scale = np.ones(n_nodes)
+    separation = max(1, int(np.ceil(1 / theta)))
+    low = positions.min(axis=0)
+    extent = float((positions.max(axis=0) - low).max())
+    scaled = (positions - low) / (extent if extent > 0 else 1.0)
+    force = np.zeros((n_nodes, dim))
+
+    for level in range(1, max_depth + 1):
+        size = 2 ** level
+        cells = np.minimum((scaled * size).astype(np.int64), size - 1)
+        keys = np.ravel_multi_index(tuple(cells.T), (size,) * dim)
+        cell_keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        centroids = np.stack([np.bincount(inverse, weights=positions[:, d]) for d in range(dim)], axis=1)
+        centroids /= counts[:, None]
+
+        parity = np.ravel_multi_index(tuple((cells & 1).T), (2,) * dim)
+        for parity_class, offsets in enumerate(_far_offsets(separation, dim)):
+            members = np.flatnonzero(parity == parity_class)
+            for chunk in _chunks(members, len(offsets)):
+                point, cell = _neighbour_cells(cells[chunk], offsets, size, cell_keys)
+                delta = positions[chunk[point]] - centroids[cell]
+                distance = np.sqrt((delta ** 2).sum(axis=1))
+                distance = np.where(distance < MIN_DISTANCE, MIN_DISTANCE, distance)
+                push = delta * (counts[cell] * repulsion_factor(distance, k, linlog, scale[chunk[point]]))[:, None]
+                force[chunk] += _sum_by_point(point, push, len(chunk))
+
+        if counts.max() <= leaf_size or level == max_depth:
+            break
+
+    # direct interactions between the nodes of near cells of the last level
+    order = np.argsort(keys, kind="stable")
+    starts = np.searchsorted(keys[order], cell_keys)
+    offsets = _near_offsets(separation, dim)
+    all_nodes = np.arange(n_nodes)
+    for chunk in _chunks(all_nodes, len(offsets) * leaf_size):
+        point, cell = _neighbour_cells(cells[chunk], offsets, size, cell_keys)
+        n_pairs = counts[cell]
+        point = np.repeat(point, n_pairs)
+        first = np.repeat(starts[cell], n_pairs)
+        within = np.arange(n_pairs.sum()) - np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+        other = order[first + within]
+        delta = positions[chunk[point]] - positions[other]
+        distance = np.sqrt((delta ** 2).sum(axis=1))
+        distance = np.where(distance < MIN_DISTANCE, MIN_DISTANCE, distance)
+        push = delta * repulsion_factor(distance, k, linlog, scale[chunk[point]])[:, None]
+        force[chunk] += _sum_by_point(point, push, len(chunk))
+
+    return force
+
+
+def exact_repulsion(positions: np.ndarray, k: float, linlog: bool = False, scale: np.ndarray = None,
+                    tile_size: int = CHUNK_SIZE):
+    """
+    Return the (n, dim) repulsive displacement of every node, summed over all the pairs of nodes
+
+    The pairs are evaluated by tiles of rows x all nodes, so the memory used does not depend on n^2
+
+    Parameter
+    ---------
+    positions : (n, dim) positions
+    k : optimal distance between nodes
+    linlog : use the logarithmic repulsion
+    scale : factor of the repulsion of each node, 1 if None
+    tile_size : largest number of pairs of a tile, at least a row of pairs is evaluated at once
+    """
+    n_nodes = len(positions)
+    if scale is None:
+        scale = np.ones(n_nodes)
+    force = np.zeros(positions.shape)
+    rows = max(1, tile_size // max(n_nodes, 1))
+    for start in range(0, n_nodes, rows):
+        tile = positions[start:start + rows]
+        distance = np.zeros((len(tile), n_nodes))
+        for d in range(positions.shape[1]):
+            distance += (tile[:, d, None] - positions[None, :, d]) ** 2
+        distance = np.sqrt(distance, out=distance)
+        distance = np.maximum(distance, MIN_DISTANCE, out=distance)
+        factor = repulsion_factor(distance, k, linlog, scale[start:start + rows, None])
+        # sum_j f_ij (x_i - x_j) = (sum_j f_ij) x_i - f x, the second term is a matrix product
+        force[start:start + rows] = factor.sum(axis=1)[:, None] * tile - factor @ positions
+    return force
+
+
+def repulsion_error(positions: np.ndarray, k: float = None, theta: float = 1.0, linlog: bool = False):
+    """
+    Compare the grid repulsion with the exact one on the same positions, meant for small graphs
+
+    Parameter
+    ---------
+    positions : (n, dim) positions, e.g. a layout computed with the exact engine
+    k : optimal distance between nodes, sqrt(1 / n) if None
+    theta : tolerance of the grid repulsion
+    linlog : use the logarithmic repulsion
+
+    Return
+    ------
+    error : dict with the mean and the max of |approximate - exact| / |exact| over the nodes
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    if k is None:
+        k = np.sqrt(1.0 / len(positions))
+    exact = exact_repulsion(positions, k, linlog)
+    approximate = grid_repulsion(positions, k, theta=theta, linlog=linlog)
+    norm = np.sqrt((exact ** 2).sum(axis=1))
+    relative = np.sqrt(((approximate - exact) ** 2).sum(axis=1)) / np.where(norm > 0, norm, 1.0)
+    return {"mean": float(relative.mean()), "max": float(relative.max())}
+
+
+@lru_cache(maxsize=None)
+def _far_offsets(separation: int, dim: int):
+    # for each parity of a cell, the offsets of the cells which are near at the parent level but far at this one
+
+    parent_offsets = np.array(list(itertools.product(range(-separation, separation + 1), repeat=dim)))
+    children = np.array(list(itertools.product((0, 1), repeat=dim)))
+    offsets_by_parity = list()
+    for parity in children:
+        offsets = (2 * parent_offsets[:, None, :] + children[None, :, :] - parity).reshape(-1, dim)
+        offsets = offsets[np.abs(offsets).max(axis=1) > separation]
+        offsets_by_parity.append(np.unique(offsets, axis=0))
+    return offsets_by_parity
+
+
+@lru_cache(maxsize=None)
+def _near_offsets(separation: int, dim: int):
+    # offsets of the cells at most separation cells away, the cell itself included
+
+    return np.array(list(itertools.product(range(-separation, separation + 1), repeat=dim)))
+
+
+def _chunks(points: np.ndarray, interactions_per_point: int):
+    # split points so that a chunk evaluates at most about CHUNK_SIZE interactions
+
+    size = max(1, CHUNK_SIZE // max(interactions_per_point, 1))
+    return [points[start:start + size] for start in range(0, len(points), size)]
+
+
+def _neighbour_cells(cells: np.ndarray, offsets: np.ndarray, size: int, cell_keys: np.ndarray):
+    # (point, cell) pairs of the non empty cells at the given offsets from the cell of each point
+
+    n_points, dim = cells.shape
+    targets = cells[:, None, :] + offsets[None, :, :]
+    inside = ((targets >= 0) & (targets < size)).all(axis=2)
+    point, offset = np.nonzero(inside)
+    keys = np.ravel_multi_index(tuple(targets[point, offset].T), (size,) * dim)
+    cell = np.minimum(np.searchsorted(cell_keys, keys), len(cell_keys) - 1)
+    found = cell_keys[cell] == keys
+    return point[found], cell[found]
+
+
+def _mean_movement(previous: np.ndarray, positions: np.ndarray):
+    # mean distance of the nodes from their previous positions
+
+    return float(np.sqrt(((positions - previous) ** 2).sum(axis=1)).mean())
+
+
+def _sum_by_point(point: np.ndarray, values: np.ndarray, n_points: int):
+    # sum the rows of values with the same point
+
+    return np.stack([np.bincount(point, weights=values[:, d], minlength=n_points)
+                     for d in range(values.shape[1])], axis=1)
@@ -1,80 +1,162 @@
 # define controversy measures
 import math
 import random
-from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum, unique
 
 import networkx as nx
 import numpy as np
 from scipy.sparse import coo_matrix
+from scipy.stats import norm
 
-from common.utility import lists_to_dict, border_msg
+from common.graph_core import GraphCore, OverlayGraph, networkx_csr
+from common.utility import lists_to_dict, border_msg, print_element, process_context
+from controversy.boundary import BoundaryConnectivity, index_graph, LEFT, RIGHT
 from controversy.controversy_measure import ControversyMeasure
+from controversy.embedding import embedding_controversy
+from controversy.layout import ForceAtlasLayout, CHUNK_SIZE, _mean_movement
+from controversy.random_walk import RandomWalkEngine, WalkPlan
 
 
-class RandomWalkControversy(ControversyMeasure):
+@unique
+class Engine(Enum):
+    NETWORKX = "NETWORKX"
+    NUMPY = "NUMPY"
+    GRID = "GRID"
 
-    def __init__(self, graph: nx.Graph, communities: dict, iteration: int = 1000, percent: float = 0.10, compute=True):
 
+class RandomWalkControversy(ControversyMeasure):
+    """
+    Random walk controversy (RWC)
+
+    Parameter
+    ---------
+    graph : nx.Graph, or OverlayGraph of a base graph with some added edges
+    communities : dict containing communities
+    iteration : number of times every seed starts a walk, the largest budget if tolerance is given
+    percent : fraction of the nodes of each side used as seeds
+    engine : numpy (walks advancing together on the CSR adjacency) or networkx (one walk at a time)
+    seed : seed of the random walks
+    workers : number of processes running the walks
+    tolerance : if given, the walks run by rounds of batch_iterations iterations and stop as soon as the half
+        width of the confidence interval of RWC is at most tolerance
+    confidence : confidence level of the interval
+    batch_iterations : iterations of each round when tolerance is given, at least 1 as iteration
+    core : integer-indexed graph of graph, read by the numpy engine instead of converting graph
+    """
+    engines = [Engine.NETWORKX.value,
+               Engine.NUMPY.value]
+
+    def __init__(self,
+                 graph: nx.Graph,
+                 communities: dict,
+                 iteration: int = 1000,
+                 percent: float = 0.10,
+                 engine: str = "numpy",
+                 seed: int = None,
+                 workers: int = 1,
+                 tolerance: float = None,
+                 confidence: float = 0.95,
+                 batch_iterations: int = 50,
+                 core: GraphCore = None,
+                 compute=True):
+
+        engine = engine.upper()
+        if engine not in self.engines:
+            print("The available engines are:")
+            print_element(self.engines)
+            raise ValueError("engine not valid")
+        if iteration < 1 or batch_iterations < 1:
+            # the walks run at least once, so that RWC and its interval are always estimated
+            print("The iterations and the iterations of each round must be at least 1")
+            raise ValueError("iteration not valid")
         self.iteration = iteration
         self.percent = percent
+        self.engine = engine
+        self.seed = seed
+        self.workers = workers
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.batch_iterations = batch_iterations
+        self.core = core
+        self.walk_engine = None
+        self.iterations_done = None
+        self.walks = None
+        self.confidence_interval = None
         super().__init__(graph, compute, communities)
 
     def get_controversy(self):
 
         percent = self.percent
-        graph = self.graph
 
         left = self.communities["0"]
         right = self.communities["1"]
 
-        left_left = 0
-        left_right = 0
-        right_right = 0
-        right_left = 0
-
         left_percent = int(percent * len(left))
         right_percent = int(percent * len(right))
 
-        print("{} Random Walk Iteration".format(self.iteration))
-        for j in range(self.iteration):
-
-            # user_nodes_left = self.__get_random_nodes(left_percent, left)
-            # user_nodes_right = self.__get_random_nodes(right_percent, right)
-
-            user_nodes_left = self.__get_random_nodes_with_highest_degree(left, left_percent)
-            user_nodes_right = self.__get_random_nodes_with_highest_degree(right, right_percent)
-
-            user_nodes_left_list = list(user_nodes_left.keys())
-            for i in range(len(user_nodes_left_list) - 1):
-
-                node = user_nodes_left_list[i]
-                other_nodes = user_nodes_left_list[:i] + user_nodes_left_list[i + 1:]
-                values = [1] * len(other_nodes)
-                other_nodes_dict = lists_to_dict(other_nodes, values)
-
-                side = self.__perform_random_walk(graph, node, other_nodes_dict, user_nodes_right)
-
-                if side == "left":
-                    left_left += 1
-
-                elif side == "right":
-                    left_right += 1
+        # seeds and absorbing sets do not change across the iterations: the iterations only walk
+        plan = WalkPlan(self.graph, left, right, left_percent, right_percent, core=self.core)
 
-            user_nodes_right_list = list(user_nodes_right.keys())
-            for i in range(len(user_nodes_right_list) - 1):
+        # with a tolerance the iterations run by rounds, until the confidence interval is narrow enough
+        if self.tolerance is None:
+            round_iterations = self.iteration
+        else:
+            round_iterations = min(self.batch_iterations, self.iteration)
 
-                node = user_nodes_right_list[i]
-                other_nodes = user_nodes_right_list[:i] + user_nodes_right_list[i + 1:]
-                values = [1] * len(other_nodes)
-                other_nodes_dict = lists_to_dict(other_nodes, values)
+        print("{} Random Walk Iteration".format(self.iteration))
+        if self.engine == Engine.NUMPY.value:
+            self.walk_engine = RandomWalkEngine(self.graph, core=self.core)
+        executor = None
+        if self.workers > 1:
+            # with fork the workers inherit the measure, otherwise it is pickled once for each worker
+            executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=process_context(),
+                                           initializer=_init_walker, initargs=(self,))
+
+        seed_sequence = np.random.SeedSequence(self.seed)
+        counts = np.zeros(4, dtype=np.int64)
+        self.iterations_done = 0
+        try:
+            while self.iterations_done < self.iteration:
+                iterations = min(round_iterations, self.iteration - self.iterations_done)
+                counts += self.__run_walks(plan, iterations, seed_sequence, executor)
+                self.iterations_done += iterations
+                rwc, half_width = self.__estimate(*counts.tolist())
+                if self.tolerance is not None and half_width <= self.tolerance:
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            self.walk_engine = None
+
+        self.walks = int(counts.sum())
+        self.confidence_interval = round(half_width, 4)
+        if self.tolerance is not None:
+            print("Random walks stopped after {} iterations, {} walks".format(self.iterations_done, self.walks))
+
+        border_msg("Random Walk Controversy: {} +- {}".format(rwc, self.confidence_interval))
+        return rwc
 
-                side = self.__perform_random_walk(graph, node, user_nodes_left, other_nodes_dict)
+    def __run_walks(self, plan: WalkPlan, iterations: int, seed_sequence: np.random.SeedSequence,
+                    executor: ProcessPoolExecutor):
+        # the iterations are split across the workers, each with its own child of the seed: for a given seed,
+        # number of workers and tolerance the counts are always the same
 
-                if side == "left":
-                    right_left += 1
+        workers = max(1, min(self.workers, iterations))
+        seeds = seed_sequence.spawn(workers)
+        parts = [len(part) for part in np.array_split(np.arange(iterations), workers)]
+        if executor is None:
+            counts = [self.walk_counts(plan, parts[0], seeds[0])]
+        else:
+            counts = list(executor.map(_walk_counts, [plan] * workers, parts, seeds))
+        return np.sum(counts, axis=0)
 
-                elif side == "right":
-                    right_right += 1
+    def __estimate(self, left_left: int, left_right: int, right_left: int, right_right: int):
+        # RWC and the half width of its confidence interval. With e1 = P(left | walk ended left) and
+        # e2 = P(left | walk ended right), RWC = e1 * e4 - e2 * e3 = e1 - e2. Both proportions depend on the same
+        # walks, as the side where a walk ends moves it from one to the other: the variance comes from the delta
+        # method on the two independent binomial counts, walks from the left ending left and walks from the
+        # right ending left, whose numbers of trials are fixed
 
         e1 = left_left / (left_left + right_left)
         e2 = left_right / (left_right + right_right)
@@ -82,74 +164,158 @@ class RandomWalkControversy(ControversyMeasure):
         e4 = right_right / (left_right + right_right)
         rwc = round(e1 * e4 - e2 * e3, 4)
 
-        border_msg("Random Walk Controversy: {}".format(rwc))
-        return rwc
-
-    def __get_random_nodes_with_highest_degree(self, side: list, k: int = 10):
-
-        dict_side: dict = dict((k, 1) for k in side)
-        random_nodes = {}
-        dict_degrees = {}
-        # for node in self.graph.nodes():
-        #     dict_degrees[node] = self.graph.degree(node)
-        dict_degrees = dict(nx.degree(self.graph))
-        sorted_dict = sorted(dict_degrees.items(), key=itemgetter(1), reverse=True)
-        count = 0
+        ended_left = left_left + right_left
+        ended_right = left_right + right_right
+        # derivatives of e1 - e2 with respect to the walks from the left and from the right ending left
+        from_left = right_left / ended_left ** 2 + right_right / ended_right ** 2
+        from_right = left_left / ended_left ** 2 + left_right / ended_right ** 2
+        variance = from_left ** 2 * left_left * left_right / (left_left + left_right) + \
+            from_right ** 2 * right_left * right_right / (right_left + right_right)
+        half_width = norm.ppf(0.5 + self.confidence / 2) * math.sqrt(variance)
+        return rwc, half_width
+
+    def walk_counts(self, plan: WalkPlan, iterations: int, seed: np.random.SeedSequence):
+        """
+        Run the walks of the plan for some iterations
+
+        Parameter
+        ---------
+        plan : starting and absorbing nodes of the walks
+        iterations : number of times every starting node starts a walk
+        seed : seed of the random generator of the walks
+
+        Return
+        ------
+        counts : number of walks left -> left, left -> right, right -> left and right -> right
+        """
+        if self.engine == Engine.NUMPY.value:
+            return self.__get_numpy_walk_counts(plan, iterations, np.random.default_rng(seed))
+        return self.__get_networkx_walk_counts(plan, iterations, random.Random(int(seed.generate_state(1)[0])))
+
+    def __get_numpy_walk_counts(self, plan: WalkPlan, iterations: int, rng: np.random.Generator):
+        # every walk of every iteration advances together on the CSR adjacency
+
+        engine = self.walk_engine if self.walk_engine is not None else RandomWalkEngine(self.graph, core=self.core)
+        starts, origins, absorbing = plan.arrays(engine.index)
+        reached = engine.walk(np.tile(starts, iterations), absorbing, rng)
+        origins = np.tile(origins, iterations)
+
+        left_left = int(np.count_nonzero((origins == LEFT) & (reached == LEFT)))
+        left_right = int(np.count_nonzero((origins == LEFT) & (reached == RIGHT)))
+        right_left = int(np.count_nonzero((origins == RIGHT) & (reached == LEFT)))
+        right_right = int(np.count_nonzero((origins == RIGHT) & (reached == RIGHT)))
+        return left_left, left_right, right_left, right_right
+
+    def __get_networkx_walk_counts(self, plan: WalkPlan, iterations: int, rng: random.Random):
 
-        for i in sorted_dict:
-            if count > k:
-                break
-            if not dict_side.get(i[0]):
-                continue
-            random_nodes[i[0]] = i[1]
-            count += 1
+        graph = self.graph
+        counts = {(LEFT, LEFT): 0, (LEFT, RIGHT): 0, (RIGHT, LEFT): 0, (RIGHT, RIGHT): 0}
+        for j in range(iterations):
+            for node, origin in zip(plan.starts, plan.origins):
+                side = self.__perform_random_walk(graph, node, plan.absorbing, rng)
+                counts[(origin, side)] += 1
 
-        return random_nodes
+        return counts[(LEFT, LEFT)], counts[(LEFT, RIGHT)], counts[(RIGHT, LEFT)], counts[(RIGHT, RIGHT)]
 
     @staticmethod
-    def __get_random_nodes(k, side):
+    def __perform_random_walk(graph, node, absorbing: dict, rng: random.Random):
+        # walk until a node of absorbing other than the starting one, return its side
 
-        random_nodes = []
-        random_nodes_dict = {}
+        current_node = node
+        while True:
+            neighbors = list(graph.neighbors(current_node))
+            random_num = rng.randint(0, len(neighbors) - 1)
+            current_node = neighbors[random_num]
+            if current_node != node and current_node in absorbing:
+                return absorbing[current_node]
 
-        for i in range(k):
-            random_num = random.randint(0, len(side) - 1)
-            random_nodes.append(side[random_num])
-            random_nodes_dict[side[random_num]] = 1
 
-        return random_nodes_dict
+# random walk measure of the workers of a pool, set once in every worker
+_walker = None
 
-    @staticmethod
-    def __perform_random_walk(graph, node, left_side, right_side):
-
-        flag = 0
-        side = ""
-        starting_node = node
 
-        while flag != 1:
+def _init_walker(walker: RandomWalkControversy):
 
-            neighbors = list(graph.neighbors(starting_node))
-            random_num = random.randint(0, len(neighbors) - 1)
-            starting_node = neighbors[random_num]
+    global _walker
+    _walker = walker
 
-            if starting_node in left_side:
-                side = "left"
-                flag = 1
 
-            elif starting_node in right_side:
-                side = "right"
-                flag = 1
+def _walk_counts(plan: WalkPlan, iterations: int, seed: np.random.SeedSequence):
 
-        return side
+    return _walker.walk_counts(plan, iterations, seed)
 
 
 class GMCK(ControversyMeasure):
-
-    def __init__(self, graph: nx.Graph, communities: dict, compute=True):
+    engines = [Engine.NETWORKX.value,
+               Engine.NUMPY.value]
+
+    def __init__(self, graph: nx.Graph, communities: dict, engine: str = "numpy", core: GraphCore = None,
+                 compute=True):
+
+        engine = engine.upper()
+        if engine not in self.engines:
+            print("The available engines are:")
+            print_element(self.engines)
+            raise ValueError("engine not valid")
+        self.engine = engine
+        self.core = core
+        self.boundary_connectivity = None
+        self.index = None
         super().__init__(graph, compute, communities)
 
     def get_controversy(self):
 
+        if self.engine == Engine.NUMPY.value and isinstance(self.graph, OverlayGraph):
+            # the base graph is scored once, then updated with the added edges
+            polarization_score = self.__get_boundary_connectivity().controversy_after(self.graph.added_ids())
+        elif self.engine == Engine.NUMPY.value:
+            polarization_score = self.__get_boundary_connectivity().controversy()
+        else:
+            polarization_score = self.__get_networkx_controversy()
+
+        border_msg("GMCK controversy - boundary connectivity: {}".format(polarization_score))
+        return polarization_score
+
+    def get_controversy_after(self, added_edges: list):
+        """
+        Return the GMCK controversy of the graph with added_edges, without copying or modifying the graph
+
+        Only the nodes affected by the new edges are updated, so the cost scales with the number of added edges
+
+        Parameter
+        ---------
+        added_edges : list of (u, v) new edges between nodes of the graph
+        """
+        boundary_connectivity = self.__get_boundary_connectivity()
+        index = self.index
+        added_edges = np.array([(index[u], index[v]) for u, v in added_edges], dtype=np.int64).reshape(-1, 2)
+        if isinstance(self.graph, OverlayGraph):
+            added_edges = np.concatenate((self.graph.added_ids(), added_edges))
+        polarization_score = boundary_connectivity.controversy_after(added_edges)
+
+        border_msg("GMCK controversy - boundary connectivity: {}".format(polarization_score))
+        return polarization_score
+
+    def __get_boundary_connectivity(self):
+
+        if self.boundary_connectivity is None and isinstance(self.graph, OverlayGraph):
+            # the counters of the base graph, the added edges are given to controversy_after
+            core = self.graph.core
+            if core.sides is None:
+                core.assign_communities(self.communities)
+            self.index = core.index
+            self.boundary_connectivity = BoundaryConnectivity(core.edges(), core.sides, core.positions)
+        elif self.boundary_connectivity is None and self.core is not None and not self.graph.is_directed():
+            self.index = self.core.index
+            self.boundary_connectivity = BoundaryConnectivity(self.core.edges(), self.core.sides, self.core.positions)
+        elif self.boundary_connectivity is None:
+            nodes, edges, sides, positions = index_graph(self.graph, self.communities)
+            self.index = {node: i for i, node in enumerate(nodes)}
+            self.boundary_connectivity = BoundaryConnectivity(edges, sides, positions, self.graph.is_directed())
+        return self.boundary_connectivity
+
+    def __get_networkx_controversy(self):
+
         left = self.communities["0"]
         right = self.communities["1"]
         dict_left = lists_to_dict(left, [1] * len(left))
@@ -249,7 +415,6 @@ class GMCK(ControversyMeasure):
             elif len(cut_nodes1) == 0:
                 polarization_score = 0.5
 
-        border_msg("GMCK controversy - boundary connectivity: {}".format(polarization_score))
         return polarization_score
 
     @staticmethod
@@ -274,12 +439,52 @@ class GMCK(ControversyMeasure):
 
 
 class ForceAtlasControversy(ControversyMeasure):
-
-    def __init__(self, graph: nx.Graph, communities: dict, atlas_properties: dict = None, compute=True):
+    """
+    Embedding controversy from a ForceAtlas layout of the graph
+
+    Parameter
+    ---------
+    graph : nx.Graph, or OverlayGraph of a base graph with some added edges
+    communities : dict containing communities
+    atlas_properties : options of the layout: iterations, linlog, pos, nohubs, k, dim, temperature, tolerance, window,
+        engine, theta and tile_size. pos is the initial layout, random if None. temperature (0.1 by default) is the
+        initial movement of the nodes, it decreases linearly to 0. With tolerance the layout stops as soon as the
+        nodes have moved on average by at most tolerance * k per iteration over the last window iterations.
+        engine is networkx (exact forces, one node at a time), numpy (exact forces, by tiles of nodes) or grid
+        (repulsion approximated on a hierarchy of grids, see controversy.layout). theta is the tolerance of the
+        grid engine, tile_size the largest number of pairs of nodes of a tile of the numpy engine
+    sample_size : if given, a mean distance over more than sample_size pairs of nodes is estimated from
+        sample_size random pairs, see controversy.embedding
+    seed : seed of the initial layout, if pos is None, and of the sampled pairs
+    confidence : confidence level of the interval of the score, its half width is confidence_interval
+    core : integer-indexed graph of graph, its adjacency is used instead of converting graph
+    """
+    engines = [Engine.NETWORKX.value,
+               Engine.NUMPY.value,
+               Engine.GRID.value]
+
+    def __init__(self,
+                 graph: nx.Graph,
+                 communities: dict,
+                 atlas_properties: dict = None,
+                 sample_size: int = None,
+                 seed: int = None,
+                 confidence: float = 0.95,
+                 core: GraphCore = None,
+                 compute=True):
 
         if atlas_properties is None:
             atlas_properties = {"iterations": 1000, "linlog": False, "pos": None, "nohubs": False, "k": None, "dim": 2}
-        self.position_node = self.__force_atlas2_layout(graph, atlas_properties) if compute else None
+        engine = atlas_properties.get("engine", "networkx").upper()
+        if engine not in self.engines:
+            print("The available engines are:")
+            print_element(self.engines)
+            raise ValueError("engine not valid")
+        self.sample_size = sample_size
+        self.seed = seed
+        self.confidence = confidence
+        self.confidence_interval = None
+        self.position_node = self.__force_atlas2_layout(graph, atlas_properties, core, seed) if compute else None
         super().__init__(graph, compute, communities)
 
     def get_controversy(self):
@@ -289,59 +494,20 @@ class ForceAtlasControversy(ControversyMeasure):
         dict_left = lists_to_dict(left, [1] * len(left))
         dict_right = lists_to_dict(right, [1] * len(right))
 
+        # the score is measured on the first two coordinates of the layout
         atlas_layout = self.position_node
+        left_positions = np.array([atlas_layout[node][:2] for node in dict_left], dtype=np.float64)
+        right_positions = np.array([atlas_layout[node][:2] for node in dict_right], dtype=np.float64)
 
-        dict_positions = {}
-        for i in atlas_layout:
-            node = i
-            line1 = atlas_layout[i]
-            [x, y] = [line1[0], line1[1]]
-            dict_positions[node] = [x, y]
-
-        left_list = list(dict_left.keys())
-        total_lib_lib = 0.0
-        count_lib_lib = 0.0
-
-        for i in range(len(left_list)):
-            user1 = left_list[i]
-            for j in range(i + 1, len(left_list)):
-                user2 = left_list[j]
-                dist = self.__get_distance(dict_positions[user1], dict_positions[user2])
-                total_lib_lib += dist
-                count_lib_lib += 1.0
-        avg_lib_lib = total_lib_lib / count_lib_lib
-
-        right_list = list(dict_right.keys())
-        total_cons_cons = 0.0
-        count_cons_cons = 0.0
-
-        for i in range(len(right_list)):
-            user1 = right_list[i]
-            for j in range(i + 1, len(right_list)):
-                user2 = right_list[j]
-                dist = self.__get_distance(dict_positions[user1], dict_positions[user2])
-                total_cons_cons += dist
-                count_cons_cons += 1.0
-        avg_cons_cons = total_cons_cons / count_cons_cons
-
-        total_both = 0.0
-        count_both = 0.0
-
-        for i in range(len(left_list)):
-            user1 = left_list[i]
-            for j in range(len(right_list)):
-                user2 = right_list[j]
-                dist = self.__get_distance(dict_positions[user1], dict_positions[user2])
-                total_both += dist
-                count_both += 1.0
-        avg_both = total_both / count_both
-
-        score = round(1 - ((avg_lib_lib + avg_cons_cons) / (2 * avg_both)), 4)
+        score, half_width = embedding_controversy(left_positions, right_positions, sample_size=self.sample_size,
+                                                  seed=self.seed, confidence=self.confidence)
+        score = round(score, 4)
+        self.confidence_interval = round(half_width, 4)
         print("Embedding score: {}".format(score))
         return score
 
     @staticmethod
-    def __force_atlas2_layout(graph: nx.Graph, atlas_properties: dict):
+    def __force_atlas2_layout(graph: nx.Graph, atlas_properties: dict, core: GraphCore = None, seed: int = None):
 
         print("Start creating Force Atlas Layout")
         iterations = atlas_properties.get("iterations", 1000)
@@ -350,24 +516,50 @@ class ForceAtlasControversy(ControversyMeasure):
         nohubs = atlas_properties.get("nohubs", False)
         k = atlas_properties.get("k", None)
         dim = atlas_properties.get("dim", 2)
-
-        A = nx.to_scipy_sparse_matrix(graph, dtype='f')
-        nnodes, _ = A.shape
-
+        engine = atlas_properties.get("engine", "networkx").upper()
+        theta = atlas_properties.get("theta", 1.0)
+        tile_size = atlas_properties.get("tile_size", CHUNK_SIZE)
+        temperature = atlas_properties.get("temperature", 0.1)
+        tolerance = atlas_properties.get("tolerance", None)
+        window = atlas_properties.get("window", 10)
+
+        added = None
+        if isinstance(graph, OverlayGraph):
+            core = graph.core
+            added = graph.added_csr()
+        nnodes = core.n_nodes if core is not None else len(graph)
+        # a generator of its own: the workers of a pool would all inherit the same global random state
+        if pos is None:
+            pos = np.random.default_rng(seed).random((nnodes, dim))
+
+        if engine != Engine.NETWORKX.value:
+            # the adjacency of the core is read in place, the added edges of an overlay are kept apart
+            A = core.adjacency(copy=False) if core is not None else networkx_csr(graph, dtype=np.float64)
+            layout = ForceAtlasLayout(A, k=k, linlog=linlog, nohubs=nohubs, theta=theta,
+                                      exact=engine == Engine.NUMPY.value, tile_size=tile_size, added=added)
+            pos = layout.run(pos, iterations, temperature=temperature, tolerance=tolerance, window=window)
+            print("Force Atlas done after {} iterations".format(layout.iterations_done))
+            return dict(zip(graph, pos))
+
+        if isinstance(graph, OverlayGraph):
+            A = graph.adjacency(dtype='f')
+        elif core is not None:
+            A = core.adjacency(dtype='f')
+        else:
+            A = networkx_csr(graph, dtype='f')
         try:
             A = A.tolil()
         except Exception as e:
             A = (coo_matrix(A)).tolil()
-        if pos is None:
-            pos = np.asarray(np.random.random((nnodes, dim)), dtype=A.dtype)
-        else:
-            pos = pos.astype(A.dtype)
+        pos = pos.astype(A.dtype)
         if k is None:
             k = np.sqrt(1.0 / nnodes)
-        t = 0.1
+        t = temperature
 
         dt = t / float(iterations + 1)
         displacement = np.zeros((dim, nnodes))
+        iterations_done = 0
+        previous = pos.copy()
         for iteration in range(iterations):
             displacement *= 0
             for i in range(A.shape[0]):
@@ -386,18 +578,15 @@ class ForceAtlasControversy(ControversyMeasure):
             length = np.where(length < 0.01, 0.01, length)
             pos += (displacement * t / length).T
             t -= dt
+            iterations_done += 1
+            if tolerance is not None and iterations_done % window == 0:
+                if _mean_movement(previous, pos) <= tolerance * k * window:
+                    break
+                previous = pos.copy()
 
-        print("Force Atlas done")
+        print("Force Atlas done after {} iterations".format(iterations_done))
         return dict(zip(graph, pos))
 
-    @staticmethod
-    def __get_distance(point_a, point_b):
-        x1 = point_a[0]
-        y1 = point_a[1]
-        x2 = point_b[0]
-        y2 = point_b[1]
-        return math.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
-
 
 # not used
 class EdgeBetweennessControversy(ControversyMeasure):
@@ -0,0 +1,167 @@
+# define vectorized random walks
+
+from operator import itemgetter
+
+import networkx as nx
+import numpy as np
+
+from common.graph_core import GraphCore, OverlayGraph, networkx_csr
+from controversy.boundary import LEFT, RIGHT, NO_SIDE
+
+
+class WalkPlan:
+    """
+    Starting nodes and absorbing nodes of the random walks of RandomWalkControversy, computed once
+
+    The seeds of a side are its nodes of highest degree: the first k + 1 of the side in degree order.
+    Every seed but the last of each side starts a walk in each iteration; a walk stops at the first seed
+    which is not its own starting node.
+
+    Parameter
+    ---------
+    graph : nx.Graph
+    left : nodes of the left community
+    right : nodes of the right community
+    left_k : number of left seeds minus one
+    right_k : number of right seeds minus one
+    core : integer-indexed graph of graph, its degree array gives the degree order
+    """
+
+    def __init__(self, graph: nx.Graph, left: list, right: list, left_k: int, right_k: int,
+                 core: GraphCore = None):
+
+        if isinstance(graph, OverlayGraph):
+            degree_order = [graph.core.labels[i] for i in graph.degree_order().tolist()]
+        elif core is not None:
+            degree_order = [core.labels[i] for i in core.degree_order().tolist()]
+        else:
+            degree_order = [node for node, _ in sorted(dict(nx.degree(graph)).items(), key=itemgetter(1),
+                                                       reverse=True)]
+        self.left_seeds = self.__highest_degree(degree_order, left, left_k)
+        self.right_seeds = self.__highest_degree(degree_order, right, right_k)
+
+        self.absorbing = dict()
+        for node in self.right_seeds:
+            self.absorbing[node] = RIGHT
+        for node in self.left_seeds:
+            self.absorbing[node] = LEFT
+
+        self.starts = self.left_seeds[:-1] + self.right_seeds[:-1]
+        self.origins = [LEFT] * len(self.left_seeds[:-1]) + [RIGHT] * len(self.right_seeds[:-1])
+
+    def arrays(self, index: dict):
+        """
+        Return starts, origins and absorbing labels as arrays of node ids
+
+        Parameter
+        ---------
+        index : id of each node
+        """
+        starts = np.array([index[node] for node in self.starts], dtype=np.int64)
+        origins = np.array(self.origins, dtype=np.int8)
+        absorbing = np.full(len(index), NO_SIDE, dtype=np.int8)
+        for node, side in self.absorbing.items():
+            absorbing[index[node]] = side
+        return starts, origins, absorbing
+
+    @staticmethod
+    def __highest_degree(degree_order: list, side: list, k: int):
+
+        members = set(side)
+        seeds = list()
+        for node in degree_order:
+            if len(seeds) > k:
+                break
+            if node in members:
+                seeds.append(node)
+        return seeds
+
+
+class RandomWalkEngine:
+    """
+    Run many random walks at once on the CSR adjacency of a graph
+
+    Every walker moves to a uniformly chosen neighbour at each step, until it reaches an absorbing node
+    which is not its own starting node. All the walkers of a batch advance together with NumPy,
+    and the absorbed ones are removed from the batch.
+
+    On an OverlayGraph the added edges are kept in a second CSR adjacency: a step chooses among the neighbours
+    in the base graph followed by the added ones, so the base adjacency is never copied.
+
+    Parameter
+    ---------
+    graph : nx.Graph or OverlayGraph
+    core : integer-indexed graph of graph, its CSR adjacency is used instead of converting graph
+    """
+
+    def __init__(self, graph: nx.Graph, core: GraphCore = None):
+
+        self.added_indptr = None
+        self.added_indices = None
+        if isinstance(graph, OverlayGraph):
+            core = graph.core
+            self.added_indptr, self.added_indices = graph.added_csr()
+        if core is not None:
+            self.nodes = core.labels
+            self.index = core.index
+            # the arrays of the core are read in place, in the type they are stored in
+            self.indptr = core.indptr
+            self.indices = core.indices
+        else:
+            self.nodes = list(graph)
+            self.index = {node: i for i, node in enumerate(self.nodes)}
+            adjacency = networkx_csr(graph, nodelist=self.nodes, weight=None)
+            self.indptr = adjacency.indptr
+            self.indices = adjacency.indices
+        self.base_degree = np.diff(self.indptr)
+        self.degree = self.base_degree
+        if self.added_indptr is not None:
+            self.degree = self.base_degree + np.diff(self.added_indptr)
+
+    def walk(self, starts: np.ndarray, absorbing: np.ndarray, rng: np.random.Generator, batch_size: int = 2 ** 16):
+        """
+        Return the label of the absorbing node reached by a walk from each starting node
+
+        Parameter
+        ---------
+        starts : node ids where the walks start
+        absorbing : label of each node, NO_SIDE for the nodes which do not stop a walk
+        rng : random generator used to choose the neighbours
+        batch_size : number of walkers advancing together
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        reached = np.full(len(starts), NO_SIDE, dtype=absorbing.dtype)
+
+        for first in range(0, len(starts), batch_size):
+            walkers = np.arange(first, min(first + batch_size, len(starts)))
+            origins = starts[walkers]
+            positions = origins
+            while len(walkers):
+                degree = self.degree[positions]
+                if not degree.all():
+                    raise ValueError("random walk reached a node without neighbours")
+                steps = rng.integers(0, degree)
+                positions = self.__step(positions, steps)
+
+                labels = absorbing[positions]
+                stopped = (labels != NO_SIDE) & (positions != origins)
+                reached[walkers[stopped]] = labels[stopped]
+                walkers = walkers[~stopped]
+                origins = origins[~stopped]
+                positions = positions[~stopped]
+
+        return reached
+
+    def __step(self, positions: np.ndarray, steps: np.ndarray):
+        # the steps-th neighbour of every position, the added neighbours come after the base ones
+
+        if self.added_indptr is None:
+            return self.indices[self.indptr[positions] + steps]
+        base_degree = self.base_degree[positions]
+        in_base = steps < base_degree
+        neighbours = np.empty(len(positions), dtype=np.int64)
+        neighbours[in_base] = self.indices[self.indptr[positions[in_base]] + steps[in_base]]
+        added = ~in_base
+        neighbours[added] = self.added_indices[self.added_indptr[positions[added]] + steps[added] -
+                                               base_degree[added]]
+        return neighbours
@@ -1,15 +1,19 @@
 # define link prediction algorithms
-from collections import Counter
 from collections.abc import Iterable
 from enum import Enum, unique
-from typing import List
 
 import networkx as nx
-from itertools import islice, chain
+from operator import itemgetter
 
 from common.utility import print_element
-from common.utility import write_dict_to_json
+from common.graph_core import GraphCore
+from common.score_cache import RankedEdges, ScoreCaches, read_ranked_edges, write_ranked_edges
+from common.utility import read_json_to_dict, write_dict_to_json
+from link_prediction.betweenness import sampled_betweenness
+from link_prediction.candidates import CrossCommunityCandidates
 from link_prediction.link_algorithm import LinkAlgorithm
+from link_prediction.selection import top_edges
+from link_prediction.similarity import SparseSimilarity
 
 
 @unique
@@ -20,63 +24,62 @@ class TypeOfAlgorithm(Enum):
     PREFERENTIAL_ATTACHMENT = "PREFERENTIAL_ATTACHMENT"
 
 
+@unique
+class Engine(Enum):
+    NETWORKX = "NETWORKX"
+    SPARSE = "SPARSE"
+
+
 class LinkWithBetweenness(LinkAlgorithm):
+    """
+    Link the pairs of nodes of different communities with the highest sum of betweenness
+
+    The betweenness of the nodes is computed in the subgraph of their community, exactly by default.
+    With betweenness_sample it is estimated from sampled pivots, doubling the sample until the top nodes are
+    stable (see sampled_betweenness): the number of pivots and the stability of every community are in
+    betweenness_sampling and are cached with the values
+
+    Parameter
+    ---------
+    betweenness_sample : number of pivots of the first sample, None to compute the exact betweenness
+    betweenness_top : number of nodes with the highest betweenness which have to be stable
+    betweenness_stability : smallest fraction of the top nodes in common between consecutive samples to stop
+    """
 
     def __init__(self,
                  graph: nx.Graph,
                  communities: dict,
                  filename: str,
                  given_betweenness_value: dict = None,
-                 k: float = 0.005):
+                 k: float = 0.005,
+                 cache: ScoreCaches = None,
+                 betweenness_sample: int = None,
+                 betweenness_top: int = 50,
+                 betweenness_stability: float = 0.9):
 
         self.k = k
+        self.betweenness_sample = betweenness_sample
+        self.betweenness_top = betweenness_top
+        self.betweenness_stability = betweenness_stability
+        self.betweenness_sampling = dict()
         filename = filename + '_betweenness'
-        super().__init__(graph, communities, values=given_betweenness_value, filename=filename)
+        super().__init__(graph, communities, values=given_betweenness_value, filename=filename, cache=cache)
 
     def prediction(self):
 
-        highest_betweenness = dict()
-
-        if not self.values:
-            for community in self.communities:
-                print("Getting betweenness for community {}".format(community))
-                subgraph = nx.subgraph(self.graph, self.communities[community])
-                highest_betweenness[community] = self.__get_betweenness(subgraph)
-
-            print("Betweenness done")
-            write_dict_to_json(highest_betweenness, self.filename, "../betweenness/")
-            print("Betweenness values written")
-        else:
-            print("Betweenness provided")
-            highest_betweenness = self.values
+        highest_betweenness = self.__get_community_betweenness(self.values)
 
         highest_betweenness_left = highest_betweenness["0"]
         highest_betweenness_right = highest_betweenness["1"]
-        non_connected_nodes = list(nx.non_edges(self.graph))
-        n_possible_new_connections = len(non_connected_nodes)
-        non_connected_nodes = list(
-            filter(
-                lambda x:
-                (x[0] in highest_betweenness_right and x[1] in highest_betweenness_left)
-                or (x[0] in highest_betweenness_left and x[1] in highest_betweenness_right),
-                non_connected_nodes
-            )
-        )
+        non_connected_nodes = CrossCommunityCandidates(self.graph, highest_betweenness_left, highest_betweenness_right)
         possible_new_edges = self.__get_highest_betweenness(
             non_connected_nodes,
             highest_betweenness_left,
             highest_betweenness_right
         )
-        possible_new_edges = {k: v for k, v in
-                              sorted(possible_new_edges.items(), key=lambda item: item[1], reverse=True)}
 
-        max_links = len(possible_new_edges)
         number_edges = round(self.k * self.n_edges)
-        all_possible_new_edges = possible_new_edges.keys()
-        if number_edges < max_links:
-            edges_to_add = islice(all_possible_new_edges, number_edges)
-        else:
-            edges_to_add = all_possible_new_edges
+        edges_to_add = [edge for edge, _ in top_edges(possible_new_edges.items(), number_edges)]
 
         self.percentage_edges_added = self.k
         print("% of edges added: {}".format(self.percentage_edges_added))
@@ -85,13 +88,74 @@ class LinkWithBetweenness(LinkAlgorithm):
         for edge in edges_to_add:
             self.link_nodes(edge[0], edge[1])
 
-    @staticmethod
-    def __get_betweenness(graph: nx.Graph):
+    def __get_community_betweenness(self, given_betweenness_value: dict):
+
+        if given_betweenness_value:
+            print("Betweenness provided")
+            return given_betweenness_value
+
+        params = self.cache_params(**self.betweenness_params())
+        cached = self.read_cached("betweenness", params, self.__read_betweenness)
+        if cached is not None and cached[0]:
+            print("Betweenness provided")
+            highest_betweenness, self.betweenness_sampling = cached
+            return highest_betweenness
+
+        highest_betweenness = dict()
+        for community in self.communities:
+            print("Getting betweenness for community {}".format(community))
+            subgraph = nx.subgraph(self.graph, self.communities[community])
+            highest_betweenness[community] = self.__get_betweenness(subgraph, community)
+
+        print("Betweenness done")
+        self.write_cached("betweenness", params,
+                          lambda entry, path: self.__write_betweenness(highest_betweenness, entry, path))
+        print("Betweenness values written")
+        return highest_betweenness
+
+    def betweenness_params(self):
+        """
+        Return the parameters of the sampled betweenness, empty if it is exact
+        """
+        if self.betweenness_sample is None:
+            return dict()
+        return {"betweenness_sample": self.betweenness_sample,
+                "betweenness_top": self.betweenness_top,
+                "betweenness_stability": self.betweenness_stability,
+                "seed": 10}
+
+    def __read_betweenness(self, entry: str, path: str):
+
+        sampling = dict()
+        if self.betweenness_sample is not None:
+            sampling = read_json_to_dict(entry + "_sampling", path)
+        return read_json_to_dict(entry, path), sampling
+
+    def __write_betweenness(self, highest_betweenness: dict, entry: str, path: str):
+
+        # the sampling of every community is written next to the values, in the same cache entry
+        if self.betweenness_sample is not None:
+            write_dict_to_json(self.betweenness_sampling, entry + "_sampling", path)
+        write_dict_to_json(highest_betweenness, entry, path)
+
+    def __get_betweenness(self, graph: nx.Graph, community: str):
+
+        if self.betweenness_sample is None:
+            betweenness = nx.betweenness_centrality(graph, normalized=True, seed=10)
+        else:
+            betweenness, sampling = sampled_betweenness(graph,
+                                                        self.betweenness_sample,
+                                                        top=self.betweenness_top,
+                                                        stability=self.betweenness_stability,
+                                                        seed=10)
+            print("Betweenness estimated from {} pivots out of {} nodes, top nodes overlap {}".format(
+                sampling["pivots"], sampling["nodes"], sampling["top_overlaps"][-1:]))
+            self.betweenness_sampling[community] = sampling
 
         betweenness = dict(
             filter(
                 lambda x: x[1] > 0,
-                nx.betweenness_centrality(graph, normalized=True, seed=10).items()
+                betweenness.items()
             )
         )
         # betweenness = nx.betweenness_centrality(graph, normalized=True, seed=10)
@@ -103,7 +167,6 @@ class LinkWithBetweenness(LinkAlgorithm):
 
         print("Getting 'best' edges")
 
-        frequency_nodes = Counter(chain.from_iterable(non_connected_nodes))
         edges_to_add = dict()
 
         for node_pairs in non_connected_nodes:
@@ -130,14 +193,21 @@ class StateOfArtAlgorithm(LinkAlgorithm):
                   TypeOfAlgorithm.ADAMIC_ADAR.value,
                   TypeOfAlgorithm.RESOURCE_ALLOCATION.value,
                   TypeOfAlgorithm.PREFERENTIAL_ATTACHMENT.value]
+    engines = [Engine.NETWORKX.value,
+               Engine.SPARSE.value]
 
     def __init__(self,
                  graph: nx.Graph,
                  communities: dict,
                  algorithm: str,
                  filename: str,
-                 given_values: dict = None,
-                 k: float = 0.005):
+                 given_values: RankedEdges = None,
+                 k: float = 0.005,
+                 engine: str = "networkx",
+                 max_memory: int = None,
+                 cache_k: float = None,
+                 cache: ScoreCaches = None,
+                 core: GraphCore = None):
 
         filename = filename + f"_{algorithm.lower()}"
         algorithm = algorithm.upper()
@@ -145,57 +215,57 @@ class StateOfArtAlgorithm(LinkAlgorithm):
             print("The available partition algorithms are:")
             print_element(self.algorithms)
             raise ValueError("algorithm not valid")
+        engine = engine.upper()
+        if engine not in self.engines:
+            print("The available engines are:")
+            print_element(self.engines)
+            raise ValueError("engine not valid")
+        if max_memory and engine != Engine.SPARSE.value:
+            # the tiled scores are sparse products, they would silently replace the networkx scores
+            print("Scoring by chunks of max_memory bytes needs the {} engine".format(Engine.SPARSE.value.lower()))
+            raise ValueError("max_memory not valid")
         self.algorithm = algorithm
+        self.engine = engine
+        self.max_memory = max_memory
         self.k = k
-        super().__init__(graph, communities, given_values, filename)
+        self.cache_k = cache_k if cache_k else k
+        self.core = core
+        super().__init__(graph, communities, given_values, filename, cache=cache)
 
     def prediction(self):
 
-        if not self.values:
+        number_edges = round(self.k * self.n_edges)
+        kind = self.algorithm.lower()
+        # the engines may rank pairs with almost the same score differently
+        params = self.cache_params(engine=self.engine)
+        ranked_edges = self.values
+        if ranked_edges is None:
+            ranked_edges = self.read_cached(kind, params, read_ranked_edges)
+
+        if ranked_edges is not None and ranked_edges.covers(number_edges):
+            print(f"{self.algorithm.lower()} provided")
+            edges_to_add = ranked_edges.top(number_edges)
+        else:
             left = self.communities["0"]
             right = self.communities["1"]
-            non_connected_nodes = list(nx.non_edges(self.graph))
-            n_possible_new_connections = len(non_connected_nodes)
-            non_connected_nodes = list(
-                filter(
-                    lambda x:
-                    (x[0] in right and x[1] in left)
-                    or (x[0] in left and x[1] in right),
-                    non_connected_nodes
-                )
-            )
-
-            algorithm = None
-            print("Adding edges using {}".format(self.algorithm.lower()))
-            if self.algorithm == TypeOfAlgorithm.ADAMIC_ADAR.value:
-                algorithm = nx.adamic_adar_index
-            elif self.algorithm == TypeOfAlgorithm.JACCARD_COEFFICIENT.value:
-                algorithm = nx.jaccard_coefficient
-            elif self.algorithm == TypeOfAlgorithm.RESOURCE_ALLOCATION.value:
-                algorithm = nx.resource_allocation_index
-            elif self.algorithm == TypeOfAlgorithm.PREFERENTIAL_ATTACHMENT.value:
-                algorithm = nx.preferential_attachment
-
-            edges_to_add = list(
-                sorted(
-                    algorithm(self.graph, non_connected_nodes),
-                    key=lambda element: element[2],
-                    reverse=True)
-            )
-
-            write_dict_to_json({"value": edges_to_add}, self.filename, f"../{self.algorithm.lower()}/")
+            non_connected_nodes = CrossCommunityCandidates(self.graph, left, right)
+            edges_to_cache = max(number_edges, round(self.cache_k * self.n_edges))
+
+            if self.max_memory:
+                print("Adding edges using {} by chunks of {} bytes".format(self.algorithm.lower(), self.max_memory))
+                ranked_edges = SparseSimilarity(self.graph, self.core).top_scores(self.algorithm,
+                                                                                  non_connected_nodes,
+                                                                                  edges_to_cache,
+                                                                                  self.max_memory)
+            else:
+                print("Adding edges using {}".format(self.algorithm.lower()))
+                ranked_edges = top_edges(self.get_similarity(non_connected_nodes), edges_to_cache, key=itemgetter(2))
+
+            n_candidates = len(non_connected_nodes)
+            self.write_cached(kind, params,
+                              lambda entry, path: write_ranked_edges(ranked_edges, n_candidates, entry, path))
             print(f"{self.algorithm} values written")
-        else:
-            print(f"{self.algorithm.lower()} provided")
-            edges_to_add = list(self.values.values())[0]
-
-        max_links = len(edges_to_add)
-        number_edges = round(self.k * self.n_edges)
-        all_possible_new_edges = edges_to_add
-        if number_edges < max_links:
-            edges_to_add = islice(all_possible_new_edges, number_edges)
-        else:
-            edges_to_add = all_possible_new_edges
+            edges_to_add = ranked_edges[:number_edges]
 
         self.percentage_edges_added = self.k
         print("% of edges added: {}".format(self.percentage_edges_added))
@@ -204,6 +274,24 @@ class StateOfArtAlgorithm(LinkAlgorithm):
         for edge in edges_to_add:
             self.link_nodes(edge[0], edge[1])
 
+    def get_similarity(self, non_connected_nodes: CrossCommunityCandidates):
+        """
+        Return the (u, v, score) triples of the candidate pairs, computed with the selected engine
+        """
+        if self.engine == Engine.SPARSE.value:
+            return SparseSimilarity(self.graph, self.core).scores(self.algorithm, non_connected_nodes)
+
+        algorithm = None
+        if self.algorithm == TypeOfAlgorithm.ADAMIC_ADAR.value:
+            algorithm = nx.adamic_adar_index
+        elif self.algorithm == TypeOfAlgorithm.JACCARD_COEFFICIENT.value:
+            algorithm = nx.jaccard_coefficient
+        elif self.algorithm == TypeOfAlgorithm.RESOURCE_ALLOCATION.value:
+            algorithm = nx.resource_allocation_index
+        elif self.algorithm == TypeOfAlgorithm.PREFERENTIAL_ATTACHMENT.value:
+            algorithm = nx.preferential_attachment
+        return algorithm(self.graph, non_connected_nodes)
+
 
 class LinkWithStructuralHoles(LinkAlgorithm):
 
@@ -212,56 +300,45 @@ class LinkWithStructuralHoles(LinkAlgorithm):
                  communities: dict,
                  filename: str,
                  given_effective_size: dict = None,
-                 k: float = 0.005):
+                 k: float = 0.005,
+                 cache: ScoreCaches = None):
 
         filename = filename + '_effective_size'
         self.k = k
-        super().__init__(graph, communities, given_effective_size, filename)
+        super().__init__(graph, communities, given_effective_size, filename, cache=cache)
 
     def prediction(self):
 
-        effective_size = dict()
+        params = self.cache_params()
+        effective_size = self.values
+        if not effective_size:
+            effective_size = self.read_cached("effective_size", params, read_json_to_dict)
 
-        if not self.values:
+        if not effective_size:
+            effective_size = dict()
             for community in self.communities:
                 print("Getting effective size for community {}".format(community))
                 subgraph = nx.subgraph(self.graph, self.communities[community])
                 effective_size[community] = self.__get_effective_size(subgraph)
 
             print("Effective size done")
-            write_dict_to_json(effective_size, self.filename, "../effective_size/")
+            self.write_cached("effective_size", params,
+                              lambda entry, path: write_dict_to_json(effective_size, entry, path))
             print("Effective size values written")
         else:
             print("Effective size provided")
-            effective_size = self.values
 
         effective_size_left = effective_size["0"]
         effective_size_right = effective_size["1"]
-        non_connected_nodes = list(nx.non_edges(self.graph))
-        n_possible_new_connections = len(non_connected_nodes)
-        non_connected_nodes = list(
-            filter(
-                lambda x:
-                (x[0] in effective_size_right and x[1] in effective_size_left)
-                or (x[0] in effective_size_left and x[1] in effective_size_right),
-                non_connected_nodes
-            )
-        )
+        non_connected_nodes = CrossCommunityCandidates(self.graph, effective_size_left, effective_size_right)
         possible_new_edges = self.__get_highest_values(
             non_connected_nodes,
             effective_size_left,
             effective_size_right
         )
-        possible_new_edges = {k: v for k, v in
-                              sorted(possible_new_edges.items(), key=lambda item: item[1], reverse=True)}
 
-        max_links = len(possible_new_edges)
         number_edges = round(self.k * self.n_edges)
-        all_possible_new_edges = possible_new_edges.keys()
-        if number_edges < max_links:
-            edges_to_add = islice(all_possible_new_edges, number_edges)
-        else:
-            edges_to_add = all_possible_new_edges
+        edges_to_add = [edge for edge, _ in top_edges(possible_new_edges.items(), number_edges)]
 
         self.percentage_edges_added = self.k
         print("% of edges added: {}".format(self.percentage_edges_added))
@@ -316,10 +393,22 @@ class HybridLinkPrediction(LinkWithBetweenness, StateOfArtAlgorithm):
                  algorithm: str,
                  filename: str,
                  given_betweenness_value: dict = None,
-                 given_values: dict = None,
-                 k: float = 0.005):
+                 given_values: RankedEdges = None,
+                 k: float = 0.005,
+                 engine: str = "networkx",
+                 max_memory: int = None,
+                 cache_k: float = None,
+                 cache: ScoreCaches = None,
+                 core: GraphCore = None,
+                 betweenness_sample: int = None,
+                 betweenness_top: int = 50,
+                 betweenness_stability: float = 0.9):
 
         self.betweeness_value = given_betweenness_value
+        self.betweenness_sample = betweenness_sample
+        self.betweenness_top = betweenness_top
+        self.betweenness_stability = betweenness_stability
+        self.betweenness_sampling = dict()
         filename = filename + '_betweenness'
         StateOfArtAlgorithm.__init__(self,
                                      graph=graph,
@@ -327,89 +416,73 @@ class HybridLinkPrediction(LinkWithBetweenness, StateOfArtAlgorithm):
                                      algorithm=algorithm,
                                      k=k,
                                      filename=filename,
-                                     given_values=given_values)
+                                     given_values=given_values,
+                                     engine=engine,
+                                     max_memory=max_memory,
+                                     cache_k=cache_k,
+                                     cache=cache,
+                                     core=core)
 
     def prediction(self):
 
-        highest_betweenness = dict()
-
-        if not self.betweeness_value:
-            for community in self.communities:
-                print("Getting betweenness for community {}".format(community))
-                subgraph = nx.subgraph(self.graph, self.communities[community])
-                highest_betweenness[community] = self._LinkWithBetweenness__get_betweenness(subgraph)
-
-            print("Betweenness done")
-            write_dict_to_json(highest_betweenness, self.filename, "../betweenness/")
-            print("Betweenness values written")
+        number_edges = round(self.k * self.n_edges)
+        kind = self.algorithm.lower()
+        params = self.cache_params(hybrid=True, engine=self.engine, **self.betweenness_params())
+        ranked_edges = self.values
+        if ranked_edges is None:
+            ranked_edges = self.read_cached(kind, params, read_ranked_edges)
+
+        if ranked_edges is not None and ranked_edges.covers(number_edges):
+            print(f"betweenness + {self.algorithm.lower()} provided")
+            edges_to_add = ranked_edges.top(number_edges)
         else:
-            print("Betweenness provided")
-            highest_betweenness = self.betweeness_value
+            edges_to_add = self.__rank_edges(number_edges, kind, params)
 
-        highest_betweenness_left = highest_betweenness["0"]
-        highest_betweenness_right = highest_betweenness["1"]
-        non_connected_nodes = list(nx.non_edges(self.graph))
-        n_possible_new_connections = len(non_connected_nodes)
-        non_connected_nodes = list(
-            filter(
-                lambda x:
-                (x[0] in highest_betweenness_right and x[1] in highest_betweenness_left)
-                or (x[0] in highest_betweenness_left and x[1] in highest_betweenness_right),
-                non_connected_nodes
-            )
-        )
-        ranked_betweenness_nodes = self._LinkWithBetweenness__get_highest_betweenness(
-            non_connected_nodes,
-            highest_betweenness_left,
-            highest_betweenness_right
-        )
+        self.percentage_edges_added = self.k
+        print("% of edges added: {}".format(self.percentage_edges_added))
+        print("Adding {} edges".format(number_edges))
 
-        if not self.values:
-            algorithm = None
-            print("Combining betweenness with {}".format(self.algorithm.lower()))
-            if self.algorithm.upper() == TypeOfAlgorithm.ADAMIC_ADAR.value:
-                algorithm = nx.adamic_adar_index
-            elif self.algorithm == TypeOfAlgorithm.JACCARD_COEFFICIENT.value:
-                algorithm = nx.jaccard_coefficient
-            elif self.algorithm == TypeOfAlgorithm.RESOURCE_ALLOCATION.value:
-                algorithm = nx.resource_allocation_index
-            elif self.algorithm == TypeOfAlgorithm.PREFERENTIAL_ATTACHMENT.value:
-                algorithm = nx.preferential_attachment
-
-            ranked_similarity_nodes = list(
-                sorted(
-                    algorithm(self.graph, non_connected_nodes),
-                    key=lambda element: element[2],
-                    reverse=True)
-            )
+        for edge in edges_to_add:
+            self.link_nodes(edge[0], edge[1])
 
-            write_dict_to_json({"values": ranked_similarity_nodes}, self.filename, f"../{self.algorithm.lower()}/")
-            print(f"{self.algorithm} values written")
-        else:
-            print(f"{self.algorithm.lower()} provided")
-            ranked_similarity_nodes = list(self.values.values())[0]
-            ranked_similarity_nodes = list(map(tuple, ranked_similarity_nodes))
+    def __rank_edges(self, number_edges: int, kind: str, params: dict):
 
-        scores = self.__combine_scores(ranked_betweenness_nodes, ranked_similarity_nodes)
-        scores = {k: v for k, v in sorted(scores.items(), key=lambda item: item[1], reverse=True)}
+        highest_betweenness = self._LinkWithBetweenness__get_community_betweenness(self.betweeness_value)
 
-        max_links = len(scores)
-        number_edges = round(self.k, self.n_edges)
-        all_possible_new_edges = scores.keys()
-        if number_edges < max_links:
-            edges_to_add = islice(all_possible_new_edges, number_edges)
+        highest_betweenness_left = highest_betweenness["0"]
+        highest_betweenness_right = highest_betweenness["1"]
+        non_connected_nodes = CrossCommunityCandidates(self.graph, highest_betweenness_left, highest_betweenness_right)
+        edges_to_cache = max(number_edges, round(self.cache_k * self.n_edges))
+
+        if self.max_memory:
+            print("Combining betweenness with {} by chunks of {} bytes".format(self.algorithm.lower(),
+                                                                               self.max_memory))
+            ranked_edges = SparseSimilarity(self.graph, self.core).top_scores(self.algorithm,
+                                                                              non_connected_nodes,
+                                                                              edges_to_cache,
+                                                                              self.max_memory,
+                                                                              highest_betweenness_left,
+                                                                              highest_betweenness_right)
+            n_candidates = len(non_connected_nodes)
         else:
-            edges_to_add = all_possible_new_edges
+            ranked_betweenness_nodes = self._LinkWithBetweenness__get_highest_betweenness(
+                non_connected_nodes,
+                highest_betweenness_left,
+                highest_betweenness_right
+            )
 
-        self.percentage_edges_added = self.k
-        print("% of edges added: {}".format(self.percentage_edges_added))
-        print("Adding {} edges".format(number_edges))
+            print("Combining betweenness with {}".format(self.algorithm.lower()))
+            ranked_similarity_nodes = self.get_similarity(non_connected_nodes)
+            scores = self.__combine_scores(ranked_betweenness_nodes, ranked_similarity_nodes)
+            ranked_edges = [(u, v, score) for (u, v), score in top_edges(scores.items(), edges_to_cache)]
+            n_candidates = len(scores)
+        self.write_cached(kind, params, lambda entry, path: write_ranked_edges(ranked_edges, n_candidates, entry, path))
+        print(f"Betweenness + {self.algorithm} values written")
 
-        for edge in edges_to_add:
-            self.link_nodes(edge[0], edge[1])
+        return ranked_edges[:number_edges]
 
     @staticmethod
-    def __combine_scores(ranked_betweenness: dict, ranked_similarity: List[tuple]):
+    def __combine_scores(ranked_betweenness: dict, ranked_similarity: Iterable):
 
         scores = dict()
         for nodes in ranked_similarity:
@@ -0,0 +1,65 @@
+# define betweenness centrality estimated from sampled pivots
+
+import random
+
+import networkx as nx
+
+
+def sampled_betweenness(graph: nx.Graph, sample_size: int, top: int = 50, stability: float = 0.9, seed: int = 10):
+    """
+    Return the normalized betweenness of the nodes of graph, estimated from the shortest paths of sampled pivots
+
+    The dependencies of the pivots on every node are accumulated (Brandes), then scaled as if every node were a
+    pivot, so with all the nodes as pivots the values are the exact ones of nx.betweenness_centrality.
+    The sample starts with sample_size pivots and is doubled, adding new pivots to the ones already used, until
+    the top nodes by betweenness are almost the same of the previous sample: the fraction of them still in the top
+    is at least stability
+
+    Parameter
+    ---------
+    graph : undirected nx.Graph
+    sample_size : number of pivots of the first sample
+    top : number of nodes with the highest betweenness which have to be stable
+    stability : smallest fraction of the top nodes in common with the previous sample to stop
+    seed : seed of the order of the pivots
+
+    Return
+    ------
+    betweenness : dict with the estimated betweenness of every node
+    sampling : dict with the number of pivots and of nodes, the fraction of top nodes in common between
+        consecutive samples and if the values are exact
+    """
+    nodes = sorted(graph, key=str)
+    n_nodes = len(nodes)
+    pivots = random.Random(seed).sample(nodes, n_nodes)
+    dependencies = dict.fromkeys(nodes, 0.0)
+    overlaps = list()
+    previous_top = None
+    used = 0
+    size = min(max(sample_size, 1), n_nodes)
+    while True:
+        # unnormalized values of an undirected graph are halved: every path is found from both of its ends
+        batch = nx.betweenness_centrality_subset(graph, pivots[used:size], nodes, normalized=False)
+        for node, value in batch.items():
+            dependencies[node] += 2 * value
+        used = size
+
+        scale = n_nodes / (used * (n_nodes - 1) * (n_nodes - 2)) if n_nodes > 2 else 0.5
+        betweenness = {node: value * scale for node, value in dependencies.items()}
+        ranked = sorted((node for node in nodes if betweenness[node] > 0), key=betweenness.get, reverse=True)
+        current_top = set(ranked[:top])
+        if previous_top is not None:
+            overlaps.append(len(current_top & previous_top) / max(len(current_top), 1))
+            if overlaps[-1] >= stability:
+                break
+        if used == n_nodes:
+            break
+        previous_top = current_top
+        size = min(2 * used, n_nodes)
+
+    sampling = {"pivots": used,
+                "nodes": n_nodes,
+                "top": top,
+                "top_overlaps": overlaps,
+                "exact": used == n_nodes}
+    return betweenness, sampling
@@ -0,0 +1,47 @@
+# define candidate edges generation
+
+from typing import Iterable
+
+import networkx as nx
+
+
+class CrossCommunityCandidates:
+    """
+    Lazy collection of the missing edges between two communities
+
+    Only the pairs (u, v) with u in left and v in right which are not already connected are generated,
+    so the non-edges of the whole graph are never materialized. The object can be iterated more than
+    once and the pairs are always generated in the same order: left nodes in the given order and, for
+    each of them, right nodes in the given order.
+
+    Parameter
+    ---------
+    graph : nx.Graph
+    left : iterable of nodes of the first community (list, dict keys, set)
+    right : iterable of nodes of the second community (list, dict keys, set)
+    """
+
+    def __init__(self, graph: nx.Graph, left: Iterable, right: Iterable):
+
+        self.graph = graph
+        self.left = [node for node in dict.fromkeys(left) if node in graph]
+        left_members = set(self.left)
+        self.right = [node for node in dict.fromkeys(right) if node in graph and node not in left_members]
+        self.right_members = set(self.right)
+
+    def __iter__(self):
+
+        adjacency = self.graph.adj
+        right = self.right
+        for u in self.left:
+            neighbors = adjacency[u]
+            for v in right:
+                if v not in neighbors:
+                    yield u, v
+
+    def __len__(self):
+
+        adjacency = self.graph.adj
+        right_members = self.right_members
+        n_right = len(self.right)
+        return sum(n_right - sum(1 for v in adjacency[u] if v in right_members) for u in self.left)
@@ -1,14 +1,18 @@
 # define abstract class
 
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Callable, Dict
 
 from networkx import Graph
 
+from common.cache import communities_digest
+from common.graph_core import OverlayGraph
+from common.score_cache import ScoreCaches
+
 
 class LinkAlgorithm(ABC):
 
-    def __init__(self, graph: Graph, communities: Dict[str, list], values: dict, filename):
+    def __init__(self, graph: Graph, communities: Dict[str, list], values: dict, filename, cache: ScoreCaches = None):
 
         self.percentage_edges_added = 0
         self.graph = graph
@@ -16,6 +20,11 @@ class LinkAlgorithm(ABC):
         self.n_edges = len(graph.edges)
         self.values = values
         self.filename = filename
+        # without a cache the values are always computed and never written
+        self.cache = cache
+        # graph is never modified: the linked edges go to an overlay of it
+        self.linked_graph = OverlayGraph(graph)
+        self.added_edges = self.linked_graph.added_edges
         self.prediction()
 
     @abstractmethod
@@ -23,11 +32,46 @@ class LinkAlgorithm(ABC):
 
         pass
 
+    def cache_params(self, **params):
+        """
+        Return the parameters identifying the cached values, the partition of the nodes is always included
+        """
+        params["communities"] = communities_digest(self.communities)
+        return params
+
+    def read_cached(self, kind: str, params: dict, reader: Callable):
+        """
+        Return the cached values of kind computed with params, None if they are not in cache or there is no cache
+
+        Parameter
+        ---------
+        kind : kind of values, it is also the name of the cache folder
+        params : parameters used to compute the values
+        reader : function reading the values given the name of the entry and its folder
+        """
+        if self.cache is None:
+            return None
+        return self.cache.get(kind, params, reader)
+
+    def write_cached(self, kind: str, params: dict, writer: Callable, name: str = None):
+        """
+        Write values of kind computed with params to the cache, if there is one
+
+        Parameter
+        ---------
+        kind : kind of values, it is also the name of the cache folder
+        params : parameters used to compute the values
+        writer : function writing the values given the name of the entry and its folder
+        name : readable prefix of the entry, filename by default
+        """
+        if self.cache is not None:
+            self.cache.put(kind, name if name else self.filename, params, writer)
+
     def link_nodes(self, u, v):
 
-        if self.graph.has_edge(u, v):
+        if self.linked_graph.has_edge(u, v):
             raise Exception("Cannot create connection: the edge is already present")
         else:
-            self.graph.add_edge(u, v)
+            self.linked_graph.add_edge(u, v)
 
-        return self.graph
+        return self.linked_graph
@@ -0,0 +1,29 @@
+# define selection of the best candidate edges
+
+import heapq
+from operator import itemgetter
+from typing import Callable, Iterable, List
+
+
+def top_edges(scored_edges: Iterable, number_edges: int, key: Callable = itemgetter(1)) -> List:
+    """
+    Return the number_edges elements with the highest score, from the best to the worst
+
+    Only a bounded heap of number_edges elements is kept, instead of sorting every candidate.
+    Tie-break rule: elements with the same score keep the order in which they are generated,
+    so the first generated wins. The result is therefore identical to
+    sorted(scored_edges, key=key, reverse=True)[:number_edges]
+
+    Parameter
+    ---------
+    scored_edges : iterable of scored elements, e.g. dict items (pair, score) or tuples (u, v, score)
+    number_edges : number of elements to select
+    key : function returning the score of an element
+
+    Return
+    ------
+    best_edges : list of the selected elements
+    """
+    if number_edges <= 0:
+        return list()
+    return heapq.nlargest(number_edges, scored_edges, key=key)
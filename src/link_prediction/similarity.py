@@ -0,0 +1,171 @@
+# define vectorized similarity scores
+
+import networkx as nx
+import numpy as np
+
+from common.graph_core import GraphCore, networkx_csr
+from link_prediction.candidates import CrossCommunityCandidates
+
+
+# estimated bytes of memory needed by a single pair of a dense scoring block
+BYTES_PER_PAIR = 32
+
+
+class SparseSimilarity:
+    """
+    Compute the state of art similarity scores with sparse matrix products
+
+    The binary CSR adjacency matrix A is built once, then the scores of the pairs in left x right are
+    computed by blocks of rows of the left community:
+        common neighbours: A[L] A[R]^T
+        adamic adar: A[L] D_log^-1 A[R]^T
+        resource allocation: A[L] D^-1 A[R]^T
+    The results are the same of the networkx functions, up to floating point rounding.
+
+    Parameter
+    ---------
+    graph : nx.Graph
+    core : integer-indexed graph of graph, its CSR adjacency is used instead of converting graph
+    """
+
+    def __init__(self, graph: nx.Graph, core: GraphCore = None):
+
+        if core is not None:
+            self.nodes = core.labels
+            self.index = core.index
+            self.adjacency = core.adjacency()
+            self.degree = core.degree.astype(np.int64)
+        else:
+            self.nodes = list(graph)
+            self.index = {node: i for i, node in enumerate(self.nodes)}
+            self.adjacency = networkx_csr(graph, nodelist=self.nodes, weight=None)
+            self.degree = np.array([degree for _, degree in graph.degree(self.nodes)], dtype=np.int64)
+        self.adjacency.data[:] = 1
+        self.n_neighbors = np.diff(self.adjacency.indptr)
+
+    def scores(self, algorithm: str, candidates: CrossCommunityCandidates, batch_size: int = 1024):
+        """
+        Yield (u, v, score) for every candidate pair, in the order of the candidates
+
+        Parameter
+        ---------
+        algorithm : JACCARD_COEFFICIENT, ADAMIC_ADAR, RESOURCE_ALLOCATION or PREFERENTIAL_ATTACHMENT
+        candidates : pairs to score
+        batch_size : number of left nodes scored at once
+        """
+        left = np.array([self.index[node] for node in candidates.left], dtype=np.int64)
+        right = np.array([self.index[node] for node in candidates.right], dtype=np.int64)
+        if len(left) == 0 or len(right) == 0:
+            return
+
+        for start in range(0, len(left), batch_size):
+            rows = left[start:start + batch_size]
+            block = self.block_scores(algorithm, rows, right)
+            existing = self.adjacency[rows][:, right].toarray() != 0
+            row_position, column_position = np.nonzero(~existing)
+            values = block[row_position, column_position].tolist()
+            u_nodes = [candidates.left[start + i] for i in row_position.tolist()]
+            v_nodes = [candidates.right[j] for j in column_position.tolist()]
+            yield from zip(u_nodes, v_nodes, values)
+
+    def top_scores(self, algorithm: str, candidates: CrossCommunityCandidates, number_edges: int, max_memory: int,
+                   left_weights: dict = None, right_weights: dict = None):
+        """
+        Return the number_edges best (u, v, score) triples, from the best to the worst
+
+        The left x right block is tiled by ranges of left rows, so that a dense tile never needs more than
+        max_memory bytes, and only a running top number_edges is kept across the tiles. Pairs with the same
+        score are ranked by candidate order, so the result is the same of top_edges over scores().
+        With left_weights and right_weights the score of (u, v) is multiplied by left_weights[u] + right_weights[v],
+        e.g. the betweenness of the hybrid algorithms
+
+        Parameter
+        ---------
+        algorithm : JACCARD_COEFFICIENT, ADAMIC_ADAR, RESOURCE_ALLOCATION or PREFERENTIAL_ATTACHMENT
+        candidates : pairs to score
+        number_edges : number of pairs to select
+        max_memory : memory ceiling in bytes of a scoring tile
+        left_weights : dict with the weight of every left node of candidates
+        right_weights : dict with the weight of every right node of candidates
+        """
+        left = np.array([self.index[node] for node in candidates.left], dtype=np.int64)
+        right = np.array([self.index[node] for node in candidates.right], dtype=np.int64)
+        if len(left) == 0 or len(right) == 0 or number_edges <= 0:
+            return list()
+
+        if left_weights is not None:
+            left_weights = np.array([left_weights[node] for node in candidates.left], dtype=np.float64)
+            right_weights = np.array([right_weights[node] for node in candidates.right], dtype=np.float64)
+        n_right = len(right)
+        rows_per_tile = max(1, int(max_memory // (n_right * BYTES_PER_PAIR)))
+        best_positions = np.empty(0, dtype=np.int64)
+        best_scores = None
+
+        for start in range(0, len(left), rows_per_tile):
+            rows = left[start:start + rows_per_tile]
+            block = self.block_scores(algorithm, rows, right)
+            if left_weights is not None:
+                block = block * (left_weights[start:start + len(rows)][:, None] + right_weights[None, :])
+            existing = self.adjacency[rows][:, right].toarray() != 0
+            flat_positions = np.flatnonzero(~existing)
+            scores = block.ravel()[flat_positions]
+            positions = flat_positions + start * n_right
+            if best_scores is not None:
+                scores = np.concatenate((best_scores, scores))
+                positions = np.concatenate((best_positions, positions))
+            best_positions, best_scores = self.__select(positions, scores, number_edges)
+
+        order = np.lexsort((best_positions, -best_scores))
+        best_positions = best_positions[order]
+        best_scores = best_scores[order].tolist()
+        u_nodes = [candidates.left[i] for i in (best_positions // n_right).tolist()]
+        v_nodes = [candidates.right[j] for j in (best_positions % n_right).tolist()]
+        return list(zip(u_nodes, v_nodes, best_scores))
+
+    @staticmethod
+    def __select(positions: np.ndarray, scores: np.ndarray, number_edges: int):
+
+        if len(scores) <= number_edges:
+            return positions, scores
+        threshold = -np.partition(-scores, number_edges - 1)[number_edges - 1]
+        keep = scores >= threshold
+        positions = positions[keep]
+        scores = scores[keep]
+        if len(scores) > number_edges:
+            order = np.lexsort((positions, -scores))[:number_edges]
+            positions = positions[order]
+            scores = scores[order]
+        return positions, scores
+
+    def block_scores(self, algorithm: str, rows: np.ndarray, columns: np.ndarray):
+        """
+        Return the dense matrix of the scores between rows and columns
+
+        Parameter
+        ---------
+        algorithm : JACCARD_COEFFICIENT, ADAMIC_ADAR, RESOURCE_ALLOCATION or PREFERENTIAL_ATTACHMENT
+        rows : node indices of the left community
+        columns : node indices of the right community
+        """
+        if algorithm == "PREFERENTIAL_ATTACHMENT":
+            return np.outer(self.degree[rows], self.degree[columns])
+
+        adjacency_rows = self.adjacency[rows]
+        adjacency_columns = self.adjacency[columns].T
+        if algorithm == "JACCARD_COEFFICIENT":
+            common = (adjacency_rows @ adjacency_columns).toarray().astype(np.float64)
+            union = self.n_neighbors[rows][:, None] + self.n_neighbors[columns][None, :] - common
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(union > 0, common / union, 0.0)
+
+        degree = self.degree.astype(np.float64)
+        if algorithm == "ADAMIC_ADAR":
+            with np.errstate(divide='ignore'):
+                weights = np.where(degree > 1, 1 / np.log(degree), 0.0)
+        elif algorithm == "RESOURCE_ALLOCATION":
+            with np.errstate(divide='ignore'):
+                weights = np.where(degree > 0, 1 / degree, 0.0)
+        else:
+            raise ValueError("algorithm not valid")
+        weighted_rows = adjacency_rows.multiply(weights[None, :]).tocsr()
+        return (weighted_rows @ adjacency_columns).toarray()
@@ -1,22 +1,75 @@
 # define main
 
 import argparse
+import contextlib
+import io
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from os import listdir, makedirs
+from os.path import splitext
 
 import networkx as nx
 import sys
 
 from common.collect_results import results
-from common.utility import read_json_to_dict, write_dict_to_json
+from common.cache import GraphCache, core_digest
+from common.edge_list import edge_list_from_networkx, is_edge_list, read_edge_list
+from common.graph_core import core_from_edge_list, core_from_networkx
+from common.snapshot import SNAPSHOT_EXTENSION, GraphSnapshot, read_snapshot, source_digest, source_metadata, \
+    write_snapshot
+from common.utility import atomic_write
 from community.partition import CommunityDetection
 
 parser = argparse.ArgumentParser(description='echo chambers pipeline')
 parser.add_argument('folder', help='Folder containing graph data')
-parser.add_argument('-per', help='percentage of new edges to add', default=0.005, type=float)
+parser.add_argument('-per', help='percentages of new edges to add, a CSV is written for each of them',
+                    default=[0.005], type=float, nargs='+')
 parser.add_argument('-hybrid', help='Include to get hybrid result', default=False, action='store_true')
 parser.add_argument('-kern', help='Detect community using kernighan-lin', default=False, action='store_true')
 parser.add_argument('-complete', help='Run analysis using all controversy measures', default=False, action='store_true')
-args = parser.parse_args()
+parser.add_argument('-engine', help='Engine used to compute the state of art scores', default='networkx',
+                    choices=['networkx', 'sparse'])
+parser.add_argument('-max_memory', help='Score the state of art and hybrid algorithms by chunks of at most this many '
+                                        'MB, needs -engine sparse', default=None, type=int)
+parser.add_argument('-cache_per', help='largest percentage of new edges kept in the score caches',
+                    default=None, type=float)
+parser.add_argument('-cache_size', help='Maximum MB kept in each cache folder, least recently used entries are removed',
+                    default=None, type=int)
+parser.add_argument('-jobs', help='Number of graphs processed in parallel', default=1, type=int)
+parser.add_argument('-workers', help='Number of link prediction algorithms run in parallel for each graph',
+                    default=1, type=int)
+parser.add_argument('-rwc_workers', help='Number of processes running the random walks of each measure',
+                    default=1, type=int)
+parser.add_argument('-rwc_tolerance', help='Stop the random walks once the 95%% confidence interval of RWC '
+                                           'is at most this wide on each side', default=None, type=float)
+parser.add_argument('-atlas_engine', help='Engine of the ForceAtlas layouts: numpy is exact and vectorized, '
+                                          'grid approximates the repulsion',
+                    default='networkx', choices=['networkx', 'numpy', 'grid'])
+parser.add_argument('-atlas_theta', help='Tolerance of the grid ForceAtlas engine, lower is more accurate and slower',
+                    default=1.0, type=float)
+parser.add_argument('-atlas_sample', help='Estimate the mean distances of the ForceAtlas scores from this many random '
+                                          'pairs of nodes (at least 2), when there are more pairs', default=None,
+                    type=int)
+parser.add_argument('-atlas_refine', help='Largest number of iterations of the ForceAtlas layouts after adding edges, '
+                                          'which start from the layout before; 0 to start them from scratch',
+                    default=100, type=int)
+parser.add_argument('-atlas_refine_temperature', help='Initial temperature of the ForceAtlas layouts after adding '
+                                                      'edges', default=0.01, type=float)
+parser.add_argument('-atlas_refine_tolerance', help='Stop the ForceAtlas layouts after adding edges once the nodes '
+                                                    'move on average by at most this fraction of k per iteration',
+                    default=0.01, type=float)
+parser.add_argument('-betweenness_sample', help='Estimate the betweenness from this many pivots, doubled until the '
+                                                'nodes with the highest betweenness are stable; exact if not given',
+                    default=None, type=int)
+parser.add_argument('-betweenness_top', help='Number of nodes with the highest betweenness which have to be stable',
+                    default=50, type=int)
+parser.add_argument('-betweenness_stability', help='Fraction of the nodes with the highest betweenness which have to '
+                                                   'be the same in two consecutive samples', default=0.9, type=float)
+parser.add_argument('-edge_list', help='Read the edge list of a graph given both as gexf and as edge list, it is '
+                                       'faster to load but its neighbour order may differ from the gexf one',
+                    default=False, action='store_true')
+parser.add_argument('-no_snapshot', help='Always read the graph files instead of their binary snapshots',
+                    default=False, action='store_true')
 
 path_community = '../community/'
 path_betweenness = '../betweenness/'
@@ -25,121 +78,207 @@ path_jaccard = '../jaccard_coefficient/'
 path_adamic_adar = '../adamic_adar/'
 path_resource_allocation = '../resource_allocation/'
 path_preferential_attachment = '../preferential_attachment/'
-print('Creating folder community, betweenness, effective_size')
-makedirs(path_community, exist_ok=True)
-makedirs(path_betweenness, exist_ok=True)
-makedirs(path_effective_size, exist_ok=True)
-makedirs(path_jaccard, exist_ok=True)
-makedirs(path_adamic_adar, exist_ok=True)
-makedirs(path_resource_allocation, exist_ok=True)
-makedirs(path_preferential_attachment, exist_ok=True)
-
-try:
+path_snapshot = '../snapshot/'
+
+
+def process_graph(file: str, args: argparse.Namespace, percentages: list = None):
+    """
+    Collect and write the results of a single graph
+
+    Parameter
+    ---------
+    file : name of the graph file in args.folder
+    args : parsed command line arguments
+    percentages : percentages of new edges to add, args.per by default
+    """
     path = args.folder
     hybrid = args.hybrid
-    kern = args.kern
     complete = args.complete
-    algorithm = 'kernighan-lin' if kern else 'fluidc'
+    engine = args.engine
+    max_memory = args.max_memory * 2 ** 20 if args.max_memory else None
+    algorithm = 'kernighan-lin' if args.kern else 'fluidc'
     folder_result = "result_hybrid" if hybrid else "result_standard"
-    percentage_edges = args.per
-
-    files = listdir(path)
-    output = map(lambda x: x.split(".")[0], listdir("../" + folder_result + "/"))
-    communities_written = listdir(path_community)
-    betweenness_values = listdir(path_betweenness)
-    effective_size_values = listdir(path_effective_size)
-    jaccard_values = listdir(path_jaccard)
-    adamic_adar_values = listdir(path_adamic_adar)
-    resource_allocation_values = listdir(path_resource_allocation)
-    preferential_attachment_values = listdir(path_preferential_attachment)
+    percentages = sorted(set(percentages if percentages else args.per))
+    cache_size = args.cache_size * 2 ** 20 if args.cache_size else None
+    cache_percentage_edges = max(percentages[-1], args.cache_per) if args.cache_per else percentages[-1]
 
-    for file in files:
+    graph_name = file.split(".")[0]
 
-        graph_name = file.split(".")[0]
+    print("Creating graph for {}".format(graph_name))
+    tweet_data = path + file
+    # the snapshot of the file is valid as long as the content of the file does not change, which is checked from
+    # its size and modification time before hashing it
+    snapshot_file = path_snapshot + file + SNAPSHOT_EXTENSION
+    metadata = None
+    snapshot = None
+    if not args.no_snapshot:
+        metadata = source_metadata(tweet_data)
+        snapshot = read_snapshot(snapshot_file, tweet_data)
+    # the integer-indexed graph is built once, the networkx graph only for the stages which still need it
+    graph = None
+    if snapshot is not None:
+        edge_list = snapshot.edge_list
+        core = snapshot.core
+        print("Graph created from snapshot")
+    elif is_edge_list(file):
+        edge_list = read_edge_list(tweet_data, delimiter=',')
+        core = core_from_edge_list(edge_list)
+        print("Graph created")
+    elif file.endswith('.gexf'):
+        graph = nx.read_gexf(tweet_data)
+        edge_list = edge_list_from_networkx(graph)
+        core = core_from_networkx(graph)
+        print("Graph created")
+    else:
+        print('Only gexf and u,v,w edge lists (txt, csv, optionally gz) are supported')
+        print('Convert you data to gexf format using networkx')
+        sys.exit(1)
+
+    # the communities of the snapshot need no graph, the community detection and its cache do
+    given_communities = snapshot.communities.get(algorithm) if snapshot else None
+    if graph is None and given_communities is None:
+        graph = edge_list.to_networkx()
+    cache = GraphCache(graph, root="../", max_size=cache_size,
+                       digest=snapshot.digest if snapshot else core_digest(core))
+    communities = CommunityDetection(graph=graph,
+                                     algorithm=algorithm,
+                                     given_communities=given_communities,
+                                     cache=cache,
+                                     filename=graph_name + '_' + algorithm)
+    core.assign_communities(communities.communities)
+
+    # a snapshot validated by hashing is written again with the new metadata, so the next run does not hash
+    if not args.no_snapshot and (snapshot is None or given_communities is None or snapshot.metadata != metadata):
+        if snapshot is None:
+            snapshot = GraphSnapshot(source_digest(tweet_data), cache.digest, edge_list, core)
+        snapshot.communities[algorithm] = communities.communities
+        snapshot.metadata = metadata
+        write_snapshot(snapshot_file, snapshot)
+        print("Snapshot of {} written".format(graph_name))
+
+    # the link prediction algorithms work on the networkx graph
+    if graph is None:
+        graph = edge_list.to_networkx()
+    result = results(g=graph,
+                     communities=communities.communities,
+                     per_edges=percentages,
+                     filename=graph_name,
+                     link_prediction_alg=[
+                         "BETWEENNESS",
+                         "EFFECTIVE_SIZE",
+                         "JACCARD_COEFFICIENT",
+                         "ADAMIC_ADAR",
+                         "RESOURCE_ALLOCATION",
+                         "PREFERENTIAL_ATTACHMENT"
+                     ],
+                     hybrid=hybrid,
+                     engine=engine,
+                     max_memory=max_memory,
+                     cache_per_edges=cache_percentage_edges,
+                     cache=cache,
+                     workers=args.workers,
+                     rwc_workers=args.rwc_workers,
+                     rwc_tolerance=args.rwc_tolerance,
+                     atlas_engine=args.atlas_engine,
+                     atlas_theta=args.atlas_theta,
+                     atlas_sample_size=args.atlas_sample,
+                     atlas_refine_iterations=args.atlas_refine,
+                     atlas_refine_temperature=args.atlas_refine_temperature,
+                     atlas_refine_tolerance=args.atlas_refine_tolerance,
+                     betweenness_sample=args.betweenness_sample,
+                     betweenness_top=args.betweenness_top,
+                     betweenness_stability=args.betweenness_stability,
+                     core=core,
+                     complete=complete)
+
+    for percentage_edges in percentages:
         filename = graph_name + f"_{percentage_edges}"
-        if filename in output:
+        result_percentage = result[result["Percentage_edges_added"] == percentage_edges].reset_index(drop=True)
+        with atomic_write("../" + folder_result + "/" + filename + ".csv") as csv_file:
+            result_percentage.to_csv(csv_file)
+
+
+def process_graph_with_log(file: str, args: argparse.Namespace, percentages: list = None):
+    """
+    Collect the results of a single graph in a worker process
+
+    Everything printed is kept in a buffer, so that the logs of different graphs never interleave
+
+    Return
+    ------
+    log : everything printed while processing the graph
+    error : exception raised while processing the graph, None if it succeeded
+    """
+    log = io.StringIO()
+    error = None
+    with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            process_graph(file, args, percentages)
+        except BaseException as e:
+            traceback.print_exc()
+            error = e
+    return log.getvalue(), error
+
+
+def main(args: argparse.Namespace):
+
+    if args.max_memory and args.engine != 'sparse':
+        parser.error('-max_memory needs -engine sparse')
+    if args.atlas_sample is not None and args.atlas_sample < 2:
+        parser.error('-atlas_sample must be at least 2')
+
+    print('Creating folder community, betweenness, effective_size')
+    makedirs(path_community, exist_ok=True)
+    makedirs(path_betweenness, exist_ok=True)
+    makedirs(path_effective_size, exist_ok=True)
+    makedirs(path_jaccard, exist_ok=True)
+    makedirs(path_adamic_adar, exist_ok=True)
+    makedirs(path_resource_allocation, exist_ok=True)
+    makedirs(path_preferential_attachment, exist_ok=True)
+    makedirs(path_snapshot, exist_ok=True)
+
+    folder_result = "result_hybrid" if args.hybrid else "result_standard"
+    files = listdir(args.folder)
+    output = list(map(lambda x: splitext(x)[0], listdir("../" + folder_result + "/")))
+
+    # a graph may be given both as gexf and as edge list: the gexf is read unless -edge_list is given, as the order
+    # of the neighbours, and so the partitions not yet cached, may differ between the two
+    files = sorted(files, key=lambda x: is_edge_list(x) != args.edge_list)
+    graph_names = set()
+    files_to_process = dict()
+    for file in files:
+        graph_name = file.split(".")[0]
+        if graph_name in graph_names:
+            continue
+        graph_names.add(graph_name)
+        percentages = [per for per in sorted(set(args.per)) if graph_name + f"_{per}" not in output]
+        if not percentages:
             print("Results for {} have already been collected".format(graph_name))
         else:
-            print("Creating graph for {}".format(graph_name))
-            tweet_data = path + file
-            if not file.endswith('.gexf'):
-                print('Only gexf type is supported')
-                print('Convert you data to gexf format using networkx')
-                sys.exit(1)
-            else:
-                graph = nx.read_gexf(tweet_data)
-                print("Graph created")
-
-            communities_to_write = graph_name + '_' + algorithm + '.json'
-            betweenness_to_evaluate = graph_name + '_betweenness.json'
-            effective_size_to_evaluate = graph_name + '_effective_size.json'
-            jaccard_to_evaluate = graph_name + '_jaccard_coefficient.json'
-            adamic_adar_to_evaluate = graph_name + '_adamic_adar.json'
-            resource_allocation_to_evaluate = graph_name + '_resource_allocation.json'
-            preferential_attachment_to_evaluate = graph_name + '_preferential_attachment.json'
-
-            if betweenness_to_evaluate in betweenness_values:
-                given_betweenness_value = read_json_to_dict(betweenness_to_evaluate,
-                                                            path_betweenness)
-            else:
-                given_betweenness_value = None
-            if effective_size_to_evaluate in effective_size_values:
-                given_effective_size_value = read_json_to_dict(effective_size_to_evaluate,
-                                                               path_effective_size)
-            else:
-                given_effective_size_value = None
-            if jaccard_to_evaluate in jaccard_values:
-                given_jaccard_value = read_json_to_dict(jaccard_to_evaluate,
-                                                        path_jaccard)
-            else:
-                given_jaccard_value = None
-            if adamic_adar_to_evaluate in adamic_adar_values:
-                given_adamic_adar_value= read_json_to_dict(adamic_adar_to_evaluate,
-                                                           path_adamic_adar)
-            else:
-                given_adamic_adar_value = None
-            if resource_allocation_to_evaluate in resource_allocation_values:
-                given_resource_allocation_value = read_json_to_dict(resource_allocation_to_evaluate,
-                                                                    path_resource_allocation)
-            else:
-                given_resource_allocation_value = None
-            if preferential_attachment_to_evaluate in preferential_attachment_values:
-                given_preferential_attachment_value = read_json_to_dict(preferential_attachment_to_evaluate,
-                                                                        path_preferential_attachment)
-            else:
-                given_preferential_attachment_value = None
-
-            if communities_to_write in communities_written:
-                given_communities = read_json_to_dict(communities_to_write, path_community)
-                communities = CommunityDetection(graph=graph, algorithm=algorithm, given_communities=given_communities)
-                print('Getting communities from file')
-            else:
-                communities = CommunityDetection(graph=graph, algorithm=algorithm)
-                write_dict_to_json(communities.communities, communities_to_write, path_community)
-
-            result = results(g=graph,
-                             communities=communities.communities,
-                             per_edges=percentage_edges,
-                             filename=graph_name,
-                             link_prediction_alg=[
-                                 "BETWEENNESS",
-                                 "EFFECTIVE_SIZE",
-                                 "JACCARD_COEFFICIENT",
-                                 "ADAMIC_ADAR",
-                                 "RESOURCE_ALLOCATION",
-                                 "PREFERENTIAL_ATTACHMENT"
-                             ],
-                             hybrid=hybrid,
-                             given_betweenness_value=given_betweenness_value,
-                             given_effective_size=given_effective_size_value,
-                             given_jaccard_value=given_jaccard_value,
-                             given_adamic_adar_value=given_adamic_adar_value,
-                             given_resource_allocation_value=given_resource_allocation_value,
-                             given_preferential_attachment_value=given_preferential_attachment_value,
-                             complete=complete)
-
-            result.to_csv("../" + folder_result + "/" + filename + ".csv")
-
-except Exception as e:
-    print("An error occurred: {}".format(e))
-    raise e
+            files_to_process[file] = percentages
+
+    if args.jobs <= 1:
+        for file, percentages in files_to_process.items():
+            process_graph(file, args, percentages)
+        return
+
+    print("Processing {} graphs with {} workers".format(len(files_to_process), args.jobs))
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {executor.submit(process_graph_with_log, file, args, percentages): file
+                   for file, percentages in files_to_process.items()}
+        for future in as_completed(futures):
+            log, error = future.result()
+            print(log, end='')
+            if error is not None:
+                for pending in futures:
+                    pending.cancel()
+                raise error
+            print("Results for {} collected".format(futures[future].split(".")[0]))
+
+
+if __name__ == '__main__':
+    try:
+        main(parser.parse_args())
+    except Exception as e:
+        print("An error occurred: {}".format(e))
+        raise e
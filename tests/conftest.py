@@ -0,0 +1,6 @@
+# define the path of the modules under test
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
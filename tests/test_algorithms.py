@@ -0,0 +1,63 @@
+# define tests of the link prediction algorithms
+
+import os
+
+import networkx as nx
+import pytest
+
+from common.cache import GraphCache
+from common.score_cache import ScoreCaches
+from link_prediction.algorithms import HybridLinkPrediction, StateOfArtAlgorithm
+
+
+@pytest.fixture
+def graph_communities():
+    graph = nx.relabel_nodes(nx.planted_partition_graph(2, 40, 0.15, 0.02, seed=3), str)
+    communities = {"0": [str(i) for i in range(40)], "1": [str(i) for i in range(40, 80)]}
+    return graph, communities
+
+
+def new_cache(graph, tmp_path, name):
+    return ScoreCaches(GraphCache(graph, root=os.path.join(str(tmp_path), name, "")))
+
+
+def test_max_memory_needs_sparse_engine(graph_communities, tmp_path):
+    graph, communities = graph_communities
+    with pytest.raises(ValueError):
+        StateOfArtAlgorithm(graph, communities, "JACCARD_COEFFICIENT", "test", engine="networkx", max_memory=2 ** 10,
+                            cache=new_cache(graph, tmp_path, "cache"))
+
+
+@pytest.mark.parametrize("algorithm", ["JACCARD_COEFFICIENT", "ADAMIC_ADAR", "PREFERENTIAL_ATTACHMENT"])
+def test_hybrid_by_chunks(graph_communities, tmp_path, algorithm):
+    graph, communities = graph_communities
+    options = dict(algorithm=algorithm, filename="test", k=0.05, engine="sparse")
+    whole = HybridLinkPrediction(graph, communities, cache=new_cache(graph, tmp_path, "whole"), **options)
+    chunks = HybridLinkPrediction(graph, communities, cache=new_cache(graph, tmp_path, "chunks"), max_memory=2 ** 10,
+                                  **options)
+
+    assert len(whole.added_edges) == round(0.05 * graph.number_of_edges())
+    assert chunks.added_edges == whole.added_edges
+
+
+def test_rankings_are_cached_by_engine(graph_communities, tmp_path):
+    graph, communities = graph_communities
+    cache = new_cache(graph, tmp_path, "cache")
+    options = dict(algorithm="ADAMIC_ADAR", filename="test", k=0.05, cache=cache)
+    StateOfArtAlgorithm(graph, communities, engine="networkx", **options)
+    StateOfArtAlgorithm(graph, communities, engine="sparse", **options)
+
+    entries = [file for file in os.listdir(cache.cache.path("adamic_adar")) if file.endswith(".npy")]
+    assert len(entries) == 2
+
+
+def test_nothing_is_cached_without_cache(graph_communities, tmp_path, monkeypatch):
+    graph, communities = graph_communities
+    # the default cache folders are relative to the parent of the working directory
+    (tmp_path / "run").mkdir()
+    monkeypatch.chdir(tmp_path / "run")
+    linked = StateOfArtAlgorithm(graph, communities, "JACCARD_COEFFICIENT", "test", k=0.05)
+
+    assert len(linked.added_edges) == round(0.05 * graph.number_of_edges())
+    assert os.listdir(str(tmp_path)) == ["run"]
+    assert os.listdir(str(tmp_path / "run")) == []
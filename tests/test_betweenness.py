@@ -0,0 +1,43 @@
+# define tests of the sampled betweenness
+
+import networkx as nx
+import pytest
+
+from link_prediction.betweenness import sampled_betweenness
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_all_pivots_give_exact_betweenness(seed):
+    graph = nx.relabel_nodes(nx.planted_partition_graph(2, 25, 0.2, 0.03, seed=seed), str)
+    graph.add_edge("0", "0")
+    graph.add_node("isolated")
+    betweenness, sampling = sampled_betweenness(graph, sample_size=len(graph))
+
+    exact = nx.betweenness_centrality(graph)
+    assert sampling["exact"] and sampling["pivots"] == len(graph)
+    assert betweenness.keys() == exact.keys()
+    for node, value in exact.items():
+        assert betweenness[node] == pytest.approx(value, rel=1e-12, abs=1e-15)
+
+
+def test_stability_stop():
+    graph = nx.relabel_nodes(nx.barabasi_albert_graph(300, 3, seed=1), str)
+    betweenness, sampling = sampled_betweenness(graph, sample_size=10, top=20, stability=0.8)
+
+    # the sample is doubled until the top nodes of two consecutive samples overlap enough
+    overlaps = sampling["top_overlaps"]
+    assert not sampling["exact"]
+    assert sampling["pivots"] == 10 * 2 ** len(overlaps) < len(graph)
+    assert overlaps[-1] >= 0.8
+    assert all(overlap < 0.8 for overlap in overlaps[:-1])
+    assert len(betweenness) == len(graph)
+
+
+def test_unreachable_stability_uses_every_node():
+    graph = nx.relabel_nodes(nx.barabasi_albert_graph(100, 2, seed=2), str)
+    betweenness, sampling = sampled_betweenness(graph, sample_size=7, top=20, stability=1.1)
+
+    exact = nx.betweenness_centrality(graph)
+    assert sampling["exact"] and sampling["pivots"] == len(graph)
+    for node, value in exact.items():
+        assert betweenness[node] == pytest.approx(value, rel=1e-12, abs=1e-15)
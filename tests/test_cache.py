@@ -0,0 +1,11 @@
+# define tests of the content-addressed cache
+
+from common.cache import communities_digest
+
+
+def test_communities_digest_keeps_member_order():
+    communities = {"0": ["a", "b", "c"], "1": ["d", "e"]}
+
+    assert communities_digest(communities) == communities_digest({"1": ["d", "e"], "0": ["a", "b", "c"]})
+    assert communities_digest(communities) != communities_digest({"0": ["b", "a", "c"], "1": ["d", "e"]})
+    assert communities_digest(communities) != communities_digest({"0": ["a", "b", "c"], "1": ["e", "d"]})
@@ -0,0 +1,48 @@
+# define tests of the candidate edges
+
+import networkx as nx
+import pytest
+
+from link_prediction.candidates import CrossCommunityCandidates
+
+
+def baseline_candidates(graph, left, right):
+    """
+    Return the candidate edges as the algorithms selected them before CrossCommunityCandidates
+    """
+    non_connected_nodes = list(nx.non_edges(graph))
+    return list(filter(lambda x: (x[0] in right and x[1] in left) or (x[0] in left and x[1] in right),
+                       non_connected_nodes))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_candidates_equal_baseline_order(seed):
+    # with small integer labels nx.non_edges walks the nodes in increasing order, so the baseline order is fixed
+    # and, with the left nodes before the right ones, it is the order of CrossCommunityCandidates
+    graph = nx.planted_partition_graph(3, 8, 0.5, 0.2, seed=seed)
+    left = list(range(8))
+    right = list(range(8, 16))
+    candidates = CrossCommunityCandidates(graph, left, right)
+
+    assert list(candidates) == baseline_candidates(graph, left, right)
+    assert len(candidates) == len(baseline_candidates(graph, left, right))
+    assert list(candidates) == list(candidates)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_candidates_equal_baseline_pairs(seed):
+    # with string labels the order of nx.non_edges depends on the hashes: only the oriented pairs are compared
+    graph = nx.relabel_nodes(nx.planted_partition_graph(3, 8, 0.5, 0.2, seed=seed), str)
+    nodes = list(graph)
+    left = nodes[8:16] + [nodes[8], "missing"]
+    right = nodes[:8]
+    candidates = CrossCommunityCandidates(graph, left, right)
+    left_members = set(left)
+    baseline = [(u, v) if u in left_members else (v, u) for u, v in baseline_candidates(graph, left, right)]
+
+    pairs = list(candidates)
+    assert len(pairs) == len(set(pairs)) == len(candidates)
+    assert set(pairs) == set(baseline)
+    # left nodes in the given order and, for each of them, right nodes in the given order
+    position = {node: i for i, node in enumerate(dict.fromkeys(left + right))}
+    assert pairs == sorted(baseline, key=lambda pair: (position[pair[0]], position[pair[1]]))
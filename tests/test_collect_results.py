@@ -0,0 +1,62 @@
+# define tests of the collection of the results
+
+import networkx as nx
+import pandas as pd
+import pytest
+
+from common.collect_results import results
+from controversy.measures import RandomWalkControversy
+from link_prediction.algorithms import StateOfArtAlgorithm
+
+PERCENTAGES = [0.02, 0.05, 0.1]
+MEASURES = ["Algorithm", "New_edges", "Number_edges_added", "Percentage_edges_added", "GMCK_post", "RWC_post",
+            "RWC_post_walks", "ForceAtlas_post"]
+
+
+@pytest.fixture
+def graph_communities():
+    graph = nx.relabel_nodes(nx.planted_partition_graph(2, 30, 0.2, 0.03, seed=4), str)
+    communities = {"0": [str(i) for i in range(30)], "1": [str(i) for i in range(30, 60)]}
+    return graph, communities
+
+
+def test_smaller_percentages_are_prefixes(graph_communities):
+    graph, communities = graph_communities
+    largest = StateOfArtAlgorithm(graph, communities, "ADAMIC_ADAR", "test", k=PERCENTAGES[-1]).added_edges
+    for per_edges in PERCENTAGES[:-1]:
+        added_edges = StateOfArtAlgorithm(graph, communities, "ADAMIC_ADAR", "test", k=per_edges).added_edges
+        assert added_edges == largest[:round(per_edges * graph.number_of_edges())]
+
+
+def test_sweep_equals_separate_runs(graph_communities, tmp_path, monkeypatch):
+    graph, communities = graph_communities
+    # nothing is cached, but the default folders are relative to the parent of the working directory
+    (tmp_path / "run").mkdir()
+    monkeypatch.chdir(tmp_path / "run")
+    # the post layouts start from random positions, seeded like the random walks
+    options = dict(filename="test", complete=True, link_prediction_alg=["ADAMIC_ADAR", "BETWEENNESS"], hybrid=False,
+                   seed=7, atlas_engine="numpy", atlas_refine_iterations=0)
+
+    sweep = results(graph, communities, PERCENTAGES, **options)
+    separate = pd.concat([results(graph, communities, per_edges, **options) for per_edges in PERCENTAGES])
+
+    sort_columns = ["Algorithm", "Percentage_edges_added"]
+    sweep = sweep[MEASURES].sort_values(sort_columns).reset_index(drop=True)
+    separate = separate[MEASURES].sort_values(sort_columns).reset_index(drop=True)
+    pd.testing.assert_frame_equal(sweep, separate)
+
+
+def test_random_walk_columns(graph_communities, tmp_path, monkeypatch):
+    graph, communities = graph_communities
+    (tmp_path / "run").mkdir()
+    monkeypatch.chdir(tmp_path / "run")
+    result = results(graph, communities, PERCENTAGES, filename="test", complete=True,
+                     link_prediction_alg=["ADAMIC_ADAR"], hybrid=False, seed=7, rwc_tolerance=0.05,
+                     atlas_engine="numpy")
+
+    pre = RandomWalkControversy(graph, communities, seed=7, tolerance=0.05)
+    assert (result["RWC_pre"] == pre.controversy).all()
+    assert (result["RWC_pre_ci"] == pre.confidence_interval).all()
+    assert (result["RWC_pre_walks"] == pre.walks).all()
+    assert (result["RWC_pre_ci"] <= 0.05).all() and (result["RWC_post_ci"] <= 0.05).all()
+    assert (result["RWC_post_walks"] > 0).all()
@@ -0,0 +1,68 @@
+# define tests of the edge list loading
+
+import gzip
+import os
+import shutil
+
+import networkx as nx
+import pytest
+
+from common.edge_list import read_edge_list
+from common.graph_core import networkx_csr
+from common.utility import file_to_elist
+
+DATA = os.path.join(os.path.dirname(__file__), os.pardir, "data")
+LINES = ["a,b,1.0", "b,c,2.5", "c,a,1.0", "d,a,0.5", "b,a,3.0", "e,e,1.0", "c,d,2.0", "b,c,4.0"]
+
+
+def weighted_lists(graph):
+    return [(node, [(neighbour, data.get("weight", 1.0)) for neighbour, data in graph.adj[node].items()])
+            for node in graph]
+
+
+def elist_graph(file):
+    """
+    Return the graph of the edges of file_to_elist, an edge repeated in the file keeps its last weight
+    """
+    graph = nx.Graph()
+    graph.add_weighted_edges_from((u, v, float(w)) for u, v, w in file_to_elist(file, ','))
+    return graph
+
+
+@pytest.fixture(params=["graph.txt", "graph.txt.gz"])
+def edge_list_file(request, tmp_path):
+    file = str(tmp_path / "graph.txt")
+    with open(file, 'w') as text:
+        text.write("\n".join(LINES) + "\n")
+    if request.param.endswith(".gz"):
+        with open(file, 'rb') as text, gzip.open(file + ".gz", 'wb') as compressed:
+            shutil.copyfileobj(text, compressed)
+        file = file + ".gz"
+    return file
+
+
+def test_read_edge_list_equals_file_to_elist(edge_list_file):
+    edge_list = read_edge_list(edge_list_file)
+    expected = elist_graph(edge_list_file)
+
+    assert edge_list.labels == ["a", "b", "c", "d", "e"] == list(expected)
+    assert len(edge_list) == len(LINES)
+    assert weighted_lists(edge_list.to_networkx()) == weighted_lists(expected)
+    # the edges b-c and a-b are repeated, the last weight is kept
+    assert expected["b"]["c"]["weight"] == 4.0 and expected["a"]["b"]["weight"] == 3.0
+    assert (edge_list.csr() != networkx_csr(expected, nodelist=edge_list.labels)).nnz == 0
+
+
+def test_read_edge_list_equals_gexf():
+    # the same graph given in both formats: same nodes, edges and weights, the neighbours may be in another order
+    name = os.path.join(DATA, "germanwings_followers_network_part_largest_CC")
+    edge_list = read_edge_list(name + ".txt")
+    graph = edge_list.to_networkx()
+    expected = nx.read_gexf(name + ".gexf")
+
+    assert list(graph) == list(expected)
+    assert graph.number_of_edges() == expected.number_of_edges()
+    for node in expected:
+        assert {neighbour: data["weight"] for neighbour, data in graph.adj[node].items()} == \
+            {neighbour: data["weight"] for neighbour, data in expected.adj[node].items()}
+    assert (edge_list.csr() != networkx_csr(expected, nodelist=edge_list.labels)).nnz == 0
@@ -0,0 +1,50 @@
+# define tests of the embedding controversy
+
+import math
+
+import numpy as np
+import pytest
+
+from controversy.embedding import distance_sum, embedding_controversy
+
+
+def pairwise_mean(positions, other=None):
+    """
+    Return the mean distance of the pairs of positions, one pair at a time as ForceAtlasControversy did
+    """
+    total = 0.0
+    count = 0.0
+    if other is None:
+        for i in range(len(positions)):
+            for j in range(i + 1, len(positions)):
+                total += math.sqrt((positions[i][0] - positions[j][0]) ** 2 + (positions[i][1] - positions[j][1]) ** 2)
+                count += 1.0
+    else:
+        for i in range(len(positions)):
+            for j in range(len(other)):
+                total += math.sqrt((positions[i][0] - other[j][0]) ** 2 + (positions[i][1] - other[j][1]) ** 2)
+                count += 1.0
+    return total / count
+
+
+@pytest.mark.parametrize("tile_size", [1, 7, 2 ** 20])
+def test_distance_sum_equals_pairwise_loop(tile_size):
+    rng = np.random.default_rng(3)
+    left = rng.random((23, 2))
+    right = rng.random((17, 2)) + 0.5
+
+    for positions, other in ((left, None), (right, None), (left, right)):
+        total, count = distance_sum(positions, other, tile_size)
+        assert total / count == pytest.approx(pairwise_mean(positions, other), rel=1e-12)
+
+    left_mean, right_mean, cross_mean = pairwise_mean(left), pairwise_mean(right), pairwise_mean(left, right)
+    score, half_width = embedding_controversy(left, right, tile_size=tile_size)
+    assert score == pytest.approx(1 - (left_mean + right_mean) / (2 * cross_mean), rel=1e-12)
+    assert half_width == 0
+
+
+@pytest.mark.parametrize("sample_size", [-1, 0, 1])
+def test_sample_size_too_small(sample_size):
+    rng = np.random.default_rng(3)
+    with pytest.raises(ValueError):
+        embedding_controversy(rng.random((10, 2)), rng.random((10, 2)), sample_size=sample_size)
@@ -0,0 +1,111 @@
+# define tests of the GMCK boundary connectivity
+
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from common.graph_core import OverlayGraph, core_from_networkx
+from controversy.measures import GMCK
+
+
+def random_case(seed: int, directed: bool):
+    """
+    Return a random graph, with a self loop, and its two communities: the last node is in neither community and the
+    first node is listed twice in the left community
+    """
+    rng = random.Random(seed)
+    sizes = [rng.randint(4, 30), rng.randint(4, 30)]
+    graph = nx.random_partition_graph(sizes, 0.1 + rng.random() * 0.2, rng.random() * 0.05, seed=seed,
+                                      directed=directed)
+    graph = nx.relabel_nodes(graph, str)
+    nodes = list(graph)
+    graph.add_edge(nodes[0], nodes[0])
+    communities = {"0": nodes[:sizes[0]] + nodes[:1], "1": nodes[sizes[0]:-1]}
+    return graph, communities
+
+
+def gmck(graph, communities, engine, **options):
+    return GMCK(graph=graph, communities=communities, engine=engine, **options).controversy
+
+
+@pytest.mark.parametrize("directed", [False, True])
+def test_numpy_engine_equals_networkx(directed):
+    for seed in range(60):
+        graph, communities = random_case(seed, directed)
+        expected = gmck(graph, communities, "networkx")
+        score = gmck(graph, communities, "numpy")
+
+        assert score == expected
+        assert type(score) is type(expected)
+
+
+def test_numpy_engine_with_core_equals_networkx():
+    for seed in range(30):
+        graph, communities = random_case(seed, False)
+        core = core_from_networkx(graph, communities)
+
+        assert gmck(graph, communities, "numpy", core=core) == gmck(graph, communities, "networkx")
+
+
+def random_new_edges(graph, communities, seed: int):
+    """
+    Return up to 20 random pairs of nodes not yet connected, with a new self loop and mostly across the communities
+    """
+    rng = random.Random(seed)
+    left = set(communities["0"])
+    pairs = [(u, v) for u in graph for v in graph if u != v and not graph.has_edge(u, v)]
+    across = [(u, v) for u, v in pairs if (u in left) != (v in left)]
+    rng.shuffle(pairs)
+    rng.shuffle(across)
+    added = dict()
+    for u, v in across[:15] + pairs[:5]:
+        if graph.is_directed() or (v, u) not in added:
+            added[(u, v)] = None
+    loops = [node for node in graph if not graph.has_edge(node, node)]
+    return list(added) + [(node, node) for node in loops[:1]]
+
+
+@pytest.mark.parametrize("directed", [False, True])
+def test_controversy_after_equals_from_scratch(directed):
+    for seed in range(40):
+        graph, communities = random_case(seed, directed)
+        measure = GMCK(graph=graph, communities=communities)
+        added = random_new_edges(graph, communities, seed)
+        modified = graph.copy()
+        modified.add_edges_from(added)
+
+        expected = gmck(modified, communities, "networkx")
+        assert measure.get_controversy_after(added) == expected
+        # the graph of the measure is left untouched
+        assert measure.get_controversy_after([]) == gmck(graph, communities, "networkx")
+
+
+def test_controversy_after_updates_cut_nodes():
+    # a - x and c - z are the edges across: a, x, c and z are on the boundary, since they have internal neighbours
+    # which are not on the cut
+    graph = nx.Graph([("a", "b"), ("b", "c"), ("b", "d"), ("c", "d"), ("c", "e"), ("d", "e"),
+                      ("x", "y"), ("y", "z"), ("y", "w"), ("z", "w"), ("z", "v"), ("a", "x"), ("c", "z")])
+    communities = {"0": ["a", "b", "c", "d", "e"], "1": ["x", "y", "z", "w", "v"]}
+    # b - y puts b and y on the cut: a and x leave the boundary, b and y join it. The self loop touches a cut
+    # node, e - v puts e and v on the cut and the last self loop touches a node which is no longer on the boundary
+    added = [("b", "y"), ("c", "c"), ("e", "v"), ("x", "x")]
+    measure = GMCK(graph=graph, communities=communities)
+
+    for number_edges in range(len(added) + 1):
+        modified = graph.copy()
+        modified.add_edges_from(added[:number_edges])
+        assert measure.get_controversy_after(added[:number_edges]) == gmck(modified, communities, "networkx")
+
+
+def test_overlay_graph_equals_from_scratch():
+    graph, communities = random_case(3, False)
+    core = core_from_networkx(graph, communities)
+    added = random_new_edges(graph, communities, 3)
+    overlay = OverlayGraph(graph, core, added)
+    modified = graph.copy()
+    modified.add_edges_from(added)
+
+    assert np.array_equal(overlay.adjacency().toarray(), nx.to_numpy_array(modified, nodelist=core.labels))
+    assert gmck(overlay, communities, "numpy") == gmck(modified, communities, "networkx")
@@ -0,0 +1,113 @@
+# define tests of the ForceAtlas layouts
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from common.graph_core import OverlayGraph, networkx_csr
+from controversy.embedding import embedding_controversy
+from controversy.layout import ForceAtlasLayout
+from controversy.measures import ForceAtlasControversy
+
+# largest difference between the embedding scores of the grid and of the exact layout
+SCORE_BOUND = 0.02
+# largest difference between the grid and the exact positions after one iteration (the temperature is 0.1)
+STEP_BOUND = 0.01
+
+
+def planted_case(seed: int):
+    """
+    Return the adjacency of a graph with two communities, the nodes of each community and seeded initial positions
+    """
+    graph = nx.planted_partition_graph(2, 40, 0.25, 0.02, seed=seed)
+    adjacency = networkx_csr(graph, dtype='f')
+    positions = np.random.default_rng(seed).random((len(graph), 2))
+    return adjacency, list(range(40)), list(range(40, 80)), positions
+
+
+@pytest.mark.parametrize("theta", [0.5, 1.0])
+@pytest.mark.parametrize("seed", range(5))
+def test_grid_score_close_to_exact(seed, theta):
+    adjacency, left, right, positions = planted_case(seed)
+    exact = ForceAtlasLayout(adjacency, exact=True).run(positions, 200)
+    grid = ForceAtlasLayout(adjacency, theta=theta).run(positions, 200)
+
+    exact_score, _ = embedding_controversy(exact[left], exact[right])
+    grid_score, _ = embedding_controversy(grid[left], grid[right])
+    assert abs(grid_score - exact_score) < SCORE_BOUND
+
+
+@pytest.mark.parametrize("theta", [0.5, 1.0])
+@pytest.mark.parametrize("seed", range(5))
+def test_grid_step_close_to_exact(seed, theta):
+    # the layout is chaotic, so the positions are only compared after a single iteration
+    adjacency, _, _, positions = planted_case(seed)
+    exact = ForceAtlasLayout(adjacency, exact=True).run(positions, 1)
+    grid = ForceAtlasLayout(adjacency, theta=theta).run(positions, 1)
+    assert np.abs(grid - exact).max() < STEP_BOUND
+
+
+@pytest.mark.parametrize("engine", ["numpy", "grid"])
+def test_seeded_initial_layout(engine):
+    graph = nx.planted_partition_graph(2, 20, 0.3, 0.05, seed=1)
+    communities = {"0": list(range(20)), "1": list(range(20, 40))}
+    properties = {"engine": engine, "iterations": 20}
+    first = ForceAtlasControversy(graph, communities, atlas_properties=properties, seed=3).position_node
+    second = ForceAtlasControversy(graph, communities, atlas_properties=properties, seed=3).position_node
+    other = ForceAtlasControversy(graph, communities, atlas_properties=properties, seed=4).position_node
+
+    assert all(np.array_equal(first[node], second[node]) for node in graph)
+    assert not all(np.array_equal(first[node], other[node]) for node in graph)
+
+
+@pytest.mark.parametrize("iterations, bound", [(1, 1e-6), (5, 1e-5)])
+def test_exact_engine_matches_networkx(iterations, bound):
+    # the float32 rounding of the networkx layout grows over the iterations, so only a few are compared
+    graph = nx.planted_partition_graph(2, 20, 0.3, 0.05, seed=1)
+    communities = {"0": list(range(20)), "1": list(range(20, 40))}
+    positions = np.random.default_rng(0).random((len(graph), 2))
+    layouts = dict()
+    for engine in ["networkx", "numpy"]:
+        properties = {"engine": engine, "iterations": iterations, "pos": positions}
+        measure = ForceAtlasControversy(graph, communities, atlas_properties=properties)
+        layouts[engine] = np.array([measure.position_node[node] for node in graph])
+    assert np.abs(layouts["networkx"] - layouts["numpy"]).max() < bound
+
+
+@pytest.mark.parametrize("engine", ["networkx", "numpy"])
+def test_refined_score_within_cold_start_spread(engine):
+    # the post layouts of results start from the pre layout, with a low temperature and a tolerance
+    graph = nx.planted_partition_graph(2, 40, 0.25, 0.02, seed=2)
+    communities = {"0": list(range(40)), "1": list(range(40, 80))}
+    rng = np.random.default_rng(0)
+    post_graph = graph.copy()
+    post_graph.add_edges_from(zip(rng.integers(0, 40, 8).tolist(), rng.integers(40, 80, 8).tolist()))
+
+    cold_properties = {"engine": "numpy", "iterations": 300}
+    cold_scores = [ForceAtlasControversy(post_graph, communities, atlas_properties=cold_properties, seed=seed)
+                   .controversy for seed in range(10)]
+    pre = ForceAtlasControversy(graph, communities, atlas_properties=cold_properties, seed=0)
+    pre_positions = np.array([pre.position_node[node] for node in graph])
+    warm_properties = {"engine": engine, "iterations": 100, "pos": pre_positions, "temperature": 0.01,
+                       "tolerance": 0.01}
+    warm_score = ForceAtlasControversy(post_graph, communities, atlas_properties=warm_properties).controversy
+
+    assert min(cold_scores) <= warm_score <= max(cold_scores)
+
+
+@pytest.mark.parametrize("nohubs", [False, True])
+@pytest.mark.parametrize("engine", ["numpy", "grid"])
+def test_overlay_layout_equals_modified_graph(engine, nohubs):
+    # the added edges of an overlay are kept apart from the adjacency of the core, which is not copied
+    graph = nx.planted_partition_graph(2, 20, 0.3, 0.05, seed=1)
+    communities = {"0": list(range(20)), "1": list(range(20, 40))}
+    added = [(i, 39 - i) for i in range(0, 20, 3) if not graph.has_edge(i, 39 - i)]
+    modified = graph.copy()
+    modified.add_edges_from(added)
+    overlay = OverlayGraph(graph, added_edges=added)
+    positions = np.random.default_rng(0).random((len(graph), 2))
+
+    properties = {"engine": engine, "iterations": 5, "pos": positions, "nohubs": nohubs}
+    overlay_layout = ForceAtlasControversy(overlay, communities, atlas_properties=properties).position_node
+    modified_layout = ForceAtlasControversy(modified, communities, atlas_properties=properties).position_node
+    assert max(np.abs(overlay_layout[node] - modified_layout[node]).max() for node in graph) < 1e-9
@@ -0,0 +1,128 @@
+# define tests of the random walk controversy
+
+import math
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from common.graph_core import OverlayGraph
+from controversy.measures import RandomWalkControversy
+from controversy.random_walk import RandomWalkEngine, WalkPlan
+
+# largest absolute z statistic of the difference of two proportions of walks
+Z_BOUND = 4.0
+
+
+@pytest.fixture
+def graph_communities():
+    graph = nx.relabel_nodes(nx.planted_partition_graph(2, 40, 0.2, 0.02, seed=5), str)
+    communities = {"0": [str(i) for i in range(40)], "1": [str(i) for i in range(40, 80)]}
+    return graph, communities
+
+
+def walk_proportions(graph, communities, engine: str, iterations: int, seed: int):
+    """
+    Return P(left | left), P(right | right) and the number of walks started on each side
+    """
+    measure = RandomWalkControversy(graph, communities, engine=engine, compute=False)
+    plan = WalkPlan(graph, communities["0"], communities["1"], 5, 5)
+    left_left, left_right, right_left, right_right = measure.walk_counts(plan, iterations,
+                                                                         np.random.SeedSequence(seed))
+    return (left_left / (left_left + left_right), right_right / (right_left + right_right),
+            left_left + left_right, right_left + right_right)
+
+
+def z_statistic(first: float, second: float, first_walks: int, second_walks: int):
+    pooled = (first * first_walks + second * second_walks) / (first_walks + second_walks)
+    return (first - second) / math.sqrt(pooled * (1 - pooled) * (1 / first_walks + 1 / second_walks))
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_numpy_engine_is_equivalent_to_networkx(graph_communities, seed):
+    graph, communities = graph_communities
+    numpy_left, numpy_right, numpy_left_walks, numpy_right_walks = walk_proportions(graph, communities, "numpy",
+                                                                                    2000, seed)
+    networkx_left, networkx_right, networkx_left_walks, networkx_right_walks = walk_proportions(
+        graph, communities, "networkx", 2000, seed + 100)
+
+    # the walks stay mostly in their community, but not always
+    assert 0.5 < numpy_left < 1 and 0.5 < numpy_right < 1
+    assert abs(z_statistic(numpy_left, networkx_left, numpy_left_walks, networkx_left_walks)) < Z_BOUND
+    assert abs(z_statistic(numpy_right, networkx_right, numpy_right_walks, networkx_right_walks)) < Z_BOUND
+
+
+def test_overlay_graph_is_equivalent_to_networkx(graph_communities):
+    graph, communities = graph_communities
+    added = [(str(i), str(40 + i)) for i in range(0, 40, 2) if not graph.has_edge(str(i), str(40 + i))]
+    overlay = OverlayGraph(graph, added_edges=added)
+    modified = graph.copy()
+    modified.add_edges_from(added)
+
+    overlay_left, overlay_right, overlay_left_walks, overlay_right_walks = walk_proportions(
+        overlay, communities, "numpy", 2000, 3)
+    networkx_left, networkx_right, networkx_left_walks, networkx_right_walks = walk_proportions(
+        modified, communities, "networkx", 2000, 4)
+
+    assert abs(z_statistic(overlay_left, networkx_left, overlay_left_walks, networkx_left_walks)) < Z_BOUND
+    assert abs(z_statistic(overlay_right, networkx_right, overlay_right_walks, networkx_right_walks)) < Z_BOUND
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_fixed_seed_and_workers_are_reproducible(graph_communities, workers):
+    graph, communities = graph_communities
+    runs = [RandomWalkControversy(graph, communities, seed=11, workers=workers) for _ in range(2)]
+
+    assert runs[0].controversy == runs[1].controversy
+    assert runs[0].confidence_interval == runs[1].confidence_interval
+    assert runs[0].walks == runs[1].walks
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_workers_agree_in_distribution(graph_communities, seed):
+    graph, communities = graph_communities
+    single = RandomWalkControversy(graph, communities, seed=seed, workers=1)
+    several = RandomWalkControversy(graph, communities, seed=seed, workers=3)
+
+    # the half widths are the ones of 95% intervals: their ratio to a standard error is about 1.96
+    standard_error = math.sqrt(single.confidence_interval ** 2 + several.confidence_interval ** 2) / 1.96
+    assert single.walks == several.walks
+    assert abs(single.controversy - several.controversy) < Z_BOUND * standard_error
+
+
+def test_tolerance_stops_before_the_cap(graph_communities):
+    graph, communities = graph_communities
+    measure = RandomWalkControversy(graph, communities, iteration=1000, seed=1, tolerance=0.05, batch_iterations=50)
+
+    assert measure.iterations_done < 1000
+    assert measure.iterations_done % 50 == 0
+    assert measure.confidence_interval <= 0.05
+    full = RandomWalkControversy(graph, communities, iteration=1000, seed=1)
+    assert measure.walks < full.walks
+
+
+def test_interval_shrinks_with_the_walks(graph_communities):
+    graph, communities = graph_communities
+    measures = [RandomWalkControversy(graph, communities, iteration=iteration, seed=2) for iteration in [50, 200, 800]]
+
+    walks = [measure.walks for measure in measures]
+    half_widths = [measure.confidence_interval for measure in measures]
+    assert walks[0] < walks[1] < walks[2]
+    assert half_widths[0] > half_widths[1] > half_widths[2] > 0
+
+
+@pytest.mark.parametrize("options", [{"iteration": 0}, {"batch_iterations": 0, "tolerance": 0.05}])
+def test_walks_run_at_least_once(graph_communities, options):
+    graph, communities = graph_communities
+    with pytest.raises(ValueError):
+        RandomWalkControversy(graph, communities, **options)
+
+
+def test_engine_reads_the_core_in_place(graph_communities):
+    graph, communities = graph_communities
+    added = [(str(i), str(40 + i)) for i in range(0, 40, 2) if not graph.has_edge(str(i), str(40 + i))]
+    overlay = OverlayGraph(graph, added_edges=added)
+    engine = RandomWalkEngine(overlay)
+
+    assert engine.indices is overlay.core.indices and engine.indptr is overlay.core.indptr
+    assert len(engine.added_indices) == 2 * len(added)
@@ -0,0 +1,40 @@
+# define tests of the caches of link prediction values
+
+import networkx as nx
+import numpy as np
+
+from common.cache import GraphCache
+from common.score_cache import ScoreCaches, read_ranked_edges, write_ranked_edges
+from common.utility import read_json_to_dict, write_dict_to_json
+
+
+def test_values_are_read_lazily_once(tmp_path):
+    graph = nx.path_graph(5)
+    caches = ScoreCaches(GraphCache(graph, root=str(tmp_path) + "/"))
+    reads = list()
+
+    def reader(entry, path):
+        reads.append(entry)
+        return read_json_to_dict(entry, path)
+
+    assert caches.get("betweenness", {"seed": 1}, reader) is None
+    caches.put("betweenness", "path", {"seed": 1},
+               lambda entry, path: write_dict_to_json({"0": {"1": 0.5}}, entry, path))
+    assert reads == []
+
+    for _ in range(3):
+        assert caches.get("betweenness", {"seed": 1}, reader) == {"0": {"1": 0.5}}
+    assert len(reads) == 1
+    assert caches.get("betweenness", {"seed": 2}, reader) is None
+
+
+def test_ranked_edges_are_memory_mapped(tmp_path):
+    graph = nx.path_graph(5)
+    caches = ScoreCaches(GraphCache(graph, root=str(tmp_path) + "/"))
+    ranked_edges = [("a", "b", 3.0), ("c", "a", 2.0), ("b", "d", 1.0)]
+    caches.put("jaccard_coefficient", "path", {}, lambda entry, path: write_ranked_edges(ranked_edges, 10, entry, path))
+
+    cached = caches.get("jaccard_coefficient", {}, read_ranked_edges)
+    assert cached.top(2) == ranked_edges[:2]
+    assert not cached.complete
+    assert isinstance(cached.records, np.memmap)
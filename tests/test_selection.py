@@ -0,0 +1,25 @@
+# define tests of the selection of the best candidate edges
+
+import random
+from operator import itemgetter
+
+import pytest
+
+from link_prediction.selection import top_edges
+
+
+@pytest.mark.parametrize("number_edges", [0, 1, 3, 10, 50, 200])
+def test_top_edges_equals_sorted_with_ties(number_edges):
+    rng = random.Random(number_edges)
+    # few distinct scores: most of the candidates are tied
+    scored_edges = [(u, v, rng.choice([0.0, 0.5, 1.0, 2.0])) for u in range(10) for v in range(10, 20)]
+
+    expected = sorted(scored_edges, key=itemgetter(2), reverse=True)[:number_edges]
+    assert top_edges(iter(scored_edges), number_edges, key=itemgetter(2)) == expected
+
+
+def test_top_edges_first_generated_wins_on_ties():
+    scores = {("a", "b"): 1.0, ("c", "d"): 2.0, ("e", "f"): 1.0, ("g", "h"): 2.0, ("i", "j"): 1.0}
+
+    assert top_edges(scores.items(), 3) == [(("c", "d"), 2.0), (("g", "h"), 2.0), (("a", "b"), 1.0)]
+    assert top_edges(scores.items(), 3) == sorted(scores.items(), key=itemgetter(1), reverse=True)[:3]
@@ -0,0 +1,50 @@
+# define tests of the vectorized similarity scores
+
+from operator import itemgetter
+
+import networkx as nx
+import pytest
+
+from link_prediction.candidates import CrossCommunityCandidates
+from link_prediction.selection import top_edges
+from link_prediction.similarity import SparseSimilarity
+
+NETWORKX_SCORES = {"JACCARD_COEFFICIENT": nx.jaccard_coefficient,
+                   "ADAMIC_ADAR": nx.adamic_adar_index,
+                   "RESOURCE_ALLOCATION": nx.resource_allocation_index,
+                   "PREFERENTIAL_ATTACHMENT": nx.preferential_attachment}
+
+
+@pytest.fixture
+def graph_communities():
+    graph = nx.relabel_nodes(nx.planted_partition_graph(2, 30, 0.2, 0.03, seed=7), str)
+    # an isolated node and a leaf: degrees 0 and 1 are the special cases of the scores
+    graph.add_node("isolated")
+    graph.add_edge("leaf", "0")
+    communities = {"0": [str(i) for i in range(30)] + ["isolated"], "1": [str(i) for i in range(30, 60)] + ["leaf"]}
+    return graph, communities
+
+
+@pytest.mark.parametrize("algorithm", sorted(NETWORKX_SCORES))
+def test_scores_match_networkx(graph_communities, algorithm):
+    graph, communities = graph_communities
+    candidates = CrossCommunityCandidates(graph, communities["0"], communities["1"])
+
+    sparse = list(SparseSimilarity(graph).scores(algorithm, candidates, batch_size=7))
+    expected = list(NETWORKX_SCORES[algorithm](graph, candidates))
+
+    assert [pair[:2] for pair in sparse] == [pair[:2] for pair in expected]
+    assert [pair[2] for pair in sparse] == pytest.approx([pair[2] for pair in expected], rel=1e-12, abs=1e-12)
+
+
+@pytest.mark.parametrize("algorithm", sorted(NETWORKX_SCORES))
+def test_top_scores_match_top_edges(graph_communities, algorithm):
+    graph, communities = graph_communities
+    candidates = CrossCommunityCandidates(graph, communities["0"], communities["1"])
+    similarity = SparseSimilarity(graph)
+
+    # tiles of a few rows, so that the running top is merged many times
+    top = similarity.top_scores(algorithm, candidates, 25, max_memory=5 * 31 * 32)
+    expected = top_edges(similarity.scores(algorithm, candidates), 25, key=itemgetter(2))
+
+    assert top == expected
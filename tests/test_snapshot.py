@@ -0,0 +1,86 @@
+# define tests of the graph snapshots
+
+import os
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from common import snapshot as snapshot_module
+from common.cache import core_digest, graph_digest
+from common.edge_list import edge_list_from_networkx
+from common.graph_core import core_from_networkx
+from common.snapshot import GraphSnapshot, read_snapshot, source_digest, source_metadata, write_snapshot
+
+
+def shuffled_graph(seed: int):
+    """
+    Return a weighted graph with string labels and a self loop, whose edges were added in a random order
+    """
+    rng = random.Random(seed)
+    edges = list(nx.gnm_random_graph(40, 120, seed=seed).edges) + [(0, 0)]
+    rng.shuffle(edges)
+    graph = nx.Graph()
+    graph.add_nodes_from(str(node) for node in rng.sample(range(40), 40))
+    graph.add_weighted_edges_from((str(u), str(v), rng.choice([1.0, 2.0, 0.5])) for u, v in edges)
+    return graph
+
+
+def adjacency_lists(graph):
+    return [(node, [(neighbour, data.get("weight", 1.0)) for neighbour, data in graph.adj[node].items()])
+            for node in graph]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_snapshot_round_trip(tmp_path, seed):
+    graph = shuffled_graph(seed)
+    core = core_from_networkx(graph)
+    labels = list(graph)
+    communities = {"fluidc": {"0": labels[:20], "1": labels[20:]}}
+    snapshot_file = str(tmp_path / "graph.snap")
+    write_snapshot(snapshot_file, GraphSnapshot("source", "digest", edge_list_from_networkx(graph), core,
+                                                communities))
+
+    snapshot = read_snapshot(snapshot_file)
+    assert snapshot.digest == "digest"
+    assert snapshot.labels == labels
+    assert snapshot.communities == communities
+    assert adjacency_lists(snapshot.to_networkx()) == adjacency_lists(graph)
+    for name in ("indptr", "indices", "weights"):
+        assert np.array_equal(getattr(snapshot.core, name), getattr(core, name))
+    assert core_digest(snapshot.core) == graph_digest(graph)
+
+
+def test_snapshot_validated_from_source_metadata(tmp_path, monkeypatch):
+    source_file = str(tmp_path / "graph.txt")
+    with open(source_file, 'w') as text:
+        text.write("a,b,1.0\nb,c,2.0\n")
+    graph = shuffled_graph(0)
+    snapshot_file = str(tmp_path / "graph.snap")
+    write_snapshot(snapshot_file, GraphSnapshot(source_digest(source_file), "digest", edge_list_from_networkx(graph),
+                                                core_from_networkx(graph), metadata=source_metadata(source_file)))
+
+    # same size and modification time: the source is not hashed
+    with monkeypatch.context() as patch:
+        patch.setattr(snapshot_module, "source_digest", lambda file_path: pytest.fail("source hashed"))
+        assert read_snapshot(snapshot_file, source_file).metadata == source_metadata(source_file)
+
+    # touched but unchanged: the hash still validates the snapshot, which keeps the recorded metadata
+    stat = os.stat(source_file)
+    os.utime(source_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    snapshot = read_snapshot(snapshot_file, source_file)
+    assert snapshot is not None and snapshot.metadata != source_metadata(source_file)
+
+    with open(source_file, 'a') as text:
+        text.write("c,d,1.0\n")
+    assert read_snapshot(snapshot_file, source_file) is None
+
+
+def test_edge_list_of_graph_with_removed_edges():
+    # no order of the edges rebuilds the neighbour order, the edges and nodes are still the same
+    graph = shuffled_graph(0)
+    graph.remove_edges_from(list(graph.edges)[::7])
+    rebuilt = edge_list_from_networkx(graph).to_networkx()
+    assert list(rebuilt) == list(graph)
+    assert {frozenset(edge) for edge in rebuilt.edges} == {frozenset(edge) for edge in graph.edges}
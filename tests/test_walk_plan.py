@@ -0,0 +1,77 @@
+# define tests of the plan of the random walks
+
+from operator import itemgetter
+
+import networkx as nx
+import pytest
+
+from common.graph_core import OverlayGraph, core_from_networkx, LEFT, RIGHT
+from controversy.random_walk import WalkPlan
+
+
+def baseline_seeds(graph, side: list, k: int):
+    """
+    Return the seeds of a side as RandomWalkControversy chose them in every iteration before WalkPlan
+    """
+    dict_side = dict((node, 1) for node in side)
+    random_nodes = {}
+    sorted_dict = sorted(dict(nx.degree(graph)).items(), key=itemgetter(1), reverse=True)
+    count = 0
+    for i in sorted_dict:
+        if count > k:
+            break
+        if not dict_side.get(i[0]):
+            continue
+        random_nodes[i[0]] = i[1]
+        count += 1
+    return list(random_nodes)
+
+
+def baseline_walks(graph, left: list, right: list, left_k: int, right_k: int):
+    """
+    Return (start, left absorbing nodes, right absorbing nodes) of every walk of a baseline iteration
+    """
+    left_seeds = baseline_seeds(graph, left, left_k)
+    right_seeds = baseline_seeds(graph, right, right_k)
+    walks = [(node, set(left_seeds[:i] + left_seeds[i + 1:]), set(right_seeds))
+             for i, node in enumerate(left_seeds[:-1])]
+    walks += [(node, set(left_seeds), set(right_seeds[:i] + right_seeds[i + 1:]))
+              for i, node in enumerate(right_seeds[:-1])]
+    return walks
+
+
+def plan_walks(plan: WalkPlan):
+    """
+    Return (start, left absorbing nodes, right absorbing nodes) of every walk of the plan
+    """
+    return [(node,
+             {seed for seed, side in plan.absorbing.items() if side == LEFT and seed != node},
+             {seed for seed, side in plan.absorbing.items() if side == RIGHT and seed != node})
+            for node in plan.starts]
+
+
+@pytest.mark.parametrize("k", [0, 1, 4, 30])
+@pytest.mark.parametrize("seed", range(4))
+def test_walk_plan_equals_baseline_selection(seed, k):
+    # few distinct degrees: the order of the nodes with the same degree matters
+    graph = nx.relabel_nodes(nx.planted_partition_graph(2, 25, 0.2, 0.04, seed=seed), str)
+    left = [str(i) for i in range(25)]
+    right = [str(i) for i in range(25, 50)]
+    expected = baseline_walks(graph, left, right, k, k + 1)
+
+    assert plan_walks(WalkPlan(graph, left, right, k, k + 1)) == expected
+    assert plan_walks(WalkPlan(graph, left, right, k, k + 1, core=core_from_networkx(graph))) == expected
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_overlay_walk_plan_equals_baseline_selection(seed):
+    graph = nx.relabel_nodes(nx.planted_partition_graph(2, 25, 0.2, 0.04, seed=seed), str)
+    left = [str(i) for i in range(25)]
+    right = [str(i) for i in range(25, 50)]
+    # the added edges of an overlay are never in the base graph
+    added = [(str(i), str(49 - i)) for i in range(0, 25, 3) if not graph.has_edge(str(i), str(49 - i))]
+    modified = graph.copy()
+    modified.add_edges_from(added)
+    overlay = OverlayGraph(graph, added_edges=added)
+
+    assert plan_walks(WalkPlan(overlay, left, right, 3, 3)) == baseline_walks(modified, left, right, 3, 3)